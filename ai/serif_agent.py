@@ -1,6 +1,5 @@
-import openai
-
-openai.api_key = 'YOUR_OPENAI_API_KEY'
+# Imported with the repository root on the path, like the other top-level modules.
+from rve.llm import complete
 
 def serif_prompt(user_input, conversation_context):
     prompt = f"""
@@ -18,10 +17,10 @@ User said:
 
 Respond as Serif:
 """
-    response = openai.ChatCompletion.create(
+    return complete(
+        [{"role": "user", "content": prompt}],
         model="gpt-4",
-        messages=[{"role": "user", "content": prompt}],
         temperature=0.7,
         max_tokens=500
     )
-    return response['choices'][0]['message']['content']
+
@@ -6,52 +6,64 @@ import sqlalchemy as sa
 from werkzeug.security import generate_password_hash
 from datetime import datetime
 
+from rve.backfill import backfill_column, clear_progress, require_backfilled
+
 # revision identifiers, used by Alembic.
 revision = "0001"
 down_revision = None
 branch_labels = None
 depends_on = None
 
+DEMO_EMAIL = "public-demo@rve.local"
+USER_SCOPED_TABLES = ("claims", "drift_history", "artifacts")
 
-def upgrade():
-    op.create_table(
-        "users",
-        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
-        sa.Column("email", sa.String(length=255), nullable=False),
-        sa.Column("password_hash", sa.String(length=255), nullable=False),
-        sa.Column("created_at", sa.DateTime(), nullable=True, server_default=sa.func.now()),
-    )
-    op.create_index("ix_users_email", "users", ["email"], unique=True)
 
-    op.add_column("claims", sa.Column("user_id", sa.Integer(), nullable=True))
-    op.create_index("ix_claims_user_id", "claims", ["user_id"])
-    op.create_foreign_key(None, "claims", "users", ["user_id"], ["id"])
+def upgrade():
+    # Schema steps are guarded so an upgrade interrupted after the backfill
+    # started (and committed its first batches) can simply be rerun.
+    conn = op.get_bind()
+    insp = sa.inspect(conn)
+    if not insp.has_table("users"):
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column("email", sa.String(length=255), nullable=False),
+            sa.Column("password_hash", sa.String(length=255), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=True, server_default=sa.func.now()),
+        )
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
 
-    op.add_column("drift_history", sa.Column("user_id", sa.Integer(), nullable=True))
-    op.create_index("ix_drift_history_user_id", "drift_history", ["user_id"])
-    op.create_foreign_key(None, "drift_history", "users", ["user_id"], ["id"])
+    for table in USER_SCOPED_TABLES:
+        if "user_id" in {c["name"] for c in insp.get_columns(table)}:
+            continue
+        op.add_column(table, sa.Column("user_id", sa.Integer(), nullable=True))
+        op.create_index(f"ix_{table}_user_id", table, ["user_id"])
+        op.create_foreign_key(None, table, "users", ["user_id"], ["id"])
 
-    op.add_column("artifacts", sa.Column("user_id", sa.Integer(), nullable=True))
-    op.create_index("ix_artifacts_user_id", "artifacts", ["user_id"])
-    op.create_foreign_key(None, "artifacts", "users", ["user_id"], ["id"])
+    demo_id = conn.execute(
+        sa.text("SELECT id FROM users WHERE email = :email"), {"email": DEMO_EMAIL}
+    ).scalar()
+    if demo_id is None:
+        result = conn.execute(
+            sa.text(
+                "INSERT INTO users (email, password_hash, created_at) VALUES (:email, :pw, :created_at)"
+            ),
+            {
+                "email": DEMO_EMAIL,
+                "pw": generate_password_hash("demo"),
+                "created_at": datetime.utcnow(),
+            },
+        )
+        demo_id = result.inserted_primary_key[0]
 
-    conn = op.get_bind()
-    result = conn.execute(
-        sa.text(
-            "INSERT INTO users (email, password_hash, created_at) VALUES (:email, :pw, :created_at)"
-        ),
-        {
-            "email": "public-demo@rve.local",
-            "pw": generate_password_hash("demo"),
-            "created_at": datetime.utcnow(),
-        },
-    )
-    demo_id = result.inserted_primary_key[0]
-    for table in ("claims", "drift_history", "artifacts"):
-        conn.execute(sa.text(f"UPDATE {table} SET user_id = :uid"), {"uid": demo_id})
-    op.alter_column("claims", "user_id", nullable=False)
-    op.alter_column("drift_history", "user_id", nullable=False)
-    op.alter_column("artifacts", "user_id", nullable=False)
+    # Backfill in committed primary-key batches; a rerun resumes from the
+    # checkpoints in rve_backfill_progress.
+    with op.get_context().autocommit_block():
+        for table in USER_SCOPED_TABLES:
+            backfill_column(conn, table, "user_id", ":uid", {"uid": demo_id})
+    for table in USER_SCOPED_TABLES:
+        require_backfilled(conn, table, "user_id")
+        op.alter_column(table, "user_id", nullable=False)
 
 
 def downgrade():
@@ -66,3 +78,4 @@ def downgrade():
     op.drop_column("claims", "user_id")
     op.drop_index("ix_users_email", table_name="users")
     op.drop_table("users")
+    clear_progress(op.get_bind(), [f"{t}.user_id" for t in USER_SCOPED_TABLES])
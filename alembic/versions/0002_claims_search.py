@@ -0,0 +1,39 @@
+"""add full-text search index over claims.text"""
+
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    if conn.dialect.name == "sqlite":
+        conn.execute(
+            sa.text(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS claims_fts "
+                "USING fts5(text, content='claims', content_rowid='id')"
+            )
+        )
+        # Index the claims that already exist.
+        conn.execute(sa.text("INSERT INTO claims_fts(claims_fts) VALUES ('rebuild')"))
+    elif conn.dialect.name == "postgresql":
+        op.create_index(
+            "ix_claims_text_tsv",
+            "claims",
+            [sa.text("to_tsvector('english', text)")],
+            postgresql_using="gin",
+        )
+
+
+def downgrade():
+    conn = op.get_bind()
+    if conn.dialect.name == "sqlite":
+        conn.execute(sa.text("DROP TABLE IF EXISTS claims_fts"))
+    elif conn.dialect.name == "postgresql":
+        op.drop_index("ix_claims_text_tsv", table_name="claims")
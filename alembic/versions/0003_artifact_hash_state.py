@@ -0,0 +1,25 @@
+"""track file size/mtime for artifact hashing and index artifacts.hash"""
+
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("artifacts", sa.Column("size_bytes", sa.BigInteger(), nullable=True))
+    op.add_column("artifacts", sa.Column("mtime", sa.Float(), nullable=True))
+    op.add_column("artifacts", sa.Column("hashed_at", sa.DateTime(), nullable=True))
+    op.create_index("ix_artifacts_hash", "artifacts", ["hash"])
+
+
+def downgrade():
+    op.drop_index("ix_artifacts_hash", table_name="artifacts")
+    op.drop_column("artifacts", "hashed_at")
+    op.drop_column("artifacts", "mtime")
+    op.drop_column("artifacts", "size_bytes")
@@ -0,0 +1,66 @@
+"""add per-user claim summary tables"""
+
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+DRIFT_BUCKETS = 5
+
+
+def upgrade():
+    op.create_table(
+        "claim_summaries",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("n_claims", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("sum_drift", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("sum_confidence", sa.Float(), nullable=False, server_default="0"),
+        *[
+            sa.Column(f"drift_b{b}", sa.Integer(), nullable=False, server_default="0")
+            for b in range(DRIFT_BUCKETS)
+        ],
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    )
+    op.create_table(
+        "claim_volatility_counts",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("volatility", sa.String(length=16), primary_key=True),
+        sa.Column("n", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+    # Seed both tables from existing claims with set-based aggregates.
+    drift = "COALESCE(drift_score, 0)"
+    buckets = ", ".join(
+        f"SUM(CASE WHEN {cond} THEN 1 ELSE 0 END)"
+        for cond in (
+            [f"{drift} < 1"]
+            + [f"{drift} >= {b} AND {drift} < {b + 1}" for b in range(1, DRIFT_BUCKETS - 1)]
+            + [f"{drift} >= {DRIFT_BUCKETS - 1}"]
+        )
+    )
+    bucket_cols = ", ".join(f"drift_b{b}" for b in range(DRIFT_BUCKETS))
+    conn = op.get_bind()
+    conn.execute(
+        sa.text(
+            f"INSERT INTO claim_summaries (user_id, n_claims, sum_drift, sum_confidence, {bucket_cols}, updated_at) "
+            f"SELECT user_id, COUNT(*), SUM({drift}), SUM(COALESCE(confidence_index, 0)), {buckets}, CURRENT_TIMESTAMP "
+            "FROM claims GROUP BY user_id"
+        )
+    )
+    conn.execute(
+        sa.text(
+            "INSERT INTO claim_volatility_counts (user_id, volatility, n) "
+            "SELECT user_id, volatility, COUNT(*) FROM claims "
+            "WHERE volatility IS NOT NULL GROUP BY user_id, volatility"
+        )
+    )
+
+
+def downgrade():
+    op.drop_table("claim_volatility_counts")
+    op.drop_table("claim_summaries")
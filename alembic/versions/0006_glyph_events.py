@@ -0,0 +1,33 @@
+"""add glyph_events table"""
+
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "glyph_events",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("session_id", sa.String(length=36), nullable=False),
+        sa.Column("glyph", sa.String(length=64), nullable=False),
+        sa.Column("signal", sa.String(length=64), nullable=True),
+        sa.Column("t", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+    op.create_index("ix_glyph_events_user_t", "glyph_events", ["user_id", "t"])
+    op.create_index("ix_glyph_events_session_t", "glyph_events", ["session_id", "t"])
+    op.create_index("ix_glyph_events_glyph_t", "glyph_events", ["glyph", "t"])
+
+
+def downgrade():
+    op.drop_index("ix_glyph_events_glyph_t", table_name="glyph_events")
+    op.drop_index("ix_glyph_events_session_t", table_name="glyph_events")
+    op.drop_index("ix_glyph_events_user_t", table_name="glyph_events")
+    op.drop_table("glyph_events")
@@ -0,0 +1,40 @@
+"""add conversations and chat_messages tables"""
+
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "conversations",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("key", sa.String(length=36), nullable=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True, server_default=sa.func.now()),
+    )
+    op.create_index("ix_conversations_key", "conversations", ["key"], unique=True)
+    op.create_index("ix_conversations_user_id", "conversations", ["user_id"])
+    op.create_table(
+        "chat_messages",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("conversation_id", sa.Integer(), sa.ForeignKey("conversations.id"), nullable=False),
+        sa.Column("seq", sa.Integer(), nullable=False),
+        sa.Column("role", sa.String(length=16), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True, server_default=sa.func.now()),
+        sa.UniqueConstraint("conversation_id", "seq", name="uq_chat_messages_conversation_seq"),
+    )
+
+
+def downgrade():
+    op.drop_table("chat_messages")
+    op.drop_index("ix_conversations_user_id", table_name="conversations")
+    op.drop_index("ix_conversations_key", table_name="conversations")
+    op.drop_table("conversations")
@@ -1,21 +1,18 @@
+# Run from the repository root: python -m client.src.components.server.app
 from flask import Flask, request, jsonify
-import openai
-import os
+
+from rve.llm import complete
 
 app = Flask(__name__)
-openai.api_key = os.getenv("OPENAI_API_KEY")
 
 @app.route('/process', methods=['POST'])
 def process():
     user_input = request.json['input']
     prompt = f"Recursively analyze this: {user_input}. Identify themes, compress into truths."
 
-    response = openai.ChatCompletion.create(
-        model="gpt-4",
-        messages=[{"role": "system", "content": prompt}]
-    )
+    output = complete([{"role": "system", "content": prompt}], model="gpt-4")
 
-    return jsonify({'output': response['choices'][0]['message']['content']})
+    return jsonify({'output': output})
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -1,6 +1,18 @@
 import streamlit as st
-from rve.live import ensure_chat_state, stream_chat, messages_for_llm, push_user, push_assistant
-from rve.glyphs import map_text_to_glyph_events
+from rve.admission import AdmissionRejected
+from rve.live import (
+    StreamRenderer,
+    context_window,
+    ensure_chat_state,
+    messages_for_llm,
+    push_assistant,
+    push_user,
+    restore_chat,
+    stream_chat,
+)
+from rve.glyphs import GlyphStreamMatcher
+from rve.latency import recorder as latency
+from rve.router import AUTO
 
 st.set_page_config(page_title="Recursive Emergence Framework", page_icon="🧭", layout="wide")
 ensure_chat_state()
@@ -11,11 +23,28 @@ with colA:
     st.title("Recursive Emergence Framework (Live) 🧭")
     st.caption("Streaming responses + real-time glyph mapping (Sareth mode)")
 with colB:
-    model = st.selectbox("Model", ["gpt-4o-mini", "gpt-4o", "gpt-4.1-mini"], index=0)
+    model = st.selectbox(
+        "Model",
+        [AUTO, "gpt-4o-mini", "gpt-4o", "gpt-4.1-mini"],
+        index=0,
+        format_func=lambda m: "Auto (latency-aware)" if m == AUTO else m,
+    )
+    shown = model
+    route = st.session_state.get("last_route")
+    if model == AUTO and route is not None:
+        shown = route.served_by or route.model
+        st.caption(f"Last: {shown} — {route.reason}")
+    stats = latency.model_stats(shown)
+    if stats:
+        st.caption(
+            f"TTFT p50 {stats['ttft_ms_p50']} ms · p95 {stats['ttft_ms_p95']} ms · "
+            f"{stats['tokens_per_s_p50']} tok/s · errors {stats['error_rate']:.0%} (last {stats['requests']})"
+        )
 with colC:
     if st.button("↺ Reset"):
-        st.session_state.chat.clear()
+        restore_chat(new=True)
         st.session_state.glyph_trace.clear()
+        st.session_state.context.reset()
         st.session_state.last_response = ""
         st.experimental_rerun()
 
@@ -43,33 +72,48 @@ with left:
 
         # Streamed assistant
         with st.chat_message("assistant"):
-            slot = st.empty()
-            full_text = ""
-            for delta in stream_chat(messages_for_llm(), model=model, temperature=0.2):
-                full_text += delta
-                # live typing cursor
-                slot.markdown(full_text + "▌")
+            renderer = StreamRenderer(st.empty())
+            matcher = GlyphStreamMatcher()
+            try:
+                for delta in stream_chat(messages_for_llm(), model=model, temperature=0.2):
+                    # live typing cursor, redrawn at a bounded rate
+                    renderer.push(delta)
 
-                # Live glyph mapping per chunk
-                evs = map_text_to_glyph_events(delta)
-                if evs:
-                    st.session_state.glyph_trace.extend(evs)
+                    # Live glyph mapping per chunk (sees keywords split across chunks)
+                    evs = matcher.feed(delta)
+                    if evs:
+                        st.session_state.glyph_trace.extend(evs)
+            except AdmissionRejected as exc:
+                wait = f" Try again in {exc.retry_after:.0f}s." if exc.retry_after else ""
+                st.warning(f"Sareth is busy right now ({exc.reason}).{wait}")
 
             # finalize
-            slot.markdown(full_text)
-            push_assistant(full_text)
-            st.session_state.last_response = full_text
+            full_text = renderer.finish()
+            if full_text:
+                push_assistant(full_text)
+                st.session_state.last_response = full_text
 
 with right:
     st.subheader("Glyph Trace (live)")
     if not st.session_state.glyph_trace:
         st.info("As responses stream, detected glyph signals will appear here.")
     else:
-        for ev in reversed(st.session_state.glyph_trace[-24:]):
+        for ev in reversed(st.session_state.glyph_trace.recent(24)):
             st.markdown(
                 f"**{ev['glyph']}** — _{ev['signal']}_ · <span style='opacity:.6'>{ev['t']}</span>",
                 unsafe_allow_html=True,
             )
 
+    with st.expander("Context window"):
+        ctx = context_window()
+        st.json(ctx.usage())
+        if ctx.summary:
+            st.caption("Summary of earlier turns")
+            st.markdown(ctx.summary)
+
+    if st.session_state.get("last_route") is not None:
+        with st.expander("Routing"):
+            st.json(st.session_state.last_route.as_dict())
+
     with st.expander("Last response (raw)"):
         st.code(st.session_state.last_response or "", language="markdown")
@@ -1,40 +1,114 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from pydantic import BaseModel
 
-from rve.ledger import Claim, User, get_session
+from rve.instrument import track_queries
+from rve.ledger import (
+    Claim,
+    get_claim_summary,
+    get_session,
+    list_claims as ledger_list_claims,
+    search_claims,
+)
+from rve.tokens import Principal, issue_token, revoke_token, verify_token
 
 
 app = FastAPI(title="RVE API")
+bearer = HTTPBearer(auto_error=False)
 
 
-def get_user(email: str) -> User:
+@app.middleware("http")
+async def query_stats(request: Request, call_next):
+    with track_queries() as stats:
+        response = await call_next(request)
+    response.headers["X-Query-Count"] = str(stats.count)
+    response.headers["X-Query-Time-Ms"] = f"{stats.total_time * 1000:.1f}"
+    return response
+
+
+def get_db():
     s = get_session()
-    u = s.query(User).filter_by(email=email).one_or_none()
+    try:
+        yield s
+    finally:
+        s.close()
+
+
+def current_user(
+    creds: HTTPAuthorizationCredentials | None = Depends(bearer),
+    s=Depends(get_db),
+) -> Principal:
+    if creds is None:
+        raise HTTPException(401, "Missing bearer token", headers={"WWW-Authenticate": "Bearer"})
+    u = verify_token(s, creds.credentials)
     if not u:
-        raise HTTPException(401, "Unknown user")
+        raise HTTPException(401, "Invalid or revoked token", headers={"WWW-Authenticate": "Bearer"})
     return u
 
 
+class TokenRequest(BaseModel):
+    email: str
+    password: str
+
+
+@app.post("/auth/token")
+def create_token(body: TokenRequest, s=Depends(get_db)):
+    token = issue_token(s, body.email, body.password)
+    if not token:
+        raise HTTPException(401, "Invalid credentials")
+    return {"access_token": token, "token_type": "bearer"}
+
+
+@app.post("/auth/revoke")
+def revoke(
+    creds: HTTPAuthorizationCredentials | None = Depends(bearer),
+    u: Principal = Depends(current_user),
+    s=Depends(get_db),
+):
+    revoke_token(s, creds.credentials)
+    return {"revoked": True}
+
+
+def claim_to_dict(r: Claim) -> dict:
+    return {
+        "claim_id": r.claim_id,
+        "text": r.text,
+        "drift_score": r.drift_score,
+        "confidence_index": r.confidence_index,
+        "provenance_completeness": r.provenance_completeness,
+        "independence_score": r.independence_score,
+        "created_at": r.created_at.isoformat(),
+        "volatility": r.volatility,
+    }
+
+
 @app.get("/claims")
-def list_claims(email: str):
-    s = get_session()
-    u = get_user(email)
-    rows = (
-        s.query(Claim)
-        .filter(Claim.user_id == u.id)
-        .order_by(Claim.created_at.desc())
-        .all()
-    )
-    return [
-        {
-            "claim_id": r.claim_id,
-            "text": r.text,
-            "drift_score": r.drift_score,
-            "confidence_index": r.confidence_index,
-            "provenance_completeness": r.provenance_completeness,
-            "independence_score": r.independence_score,
-            "created_at": r.created_at.isoformat(),
-            "volatility": r.volatility,
-        }
-        for r in rows
-    ]
+def list_claims(
+    limit: int | None = None,
+    include_history: bool = False,
+    u: Principal = Depends(current_user),
+    s=Depends(get_db),
+):
+    rows = ledger_list_claims(s, u, limit, with_history=include_history)
+    out = [claim_to_dict(r) for r in rows]
+    if include_history:
+        for d, r in zip(out, rows):
+            d["history"] = [{"t": h.t.isoformat(), "drift": h.drift} for h in r.histories]
+    return out
+
+
+@app.get("/claims/search")
+def claims_search(
+    q: str,
+    limit: int = 20,
+    prefix: bool = True,
+    u: Principal = Depends(current_user),
+    s=Depends(get_db),
+):
+    rows = search_claims(s, u, q, limit=min(max(limit, 1), 200), prefix=prefix)
+    return [claim_to_dict(r) for r in rows]
+
 
+@app.get("/claims/summary")
+def claims_summary(u: Principal = Depends(current_user), s=Depends(get_db)):
+    return get_claim_summary(s, u)
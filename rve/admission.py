@@ -0,0 +1,226 @@
+"""Admission control for model requests.
+
+Every generation asks the process-wide :data:`controller` for a slot first:
+
+* each identified user has a token bucket (``RVE_ADMIT_RATE`` requests per
+  second, bursts of ``RVE_ADMIT_BURST``), so one user cannot take the whole
+  API quota;
+* at most ``RVE_ADMIT_MAX_CONCURRENT`` generations run at once;
+* requests that must wait for a slot queue per user and are served round
+  robin across users, so a user with many queued requests does not delay
+  others by more than one turn.  Waiting longer than ``RVE_ADMIT_QUEUE_TIMEOUT``
+  raises :class:`AdmissionRejected`.
+
+Requests without a user id skip the bucket but still share the concurrency
+cap, queued under one anonymous key.  Interactive callers should pass a
+per-session key instead (see :func:`session_key`).  Buckets that have refilled
+completely are forgotten, since a new bucket starts full anyway, and at most
+``RVE_ADMIT_MAX_BUCKETS`` are kept.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Hashable, Iterable, Iterator, Optional
+
+from .latency import percentile
+
+RATE_PER_SECOND = float(os.getenv("RVE_ADMIT_RATE", "0.5"))
+BURST = float(os.getenv("RVE_ADMIT_BURST", "5"))
+MAX_CONCURRENT = int(os.getenv("RVE_ADMIT_MAX_CONCURRENT", "8"))
+QUEUE_TIMEOUT = float(os.getenv("RVE_ADMIT_QUEUE_TIMEOUT", "30"))
+MAX_BUCKETS = int(os.getenv("RVE_ADMIT_MAX_BUCKETS", "10000"))
+ANONYMOUS = "anonymous"
+
+
+class AdmissionRejected(RuntimeError):
+    def __init__(self, reason: str, retry_after: Optional[float] = None):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = burst
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, cost: float = 1.0) -> float:
+        """Take ``cost`` tokens, going into debt if needed; return seconds until it is covered."""
+        self._refill()
+        self.tokens -= cost
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def refund(self, cost: float = 1.0):
+        self.tokens = min(self.burst, self.tokens + cost)
+
+    def full(self) -> bool:
+        """Whether the bucket has refilled to ``burst``, i.e. is as good as new."""
+        self._refill()
+        return self.tokens >= self.burst
+
+
+def session_key() -> Optional[str]:
+    """``"session:<id>"`` for the current Streamlit session, or ``None`` outside one."""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+    except ImportError:
+        return None
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return f"session:{ctx.session_id}" if ctx is not None else None
+
+
+class _Waiter:
+    __slots__ = ("event", "granted")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.granted = False
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_concurrent: int = MAX_CONCURRENT,
+        rate: float = RATE_PER_SECOND,
+        burst: float = BURST,
+        queue_timeout: float = QUEUE_TIMEOUT,
+        max_buckets: int = MAX_BUCKETS,
+    ):
+        self.max_concurrent = max_concurrent
+        self.rate = rate
+        self.burst = burst
+        self.queue_timeout = queue_timeout
+        self.max_buckets = max_buckets
+        self._lock = threading.Lock()
+        self._buckets: "OrderedDict[Hashable, TokenBucket]" = OrderedDict()  # least recently used first
+        self._queues: "OrderedDict[Hashable, Deque[_Waiter]]" = OrderedDict()
+        self._active = 0
+        self._active_by_user: Dict[Hashable, int] = {}
+        self._waits: Deque[float] = deque(maxlen=500)
+        self.counters = {"admitted": 0, "rejected_rate": 0, "rejected_timeout": 0}
+
+    # --- rate limit ---------------------------------------------------------
+
+    def _check_rate(self, user: Hashable, cost: float, deadline: float):
+        """Wait for ``user``'s bucket to cover ``cost``, or reject if that takes too long."""
+        if user == ANONYMOUS or self.rate <= 0:
+            return
+        with self._lock:
+            bucket = self._buckets.get(user)
+            if bucket is None:
+                self._prune_buckets_locked()
+                bucket = self._buckets[user] = TokenBucket(self.rate, self.burst)
+            else:
+                self._buckets.move_to_end(user)
+            delay = bucket.reserve(cost)
+            if delay > deadline - time.monotonic():
+                bucket.refund(cost)
+                self.counters["rejected_rate"] += 1
+                raise AdmissionRejected(f"rate limit exceeded for {user}", retry_after=round(delay, 2))
+        if delay:
+            time.sleep(delay)
+
+    def _prune_buckets_locked(self):
+        """Drop idle buckets from the LRU end, and the oldest beyond ``max_buckets - 1``."""
+        while self._buckets:
+            user, bucket = next(iter(self._buckets.items()))
+            if len(self._buckets) < self.max_buckets and not bucket.full():
+                return
+            del self._buckets[user]
+
+    # --- concurrency and fair queue ------------------------------------------
+
+    def _grant_locked(self):
+        while self._active < self.max_concurrent and self._queues:
+            user, waiters = next(iter(self._queues.items()))
+            waiter = waiters.popleft()
+            if waiters:
+                self._queues.move_to_end(user)  # round robin: this user goes to the back
+            else:
+                del self._queues[user]
+            self._take_locked(user)
+            waiter.granted = True
+            waiter.event.set()
+
+    def _take_locked(self, user: Hashable):
+        self._active += 1
+        self._active_by_user[user] = self._active_by_user.get(user, 0) + 1
+        self.counters["admitted"] += 1
+
+    def _acquire(self, user: Hashable, deadline: float):
+        start = time.monotonic()
+        with self._lock:
+            if self._active < self.max_concurrent and not self._queues:
+                self._take_locked(user)
+                self._waits.append(0.0)
+                return
+            waiter = _Waiter()
+            self._queues.setdefault(user, deque()).append(waiter)
+        waiter.event.wait(max(deadline - time.monotonic(), 0))
+        with self._lock:
+            if not waiter.granted:
+                waiters = self._queues.get(user)
+                if waiters is not None:
+                    waiters.remove(waiter)
+                    if not waiters:
+                        del self._queues[user]
+                self.counters["rejected_timeout"] += 1
+                raise AdmissionRejected(f"no capacity within {self.queue_timeout:.0f}s")
+            self._waits.append(time.monotonic() - start)
+
+    def _release(self, user: Hashable):
+        with self._lock:
+            self._active -= 1
+            n = self._active_by_user.get(user, 1) - 1
+            if n:
+                self._active_by_user[user] = n
+            else:
+                self._active_by_user.pop(user, None)
+            self._grant_locked()
+
+    @contextmanager
+    def slot(self, user_id: Optional[Hashable] = None, cost: float = 1.0) -> Iterator[None]:
+        """Hold one generation slot for ``user_id`` for the duration of the block."""
+        user = ANONYMOUS if user_id is None else user_id
+        deadline = time.monotonic() + self.queue_timeout
+        self._check_rate(user, cost, deadline)
+        self._acquire(user, deadline)
+        try:
+            yield
+        finally:
+            self._release(user)
+
+    def admit_stream(self, user_id: Optional[Hashable], stream: Iterable[str], cost: float = 1.0) -> Iterator[str]:
+        """Yield from ``stream`` while holding a slot (admission happens on first ``next``)."""
+        with self.slot(user_id, cost):
+            yield from stream
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = list(self._waits)
+            return {
+                **self.counters,
+                "active": self._active,
+                "max_concurrent": self.max_concurrent,
+                "buckets": len(self._buckets),
+                "queue_depth": sum(len(q) for q in self._queues.values()),
+                "queue_depth_by_user": {str(u): len(q) for u, q in self._queues.items()},
+                "active_by_user": {str(u): n for u, n in self._active_by_user.items()},
+                "wait_ms_p50": round(percentile(waits, 0.5) * 1000, 1) if waits else None,
+                "wait_ms_p95": round(percentile(waits, 0.95) * 1000, 1) if waits else None,
+            }
+
+
+controller = AdmissionController()
@@ -0,0 +1,122 @@
+"""Batched, resumable data backfills for Alembic migrations.
+
+A single ``UPDATE big_table SET col = ...`` holds locks on every row for the
+whole statement.  :func:`backfill_column` instead walks the primary key in
+ranges of ``batch_size``, sleeping ``throttle`` seconds between batches, and
+records the last finished key in the ``rve_backfill_progress`` table so that a
+rerun of an interrupted migration picks up where it stopped.  Run it inside
+``op.get_context().autocommit_block()`` so each batch commits on its own::
+
+    with op.get_context().autocommit_block():
+        backfill_column(conn, "claims", "user_id", ":uid", {"uid": demo_id})
+    require_backfilled(conn, "claims", "user_id")
+    op.alter_column("claims", "user_id", nullable=False)
+"""
+from __future__ import annotations
+
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+
+import sqlalchemy as sa
+
+PROGRESS_TABLE = "rve_backfill_progress"
+DEFAULT_BATCH_SIZE = int(os.getenv("RVE_BACKFILL_BATCH_SIZE", "10000"))
+DEFAULT_THROTTLE = float(os.getenv("RVE_BACKFILL_THROTTLE", "0"))
+
+_meta = sa.MetaData()
+progress_table = sa.Table(
+    PROGRESS_TABLE,
+    _meta,
+    sa.Column("name", sa.String(128), primary_key=True),
+    sa.Column("last_pk", sa.BigInteger, nullable=False, default=0),
+    sa.Column("done", sa.Boolean, nullable=False, default=False),
+    sa.Column("updated_at", sa.DateTime, default=datetime.utcnow),
+)
+
+
+class BackfillIncomplete(RuntimeError):
+    pass
+
+
+def _progress(conn, name: str) -> Optional[Dict[str, Any]]:
+    row = conn.execute(
+        sa.select(progress_table.c.last_pk, progress_table.c.done).where(
+            progress_table.c.name == name
+        )
+    ).one_or_none()
+    return dict(row._mapping) if row else None
+
+
+def _save_progress(conn, name: str, last_pk: int, done: bool = False):
+    values = {"last_pk": last_pk, "done": done, "updated_at": datetime.utcnow()}
+    updated = conn.execute(
+        progress_table.update().where(progress_table.c.name == name).values(**values)
+    )
+    if not updated.rowcount:
+        conn.execute(progress_table.insert().values(name=name, **values))
+
+
+def backfill_column(
+    conn,
+    table: str,
+    column: str,
+    value_sql: str,
+    params: Optional[Dict[str, Any]] = None,
+    *,
+    name: Optional[str] = None,
+    pk: str = "id",
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    throttle: float = DEFAULT_THROTTLE,
+    only_null: bool = True,
+) -> int:
+    """Set ``table.column = value_sql`` in primary-key ranges; return rows updated.
+
+    ``value_sql`` is a SQL expression that may reference bind ``params``.
+    With ``only_null`` only rows where the column is still NULL are touched,
+    which makes replaying a half-finished batch harmless.
+    """
+    name = name or f"{table}.{column}"
+    progress_table.create(conn, checkfirst=True)
+    state = _progress(conn, name)
+    if state and state["done"]:
+        return 0
+    last_pk = state["last_pk"] if state else 0
+    max_pk = conn.execute(sa.text(f"SELECT MAX({pk}) FROM {table}")).scalar()
+
+    where = f"{pk} > :lo AND {pk} <= :hi"
+    if only_null:
+        where += f" AND {column} IS NULL"
+    stmt = sa.text(f"UPDATE {table} SET {column} = {value_sql} WHERE {where}")
+
+    total = 0
+    while max_pk is not None and last_pk < max_pk:
+        hi = min(last_pk + batch_size, max_pk)
+        total += conn.execute(stmt, {**(params or {}), "lo": last_pk, "hi": hi}).rowcount
+        last_pk = hi
+        _save_progress(conn, name, last_pk)
+        if throttle and last_pk < max_pk:
+            time.sleep(throttle)
+    _save_progress(conn, name, last_pk, done=True)
+    return total
+
+
+def clear_progress(conn, names: Iterable[str]):
+    """Forget the checkpoints for ``names`` (e.g. from a migration's downgrade)."""
+    if sa.inspect(conn).has_table(PROGRESS_TABLE):
+        conn.execute(progress_table.delete().where(progress_table.c.name.in_(list(names))))
+
+
+def count_nulls(conn, table: str, column: str) -> int:
+    return conn.execute(sa.text(f"SELECT COUNT(*) FROM {table} WHERE {column} IS NULL")).scalar()
+
+
+def require_backfilled(conn, table: str, column: str):
+    """Raise :class:`BackfillIncomplete` unless ``table.column`` has no NULLs left.
+
+    Call this right before tightening the column to NOT NULL.
+    """
+    missing = count_nulls(conn, table, column)
+    if missing:
+        raise BackfillIncomplete(f"{table}.{column} still has {missing} NULL rows")
@@ -0,0 +1,207 @@
+"""Concurrent batch generation with ``sareth_chat`` over JSONL.
+
+Each input line is ``{"id": ..., "input": "...", "history": [...]}``; ``id``
+defaults to the line number, ``prompt`` is accepted for ``input`` and history
+entries may be ``[role, text]`` pairs or ``{"role", "content"}`` dicts.
+Replies are generated by a bounded pool of workers and appended to the output
+JSONL as they complete, with per-item latency, token usage and attempt count.
+
+The output file doubles as the checkpoint: on restart, items already written
+without an error are skipped, so an interrupted run resumes where it stopped
+and failed items get another chance::
+
+    python -m rve.batch eval.jsonl replies.jsonl --concurrency 16
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from .latency import percentile
+from .llm import backoff_delay
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_RETRIES = 2
+
+Generate = Callable[[str, List[Tuple[str, str]]], Tuple[str, Dict[str, Any]]]
+
+
+def _history(raw) -> List[Tuple[str, str]]:
+    out = []
+    for h in raw or []:
+        if isinstance(h, dict):
+            out.append((h.get("role", "user"), h.get("content", "")))
+        else:
+            out.append((h[0], h[1]))
+    return out
+
+
+def read_items(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            yield {
+                "id": row.get("id", n),
+                "input": row.get("input", row.get("prompt", "")),
+                "history": _history(row.get("history")),
+            }
+
+
+def completed_ids(output_path: str) -> Set[Any]:
+    """Ids already answered in ``output_path``; a torn final line is cut off."""
+    done: Set[Any] = set()
+    if not os.path.exists(output_path):
+        return done
+    good = 0
+    with open(output_path, "rb") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                break
+            good += len(line)
+            if not row.get("error"):
+                done.add(row["id"])
+    if good != os.path.getsize(output_path):
+        with open(output_path, "r+b") as f:
+            f.truncate(good)
+    return done
+
+
+def _default_generate() -> Generate:
+    import sareth_chat
+
+    return sareth_chat.generate_reply_with_usage
+
+
+def _run_item(item: Dict[str, Any], generate: Generate, retries: int) -> Dict[str, Any]:
+    start = time.perf_counter()
+    attempt = 0
+    while True:
+        attempt += 1
+        t0 = time.perf_counter()
+        try:
+            reply, usage = generate(item["input"], item["history"])
+            return {
+                "id": item["id"],
+                "input": item["input"],
+                "reply": reply,
+                "latency_ms": round((time.perf_counter() - t0) * 1000, 1),
+                "total_ms": round((time.perf_counter() - start) * 1000, 1),
+                "usage": usage,
+                "attempts": attempt,
+            }
+        except Exception as exc:
+            if attempt > retries:
+                return {
+                    "id": item["id"],
+                    "input": item["input"],
+                    "error": f"{type(exc).__name__}: {exc}",
+                    "total_ms": round((time.perf_counter() - start) * 1000, 1),
+                    "attempts": attempt,
+                }
+            time.sleep(backoff_delay(attempt - 1))
+
+
+def run_batch(
+    input_path: str,
+    output_path: str,
+    *,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    retries: int = DEFAULT_RETRIES,
+    resume: bool = True,
+    generate: Optional[Generate] = None,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """Answer every item of ``input_path`` into ``output_path``; return a summary.
+
+    At most ``concurrency`` items are in flight (and about as many more read
+    ahead), so inputs of any size stream through in constant memory.
+    """
+    generate = generate or _default_generate()
+    if resume:
+        done = completed_ids(output_path)
+    else:
+        done = set()
+        open(output_path, "w").close()
+    lock = threading.Lock()
+    latencies: List[float] = []
+    summary = {"ok": 0, "failed": 0, "skipped": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached": 0}
+    start = time.perf_counter()
+
+    with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=concurrency) as pool:
+
+        def write(result: Dict[str, Any]):
+            with lock:
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+                if "error" in result:
+                    summary["failed"] += 1
+                else:
+                    summary["ok"] += 1
+                    latencies.append(result["latency_ms"])
+                    usage = result["usage"] or {}
+                    summary["prompt_tokens"] += usage.get("prompt_tokens", 0)
+                    summary["completion_tokens"] += usage.get("completion_tokens", 0)
+                    summary["cached"] += bool(usage.get("cached"))
+            if progress:
+                progress(result)
+
+        pending = set()
+        for item in read_items(input_path):
+            if item["id"] in done:
+                summary["skipped"] += 1
+                continue
+            if len(pending) >= concurrency * 2:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    write(fut.result())
+            pending.add(pool.submit(_run_item, item, generate, retries))
+        for fut in wait(pending).done:
+            write(fut.result())
+
+    wall = time.perf_counter() - start
+    summary.update(
+        wall_s=round(wall, 3),
+        items_per_s=round((summary["ok"] + summary["failed"]) / wall, 2) if wall else None,
+        latency_ms_p50=percentile(latencies, 0.5),
+        latency_ms_p95=percentile(latencies, 0.95),
+    )
+    return summary
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Generate sareth_chat replies for a JSONL file.")
+    p.add_argument("input")
+    p.add_argument("output")
+    p.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    p.add_argument("--retries", type=int, default=DEFAULT_RETRIES, help="extra attempts per failed item")
+    p.add_argument("--restart", action="store_true", help="ignore existing output instead of resuming")
+    p.add_argument("--quiet", action="store_true")
+    args = p.parse_args(argv)
+
+    def progress(r):
+        if not args.quiet:
+            status = r.get("error") or f"{r['latency_ms']:.0f} ms"
+            print(f"{r['id']}: {status}", flush=True)
+
+    summary = run_batch(
+        args.input,
+        args.output,
+        concurrency=args.concurrency,
+        retries=args.retries,
+        resume=not args.restart,
+        progress=progress,
+    )
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""Two-tier cache for model responses.
+
+Keys are a SHA-256 over the normalised request (message list plus generation
+parameters), so the same conversation state asked with the same settings maps
+to the same entry.  Lookups hit an in-process LRU first and fall back to a
+directory of small JSON files shared by every process on the host.  Disk
+entries expire after ``RVE_RESPONSE_CACHE_TTL`` seconds and the least
+recently written files are evicted once the directory grows past
+``RVE_RESPONSE_CACHE_MAX_BYTES``.  Sampling above
+``RVE_RESPONSE_CACHE_MAX_TEMPERATURE`` is meant to vary, so such requests
+bypass the cache.  The disk tier is best effort: a directory that cannot be
+written is logged and counted in ``stats()["disk_errors"]``, never raised.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, Optional, Sequence, Tuple
+
+log = logging.getLogger("rve.cache")
+
+CACHE_DIR = os.getenv("RVE_RESPONSE_CACHE_DIR", os.path.join(".cache", "rve-responses"))
+CACHE_TTL_SECONDS = float(os.getenv("RVE_RESPONSE_CACHE_TTL", "86400"))
+CACHE_MAX_BYTES = int(os.getenv("RVE_RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_MAX_ENTRIES = int(os.getenv("RVE_RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+# Sareth replies default to temperature 0.7, which is sampled and should vary.
+CACHE_MAX_TEMPERATURE = float(os.getenv("RVE_RESPONSE_CACHE_MAX_TEMPERATURE", "0.2"))
+
+
+def _normalize_messages(messages: Sequence[Mapping[str, Any]]):
+    return [
+        {"role": m.get("role", ""), "content": " ".join(str(m.get("content") or "").split())}
+        for m in messages
+    ]
+
+
+def cache_key(messages: Sequence[Mapping[str, Any]], params: Mapping[str, Any]) -> str:
+    """Stable digest of a chat request; whitespace-only differences hash alike."""
+    payload = {"messages": _normalize_messages(messages), "params": dict(params)}
+    blob = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Thread-safe memory LRU in front of an optional on-disk TTL store."""
+
+    def __init__(
+        self,
+        directory: Optional[str] = CACHE_DIR,
+        ttl: float = CACHE_TTL_SECONDS,
+        max_bytes: int = CACHE_MAX_BYTES,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        max_temperature: float = CACHE_MAX_TEMPERATURE,
+    ):
+        self.directory = directory or None
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.max_temperature = max_temperature
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes: Optional[int] = None  # measured lazily on first write
+        self.hits = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.disk_errors = 0
+
+    def accepts(self, temperature: float) -> bool:
+        """Whether a request at ``temperature`` may be served from the cache."""
+        if temperature > self.max_temperature:
+            with self._lock:
+                self.bypassed += 1
+            return False
+        return True
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[1] >= now:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                self.memory_hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._memory[key]
+        value, expires = self._disk_get(key, now)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._remember(key, value, expires)
+        return value
+
+    def put(self, key: str, value: str):
+        expires = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, value, expires)
+        self._disk_put(key, value, expires)
+
+    def _remember(self, key: str, value: str, expires: float):
+        self._memory[key] = (value, expires)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _disk_get(self, key: str, now: float) -> Tuple[Optional[str], float]:
+        if not self.directory:
+            return None, 0.0
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None, 0.0
+        if entry.get("expires", 0) < now:
+            self._remove(path)
+            return None, 0.0
+        return entry.get("value"), entry["expires"]
+
+    def _disk_put(self, key: str, value: str, expires: float):
+        if not self.directory:
+            return
+        path = self._path(key)
+        data = json.dumps({"value": value, "expires": expires}, ensure_ascii=False).encode("utf-8")
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp, "wb") as f:
+                f.write(data)
+            try:
+                replaced = os.stat(path).st_size  # an overwrite frees the old entry's bytes
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp, path)
+        except OSError as exc:
+            log.warning("response cache: cannot write %s: %s", path, exc)
+            with self._lock:
+                self.disk_errors += 1
+            self._remove(tmp)
+            return
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, size, _ in self._disk_files())
+            else:
+                self._disk_bytes += len(data) - replaced
+            over = self._disk_bytes > self.max_bytes
+        if over:
+            self.evict()
+
+    def _disk_files(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, st.st_size, st.st_mtime
+
+    def _remove(self, path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def evict(self) -> int:
+        """Drop expired disk entries, then the oldest until under ``max_bytes``."""
+        if not self.directory:
+            return 0
+        now = time.time()
+        files = sorted(self._disk_files(), key=lambda f: f[2])
+        total = sum(size for _, size, _ in files)
+        # Leave some headroom so a full cache does not rescan on every write.
+        target = int(self.max_bytes * 0.9)
+        removed = 0
+        for path, size, mtime in files:
+            if total <= target and mtime + self.ttl >= now:
+                continue
+            if self._remove(path):
+                total -= size
+                removed += 1
+        with self._lock:
+            self._disk_bytes = total
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self.directory:
+            for path, _, _ in list(self._disk_files()):
+                self._remove(path)
+            with self._lock:
+                self._disk_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "disk_errors": self.disk_errors,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_bytes": self._disk_bytes,
+            }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,102 @@
+"""Durable live-chat history.
+
+A conversation is identified by a key kept in the page URL (``?c=...``), so
+a rerun served by another replica, or after a restart, finds it again.
+Opening a session does one lookup and loads only the last
+``RVE_CHAT_RESTORE`` messages; after that, messages are handed to a
+write-behind buffer, so the chat path never waits on an INSERT.  Message
+numbers are assigned by the database when the buffer is written.  A key
+that belongs to another user's conversation opens a fresh conversation
+instead.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from .ledger import (
+    get_or_create_conversation,
+    get_session,
+    latest_conversation,
+    load_recent_messages,
+    record_chat_messages,
+)
+from .writebehind import WriteBehind
+
+RESTORE_MESSAGES = int(os.getenv("RVE_CHAT_RESTORE", "50"))
+
+_writer: Optional[WriteBehind] = None
+_writer_lock = threading.Lock()
+
+
+def _flush_messages(rows: List[dict]):
+    sess = get_session()
+    try:
+        record_chat_messages(sess, rows)
+    finally:
+        sess.close()
+
+
+def get_chat_writer() -> WriteBehind:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = WriteBehind(_flush_messages, name="chat-messages")
+        return _writer
+
+
+class ChatSessionStore:
+    def __init__(self, conversation_id: int, key: str, writer: Optional[WriteBehind] = None):
+        self.conversation_id = conversation_id
+        self.key = key
+        self._writer = writer
+
+    @property
+    def writer(self) -> WriteBehind:
+        return self._writer or get_chat_writer()
+
+    def append(self, role: str, content: str):
+        self.writer.put(
+            {
+                "conversation_id": self.conversation_id,
+                "role": role,
+                "content": content,
+                "created_at": datetime.utcnow(),
+            }
+        )
+
+
+def open_chat_session(
+    key: Optional[str] = None,
+    user_id: Optional[int] = None,
+    limit: int = RESTORE_MESSAGES,
+    sess=None,
+    writer: Optional[WriteBehind] = None,
+) -> Tuple[ChatSessionStore, List[Dict[str, str]]]:
+    """Resume conversation ``key`` (or the user's latest, or a new one).
+
+    Returns the store and the last ``limit`` messages as chat dicts.  A
+    conversation owned by a different user is never loaded: a new one is
+    started for ``user_id`` instead.
+    """
+    own = sess is None
+    sess = sess or get_session()
+    try:
+        conv = None
+        if key is None and user_id is not None:
+            conv = latest_conversation(sess, user_id)
+        if conv is None:
+            conv = get_or_create_conversation(sess, key or str(uuid.uuid4()), user_id)
+            if conv.user_id is not None and conv.user_id != user_id:
+                conv = get_or_create_conversation(sess, str(uuid.uuid4()), user_id)
+        # Messages still sitting in this process's buffer are not visible yet.
+        (writer or get_chat_writer()).flush(timeout=5)
+        recent = load_recent_messages(sess, conv.id, limit)
+        store = ChatSessionStore(conv.id, conv.key, writer)
+        return store, [{"role": m["role"], "content": m["content"]} for m in recent]
+    finally:
+        if own:
+            sess.close()
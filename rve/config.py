@@ -1,4 +1,5 @@
 import os
+from typing import Dict
 
 
 def get_db_url() -> str:
@@ -14,3 +15,22 @@ def env_bool(name: str, default=False) -> bool:
     val = os.getenv(name, str(default)).lower()
     return val in ("1", "true", "yes", "on")
 
+
+def get_shard_urls() -> Dict[str, str]:
+    """Ledger shards as ``{name: url}``.
+
+    ``RVE_SHARD_URLS`` is a comma-separated list of ``name=url`` or bare
+    ``url`` entries (bare entries are named ``shard0``, ``shard1``, ...).
+    Without it the single ``get_db_url()`` database is the only shard.
+    Names, not URLs, decide placement, so keep them stable.
+    """
+    raw = os.getenv("RVE_SHARD_URLS", "").strip()
+    if not raw:
+        return {"default": get_db_url()}
+    shards = {}
+    for i, item in enumerate(x.strip() for x in raw.split(",") if x.strip()):
+        name, sep, url = item.partition("=")
+        if not sep or "://" in name:
+            name, url = f"shard{i}", item
+        shards[name.strip()] = url.strip()
+    return shards
@@ -0,0 +1,148 @@
+"""Token-budgeted context window for chat requests.
+
+Instead of sending the whole conversation on every turn, :class:`ContextWindow`
+keeps the most recent turns verbatim within a token budget and folds older
+turns into a running summary.  Token counts are computed once per message and
+turns are folded in batches, so the work per turn stays flat however long the
+conversation gets.  Counting uses ``tiktoken`` when it is installed and a
+characters-per-token estimate otherwise.
+"""
+from __future__ import annotations
+
+import os
+import re
+from typing import Callable, Dict, List, Optional, Sequence
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - depends on environment
+    tiktoken = None
+
+CONTEXT_BUDGET = int(os.getenv("RVE_CONTEXT_BUDGET", "6000"))
+SUMMARY_BUDGET = int(os.getenv("RVE_SUMMARY_BUDGET", "800"))
+MESSAGE_OVERHEAD = 4  # role and separators per chat message
+CHARS_PER_TOKEN = 4
+SUMMARY_LINE_CHARS = 160
+
+Message = Dict[str, str]
+Summarizer = Callable[[str, Sequence[Message]], str]
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    global _encoding
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.get_encoding("o200k_base")
+        return len(_encoding.encode(text))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def message_tokens(msg: Message) -> int:
+    return count_tokens(msg.get("content") or "") + MESSAGE_OVERHEAD
+
+
+def extractive_summary(previous: str, turns: Sequence[Message]) -> str:
+    """Append one short line per folded turn: its role and first sentence."""
+    lines = [previous] if previous else []
+    for m in turns:
+        text = " ".join((m.get("content") or "").split())
+        first = re.split(r"(?<=[.!?])\s", text, maxsplit=1)[0]
+        if len(first) > SUMMARY_LINE_CHARS:
+            first = first[: SUMMARY_LINE_CHARS - 1] + "…"
+        lines.append(f"- {m['role']}: {first}")
+    return "\n".join(lines)
+
+
+class ContextWindow:
+    """Incrementally maintained view of a conversation that fits ``budget`` tokens.
+
+    Call :meth:`sync` with the full history (only new messages are counted),
+    then :meth:`messages` for the request payload.  When the verbatim tail
+    outgrows its share of the budget, the oldest turns are handed to
+    ``summarizer(previous_summary, turns)``; the summary itself is trimmed
+    from the front to ``summary_budget`` tokens.
+    """
+
+    def __init__(
+        self,
+        system_prompt: str = "",
+        budget: int = CONTEXT_BUDGET,
+        summary_budget: int = SUMMARY_BUDGET,
+        summarizer: Optional[Summarizer] = None,
+    ):
+        self.budget = budget
+        self.summary_budget = summary_budget
+        self.summarizer = summarizer or extractive_summary
+        self.system_prompt = ""
+        self._system_tokens = 0
+        self.set_system_prompt(system_prompt)
+        self.reset()
+
+    def reset(self):
+        self._turns: List[Message] = []
+        self._counts: List[int] = []
+        self._start = 0  # turns before this index live in the summary
+        self._recent_tokens = 0
+        self.summary = ""
+        self._summary_tokens = 0
+
+    def set_system_prompt(self, prompt: str):
+        if prompt != self.system_prompt:
+            self.system_prompt = prompt
+            self._system_tokens = message_tokens({"content": prompt}) if prompt else 0
+
+    def append(self, msg: Message):
+        n = message_tokens(msg)
+        self._turns.append(msg)
+        self._counts.append(n)
+        self._recent_tokens += n
+        self._fold()
+
+    def sync(self, history: Sequence[Message]):
+        """Catch up with ``history``; a shorter history means it was cleared."""
+        if len(history) < len(self._turns):
+            self.reset()
+        for msg in history[len(self._turns):]:
+            self.append(msg)
+
+    def _fold(self):
+        room = self.budget - self._system_tokens - self.summary_budget
+        if self._recent_tokens <= room:
+            return
+        # Fold down to half the room so the summarizer runs once per batch of
+        # turns rather than on every new message.
+        target = room // 2
+        first = self._start
+        while self._recent_tokens > target and self._start < len(self._turns) - 1:
+            self._recent_tokens -= self._counts[self._start]
+            self._start += 1
+        self.summary = self._trim_summary(self.summarizer(self.summary, self._turns[first:self._start]))
+        self._summary_tokens = message_tokens({"content": self.summary}) if self.summary else 0
+
+    def _trim_summary(self, summary: str) -> str:
+        lines = summary.splitlines()
+        while len(lines) > 1 and count_tokens("\n".join(lines)) > self.summary_budget:
+            lines = lines[max(1, len(lines) // 4):]
+        return "\n".join(lines)
+
+    def messages(self) -> List[Message]:
+        out: List[Message] = []
+        if self.system_prompt:
+            out.append({"role": "system", "content": self.system_prompt})
+        if self.summary:
+            out.append({"role": "system", "content": "Summary of earlier conversation:\n" + self.summary})
+        out.extend(self._turns[self._start:])
+        return out
+
+    def usage(self) -> Dict[str, int]:
+        return {
+            "budget": self.budget,
+            "system_tokens": self._system_tokens,
+            "summary_tokens": self._summary_tokens,
+            "recent_tokens": self._recent_tokens,
+            "total_tokens": self._system_tokens + self._summary_tokens + self._recent_tokens,
+            "recent_turns": len(self._turns) - self._start,
+            "summarized_turns": self._start,
+        }
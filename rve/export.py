@@ -0,0 +1,278 @@
+"""Columnar export of ``claims`` and ``drift_history`` for offline analytics.
+
+Rows are streamed from a server-side cursor in fixed-size chunks and each chunk
+is written as one columnar part file, so memory stays flat no matter how large
+the tables are.  Parquet (via ``pyarrow``) is used when available, otherwise
+each part is a NumPy ``.npz`` archive.  A ``_watermark.json`` file in the
+output directory records the last exported primary key per table, together
+with the ``user_id``/``since``/``until`` filters of the export, so an
+interrupted or periodic export can resume where it stopped.  Resuming with
+different filters is refused, since the stored ids would skip rows; an
+export without resume starts over and deletes the earlier part files.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import Boolean, DateTime, Float, Integer, select
+
+from .ledger import Claim, DriftHistory, User, get_engine, get_session
+
+try:  # optional dependency
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - depends on environment
+    pa = None
+
+EXPORT_TABLES = {"claims": Claim, "drift_history": DriftHistory}
+TIME_COLUMNS = {"claims": "created_at", "drift_history": "t"}
+WATERMARK_FILE = "_watermark.json"
+DEFAULT_CHUNK_SIZE = 50_000
+FORMATS = ("auto", "parquet", "arrow", "npz")
+
+
+def _resolve_format(fmt: str) -> str:
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}; expected one of {FORMATS}")
+    if fmt == "auto":
+        return "parquet" if pa is not None else "npz"
+    if fmt in ("parquet", "arrow") and pa is None:
+        raise RuntimeError(f"Format {fmt!r} requires pyarrow; install it or use 'npz'.")
+    return fmt
+
+
+def _filter_key(user_id: Optional[int], since: Optional[datetime], until: Optional[datetime]) -> Dict[str, Any]:
+    return {
+        "user_id": user_id,
+        "since": since.isoformat() if since else None,
+        "until": until.isoformat() if until else None,
+    }
+
+
+def _read_state(out_dir: str) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    path = os.path.join(out_dir, WATERMARK_FILE)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return _filter_key(None, None, None), {}
+    if "marks" not in state:  # written before filters were recorded
+        return _filter_key(None, None, None), {k: int(v) for k, v in state.items()}
+    return state["filters"], {k: int(v) for k, v in state["marks"].items()}
+
+
+def read_watermark(out_dir: str) -> Dict[str, int]:
+    return _read_state(out_dir)[1]
+
+
+def _write_watermark(out_dir: str, marks: Dict[str, int], filters: Dict[str, Any]):
+    path = os.path.join(out_dir, WATERMARK_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"filters": filters, "marks": marks}, f)
+    os.replace(tmp, path)
+
+
+def _numpy_column(col, values: List[Any]) -> np.ndarray:
+    if isinstance(col.type, Boolean):
+        return np.array([bool(v) for v in values], dtype=bool)
+    if isinstance(col.type, Integer):
+        return np.array([-1 if v is None else v for v in values], dtype=np.int64)
+    if isinstance(col.type, Float):
+        return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    if isinstance(col.type, DateTime):
+        return np.array(
+            [np.datetime64("NaT") if v is None else v for v in values],
+            dtype="datetime64[us]",
+        )
+    return np.array(["" if v is None else str(v) for v in values], dtype=str)
+
+
+def _write_part(fmt: str, path: str, columns, rows: List[tuple]):
+    values = list(zip(*rows))
+    if fmt == "npz":
+        arrays = {c.name: _numpy_column(c, v) for c, v in zip(columns, values)}
+        np.savez(path, **arrays)
+        return
+    table = pa.table({c.name: list(v) for c, v in zip(columns, values)})
+    if fmt == "parquet":
+        pq.write_table(table, path)
+    else:
+        with pa_ipc.new_file(path, table.schema) as writer:
+            writer.write_table(table)
+
+
+def _existing_parts(table_dir: str) -> int:
+    if not os.path.isdir(table_dir):
+        return 0
+    return sum(1 for name in os.listdir(table_dir) if name.startswith("part-"))
+
+
+def _clear_export(out_dir: str):
+    for name in EXPORT_TABLES:
+        table_dir = os.path.join(out_dir, name)
+        if os.path.isdir(table_dir):
+            for part in os.listdir(table_dir):
+                if part.startswith("part-"):
+                    os.remove(os.path.join(table_dir, part))
+    try:
+        os.remove(os.path.join(out_dir, WATERMARK_FILE))
+    except FileNotFoundError:
+        pass
+
+
+def export_table(
+    conn,
+    name: str,
+    out_dir: str,
+    *,
+    fmt: str = "auto",
+    user_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    after_id: int = 0,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    on_chunk=None,
+) -> Dict[str, Any]:
+    """Stream one table into ``out_dir/<name>/part-*.<ext>``.
+
+    ``on_chunk(last_id)`` is called after every part is durably written, which
+    is where :func:`export_ledger` advances the watermark.
+    """
+    fmt = _resolve_format(fmt)
+    table = EXPORT_TABLES[name].__table__
+    columns = list(table.columns)
+    stmt = select(*columns).where(table.c.id > after_id).order_by(table.c.id)
+    if user_id is not None:
+        stmt = stmt.where(table.c.user_id == user_id)
+    if since is not None:
+        stmt = stmt.where(table.c[TIME_COLUMNS[name]] >= since)
+    if until is not None:
+        stmt = stmt.where(table.c[TIME_COLUMNS[name]] < until)
+
+    table_dir = os.path.join(out_dir, name)
+    os.makedirs(table_dir, exist_ok=True)
+    seq = _existing_parts(table_dir)
+    ext = {"parquet": "parquet", "arrow": "arrow", "npz": "npz"}[fmt]
+    id_pos = columns.index(table.c.id)
+    rows_out, parts, last_id = 0, 0, after_id
+
+    result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(stmt)
+    for rows in result.partitions(chunk_size):
+        seq += 1
+        _write_part(fmt, os.path.join(table_dir, f"part-{seq:06d}.{ext}"), columns, rows)
+        last_id = rows[-1][id_pos]
+        rows_out += len(rows)
+        parts += 1
+        if on_chunk:
+            on_chunk(last_id)
+    return {"rows": rows_out, "parts": parts, "last_id": last_id, "format": fmt}
+
+
+def export_ledger(
+    out_dir: str,
+    tables: Iterable[str] = ("claims", "drift_history"),
+    *,
+    fmt: str = "auto",
+    user_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    resume: bool = True,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    engine=None,
+) -> Dict[str, Dict[str, Any]]:
+    """Export ledger tables to ``out_dir`` and return per-table stats.
+
+    With ``resume`` the export continues after the ids recorded in the
+    watermark file, so rerunning the same command only appends new rows.
+    Resuming an ``out_dir`` written with other filters raises ``ValueError``.
+    Without ``resume`` the part files and watermark already in ``out_dir``
+    are deleted first, so rows are not exported twice.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    filters = _filter_key(user_id, since, until)
+    marks: Dict[str, int] = {}
+    if resume:
+        stored, marks = _read_state(out_dir)
+        if marks and stored != filters:
+            raise ValueError(
+                f"{out_dir} holds an export with filters {stored}, not {filters}; "
+                "use another directory or disable resume"
+            )
+    else:
+        _clear_export(out_dir)
+    engine = engine or get_engine()
+    stats = {}
+    with engine.connect() as conn:
+        for name in tables:
+            if name not in EXPORT_TABLES:
+                raise ValueError(f"Unknown table {name!r}; expected one of {list(EXPORT_TABLES)}")
+
+            def advance(last_id, name=name):
+                marks[name] = last_id
+                _write_watermark(out_dir, marks, filters)
+
+            stats[name] = export_table(
+                conn,
+                name,
+                out_dir,
+                fmt=fmt,
+                user_id=user_id,
+                since=since,
+                until=until,
+                after_id=marks.get(name, 0),
+                chunk_size=chunk_size,
+                on_chunk=advance,
+            )
+    return stats
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Export rve ledger tables to columnar files.")
+    p.add_argument("out_dir")
+    p.add_argument("--table", action="append", choices=sorted(EXPORT_TABLES), dest="tables")
+    p.add_argument("--format", default="auto", choices=FORMATS)
+    p.add_argument("--user-id", type=int)
+    p.add_argument("--email", help="export only this user's rows")
+    p.add_argument("--since", help="ISO timestamp, inclusive")
+    p.add_argument("--until", help="ISO timestamp, exclusive")
+    p.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    p.add_argument("--no-resume", action="store_true", help="start over, deleting earlier parts in out_dir")
+    args = p.parse_args(argv)
+
+    user_id = args.user_id
+    if args.email:
+        u = get_session().query(User).filter_by(email=args.email).one_or_none()
+        if not u:
+            p.error(f"unknown user {args.email!r}")
+        user_id = u.id
+
+    try:
+        stats = export_ledger(
+            args.out_dir,
+            args.tables or ("claims", "drift_history"),
+            fmt=args.format,
+            user_id=user_id,
+            since=_parse_time(args.since),
+            until=_parse_time(args.until),
+            resume=not args.no_resume,
+            chunk_size=args.chunk_size,
+        )
+    except ValueError as exc:
+        p.error(str(exc))
+    for name, s in stats.items():
+        print(f"{name}: {s['rows']} rows in {s['parts']} {s['format']} parts (watermark {s['last_id']})")
+
+
+if __name__ == "__main__":
+    main()
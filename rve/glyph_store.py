@@ -0,0 +1,95 @@
+"""Glyph trace for live sessions: a bounded ring in memory, every event in the ledger.
+
+The UI only ever needs the latest events, so each session keeps them in a
+fixed-size ring (``RVE_GLYPH_RING``).  Every event is also handed to a
+process-wide write-behind buffer that inserts them into ``glyph_events`` in
+batches, off the request path; :func:`rve.ledger.glyph_frequencies` answers
+questions across sessions.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from .ledger import get_session, record_glyph_events
+from .writebehind import WriteBehind
+
+RING_SIZE = int(os.getenv("RVE_GLYPH_RING", "200"))
+
+_writer: Optional[WriteBehind] = None
+_writer_lock = threading.Lock()
+
+
+def _flush_events(rows: List[dict]):
+    sess = get_session()
+    try:
+        record_glyph_events(sess, rows)
+    finally:
+        sess.close()
+
+
+def get_glyph_writer() -> WriteBehind:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = WriteBehind(_flush_events, name="glyph-events")
+        return _writer
+
+
+class GlyphTraceStore:
+    """Per-session glyph trace; ``extend`` is cheap and never touches the database."""
+
+    def __init__(
+        self,
+        user_id: Optional[int] = None,
+        session_id: Optional[str] = None,
+        ring_size: int = RING_SIZE,
+        writer: Optional[WriteBehind] = None,
+    ):
+        self.user_id = user_id
+        self.session_id = session_id or str(uuid.uuid4())
+        self._ring: deque = deque(maxlen=ring_size)
+        self._writer = writer
+        self.total = 0
+
+    @property
+    def writer(self) -> WriteBehind:
+        return self._writer or get_glyph_writer()
+
+    def extend(self, events: Iterable[Dict[str, Any]]):
+        events = list(events)
+        if not events:
+            return
+        self._ring.extend(events)
+        self.total += len(events)
+        self.writer.put_many(
+            [
+                {
+                    "user_id": self.user_id,
+                    "session_id": self.session_id,
+                    "glyph": ev["glyph"],
+                    "signal": ev.get("signal"),
+                    "t": datetime.utcfromtimestamp(ev["t"]) if ev.get("t") else datetime.utcnow(),
+                }
+                for ev in events
+            ]
+        )
+
+    def recent(self, n: Optional[int] = None) -> List[Dict[str, Any]]:
+        """The last ``n`` events (all buffered ones by default), oldest first."""
+        items = list(self._ring)
+        return items if n is None else items[-n:]
+
+    def clear(self):
+        """Forget the in-memory trace; persisted events are kept."""
+        self._ring.clear()
+
+    def __len__(self) -> int:
+        return len(self._ring)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(list(self._ring))
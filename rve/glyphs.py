@@ -1,24 +1,271 @@
-from typing import Dict, Any, List
+"""Glyph detection from text.
+
+Glyph rules (keywords, regexes and the signal to emit) are data: they are
+read from the ``glyphs`` section of ``sareth_identity.json`` and any extra
+rules files listed in ``RVE_GLYPH_RULES``.  All keywords compile into one
+Aho–Corasick automaton and all regexes into one alternation, so the cost of
+a scan does not grow with the number of rules.  Compiled engines are cached
+by the hash of the rule files and rebuilt when a file changes; a file that
+does not parse or compile is logged and the last good engine kept.
+"""
+from collections import deque
+from pathlib import Path
+from typing import Dict, Any, List, Iterable, Optional, Sequence, Tuple
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
 import time
 
+log = logging.getLogger("rve.glyphs")
+
+IDENTITY_PATH = Path(__file__).resolve().parent.parent / "sareth_identity.json"
+RELOAD_CHECK_SECONDS = 2.0
+REGEX_WINDOW = 128  # characters of earlier stream text regexes may span
+
+# Used only when no rules file defines any detectors.
+DEFAULT_RULES: List[Dict[str, Any]] = [
+    {"glyph": "THRESHOLD", "signal": "detected", "keywords": ["threshold"]},
+    {"glyph": "COHERENCE", "signal": "↑", "keywords": ["coherence"]},
+    {"glyph": "SEREN–Ø1", "signal": "mirror-steady", "keywords": ["seren", "sara"]},
+    {"glyph": "NAEDA–Ø3", "signal": "river-remembers", "keywords": ["naeda", "river"]},
+]
+
+
+class GlyphAutomaton:
+    """Aho–Corasick automaton over lowercase keywords.
+
+    One pass over the text finds every keyword occurrence, however many
+    keywords there are.  Matching state can be carried between calls, which
+    is what lets :class:`GlyphStreamMatcher` see keywords split across chunks.
+    """
+
+    def __init__(self, keywords: Iterable[Tuple[str, Any]]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.out: List[List[Any]] = [[]]
+        self.longest = 0
+        for word, payload in keywords:
+            word = word.lower()
+            if not word:
+                continue
+            self.longest = max(self.longest, len(word))
+            node = 0
+            for ch in word:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                node = nxt
+            self.out[node].append(payload)
+        # Breadth-first fail links; outputs of the fail target are merged in.
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def step(self, state: int, ch: str) -> int:
+        goto, fail = self.goto, self.fail
+        while state and ch not in goto[state]:
+            state = fail[state]
+        return goto[state].get(ch, 0)
+
+    def scan(self, text: str, state: int = 0) -> Tuple[List[Tuple[int, Any]], int]:
+        """Return ``([(end offset, payload)], end state)`` starting from ``state``."""
+        found: List[Tuple[int, Any]] = []
+        out = self.out
+        for i, ch in enumerate(text.lower()):
+            state = self.step(state, ch)
+            if out[state]:
+                found.extend((i + 1, p) for p in out[state])
+        return found, state
+
+
+class GlyphRuleEngine:
+    """Compiled form of a list of glyph rules.
+
+    A rule is ``{"glyph": ..., "signal": ..., "keywords": [...], "regex": [...]}``.
+    """
+
+    def __init__(self, rules: Sequence[Dict[str, Any]], regex_window: int = REGEX_WINDOW):
+        self.rules = list(rules)
+        self.regex_window = regex_window
+        keywords = []
+        groups = []
+        self._group_payload: Dict[str, Tuple[str, str]] = {}
+        for rule in self.rules:
+            payload = (rule["glyph"], rule.get("signal", "detected"))
+            keywords.extend((kw, payload) for kw in rule.get("keywords", []))
+            for pattern in rule.get("regex", []):
+                name = f"r{len(groups)}"
+                re.compile(pattern)  # fail early with the offending pattern
+                groups.append(f"(?P<{name}>{pattern})")
+                self._group_payload[name] = payload
+        self.automaton = GlyphAutomaton(keywords)
+        self.regex = re.compile("|".join(groups), re.IGNORECASE) if groups else None
+
+    def matcher(self, dedupe: bool = True) -> "GlyphStreamMatcher":
+        return GlyphStreamMatcher(self, dedupe)
+
+    def map_text(self, text: str) -> List[Dict[str, Any]]:
+        return self.matcher().feed(text)
+
+    def map_texts(self, texts: Iterable[str]) -> List[List[Dict[str, Any]]]:
+        """Batch form of :meth:`map_text`, sharing one compiled engine."""
+        return [self.map_text(t) for t in texts]
+
+
+class GlyphStreamMatcher:
+    """Incremental glyph detection over a streamed response.
+
+    ``feed(delta)`` returns the events completed by that delta.  The automaton
+    state carried between deltas stands in for the last ``longest - 1``
+    characters, so "thresh" + "old" is still seen as "threshold" without
+    rescanning earlier text; regex rules rescan only a short tail window.
+    Each glyph fires once per response; call :meth:`reset` before the next.
+    """
+
+    def __init__(self, engine: Optional[GlyphRuleEngine] = None, dedupe: bool = True):
+        self.engine = engine or get_rule_engine()
+        self.dedupe = dedupe
+        self.reset()
+
+    def reset(self):
+        self._state = 0
+        self._tail = ""
+        self._seen = set()
+
+    def feed(self, delta: str) -> List[Dict[str, Any]]:
+        eng = self.engine
+        found, self._state = eng.automaton.scan(delta, self._state)
+        if eng.regex is not None:
+            buf = self._tail + delta
+            for m in eng.regex.finditer(buf):
+                if m.end() > len(self._tail):
+                    found.append((m.end() - len(self._tail), eng._group_payload[m.lastgroup]))
+            found.sort(key=lambda x: x[0])
+            self._tail = buf[-eng.regex_window :]
+        if not found:
+            return []
+        evs: List[Dict[str, Any]] = []
+        t = int(time.time())
+        for _, (glyph, signal) in found:
+            if self.dedupe:
+                if glyph in self._seen:
+                    continue
+                self._seen.add(glyph)
+            evs.append({"glyph": glyph, "signal": signal, "t": t})
+        return evs
+
+
+# --- Rule loading and hot reload ---------------------------------------------
+
+
+def rule_paths() -> List[Path]:
+    paths = [IDENTITY_PATH]
+    extra = os.getenv("RVE_GLYPH_RULES", "")
+    paths.extend(Path(p) for p in extra.split(os.pathsep) if p)
+    return paths
+
+
+def rules_from_document(doc: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Extract detector rules from an identity/rules JSON document.
+
+    Accepts the identity layout (``{"glyphs": {glyph: {...}}}``) or a plain
+    ``{"rules": [...]}`` list.  Glyphs without keywords or regexes are skipped.
+    """
+    rules = list(doc.get("rules", []))
+    for glyph, spec in (doc.get("glyphs") or {}).items():
+        if spec.get("keywords") or spec.get("regex"):
+            rules.append(
+                {
+                    "glyph": glyph,
+                    "signal": spec.get("signal", "detected"),
+                    "keywords": spec.get("keywords", []),
+                    "regex": spec.get("regex", []),
+                }
+            )
+    return rules
+
+
+def load_glyph_rules(paths: Iterable[Path]) -> Tuple[List[Dict[str, Any]], str]:
+    """Return ``(rules, digest)`` for the given files; missing files are skipped."""
+    h = hashlib.sha256()
+    rules: List[Dict[str, Any]] = []
+    for path in paths:
+        try:
+            data = Path(path).read_bytes()
+        except OSError:
+            continue
+        h.update(str(path).encode() + b"\0" + data)
+        rules.extend(rules_from_document(json.loads(data.decode("utf-8"))))
+    return (rules or DEFAULT_RULES), h.hexdigest()
+
+
+def _mtimes(paths: Iterable[Path]) -> Tuple:
+    out = []
+    for p in paths:
+        try:
+            out.append((str(p), os.stat(p).st_mtime_ns))
+        except OSError:
+            out.append((str(p), None))
+    return tuple(out)
+
+
+_engines: Dict[str, GlyphRuleEngine] = {}
+_current: Dict[str, Any] = {"engine": None, "mtimes": None, "checked": 0.0}
+_lock = threading.Lock()
+
+
+def get_rule_engine(force_check: bool = False) -> GlyphRuleEngine:
+    """The compiled engine for the current rule files.
+
+    File mtimes are checked at most every ``RELOAD_CHECK_SECONDS``; when they
+    change the files are re-read and, if their content hash is new, compiled.
+    If that fails (bad JSON, a malformed rule or regex), the error is logged
+    and the previous engine, or one for ``DEFAULT_RULES`` if there is none,
+    stays in use until the files change again.
+    """
+    now = time.monotonic()
+    cur = _current
+    if cur["engine"] is not None and not force_check and now - cur["checked"] < RELOAD_CHECK_SECONDS:
+        return cur["engine"]
+    with _lock:
+        paths = rule_paths()
+        mtimes = _mtimes(paths)
+        cur["checked"] = now
+        if cur["engine"] is None or mtimes != cur["mtimes"]:
+            try:
+                rules, digest = load_glyph_rules(paths)
+                engine = _engines.get(digest)
+                if engine is None:
+                    engine = _engines[digest] = GlyphRuleEngine(rules)
+            except (ValueError, TypeError, KeyError, AttributeError, re.error) as exc:
+                log.error("glyph rules not reloaded, keeping the previous ones: %s: %s", type(exc).__name__, exc)
+                engine = cur["engine"] or GlyphRuleEngine(DEFAULT_RULES)
+            cur["engine"], cur["mtimes"] = engine, mtimes
+        return cur["engine"]
+
 
 def map_text_to_glyph_events(text: str) -> List[Dict[str, Any]]:
     """
-    Replace this with your real REF engine.
-    For now, simple keyword → glyph signals to prove the live loop.
+    Map text to glyph signals using the configured glyph rules.
+    Each glyph is reported once, in order of first appearance.
     """
-    evs: List[Dict[str, Any]] = []
-    t = int(time.time())
-    low = text.lower()
-
-    # Examples — swap for real detectors
-    if "threshold" in low:
-        evs.append({"glyph": "THRESHOLD", "signal": "detected", "t": t})
-    if "coherence" in low:
-        evs.append({"glyph": "COHERENCE", "signal": "↑", "t": t})
-    if "seren" in low or "sara" in low:
-        evs.append({"glyph": "SEREN–Ø1", "signal": "mirror-steady", "t": t})
-    if "naeda" in low or "river" in low:
-        evs.append({"glyph": "NAEDA–Ø3", "signal": "river-remembers", "t": t})
-
-    return evs
+    return get_rule_engine().map_text(text)
+
+
+def map_texts_to_glyph_events(texts: Iterable[str]) -> List[List[Dict[str, Any]]]:
+    """Batch :func:`map_text_to_glyph_events` over many texts with one compiled engine."""
+    return get_rule_engine().map_texts(texts)
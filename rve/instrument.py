@@ -0,0 +1,105 @@
+"""SQL query instrumentation for the ledger.
+
+Engine-level event hooks time every statement executed through SQLAlchemy.
+Statements are attributed to whichever :class:`QueryStats` is active in the
+current context (see :func:`track_queries`), so a web request or a test can
+see how many queries it issued, how long they took, which were slow, and
+whether the same statement ran once per row (the N+1 pattern).
+"""
+from __future__ import annotations
+
+import contextvars
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+log = logging.getLogger("rve.sql")
+
+SLOW_QUERY_SECONDS = 0.1
+N_PLUS_ONE_THRESHOLD = 5
+
+_active: contextvars.ContextVar[Optional["QueryStats"]] = contextvars.ContextVar(
+    "rve_query_stats", default=None
+)
+_installed = False
+
+
+def _normalize(statement: str) -> str:
+    return re.sub(r"\s+", " ", statement).strip()
+
+
+class QueryStats:
+    def __init__(self, slow_threshold: float = SLOW_QUERY_SECONDS):
+        self.slow_threshold = slow_threshold
+        self.count = 0
+        self.total_time = 0.0
+        self.statements: Counter = Counter()
+        self.slow: List[Tuple[str, float]] = []
+
+    def record(self, statement: str, elapsed: float):
+        sql = _normalize(statement)
+        self.count += 1
+        self.total_time += elapsed
+        self.statements[sql] += 1
+        if elapsed >= self.slow_threshold:
+            self.slow.append((sql, elapsed))
+            log.warning("slow query (%.1f ms): %s", elapsed * 1000, sql)
+
+    def repeated(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> List[Tuple[str, int]]:
+        """Statements issued at least ``threshold`` times — likely N+1 lazy loads."""
+        return [(sql, n) for sql, n in self.statements.most_common() if n >= threshold]
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "total_ms": round(self.total_time * 1000, 3),
+            "slow": [{"sql": sql, "ms": round(t * 1000, 3)} for sql, t in self.slow],
+            "repeated": [{"sql": sql, "count": n} for sql, n in self.repeated()],
+        }
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("rve_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("rve_query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    stats = _active.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+
+
+def install():
+    """Register the timing hooks on every engine (idempotent)."""
+    global _installed
+    if _installed:
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    _installed = True
+
+
+@contextmanager
+def track_queries(slow_threshold: float = SLOW_QUERY_SECONDS) -> Iterator[QueryStats]:
+    """Collect :class:`QueryStats` for all SQL run inside the block."""
+    install()
+    stats = QueryStats(slow_threshold)
+    token = _active.set(stats)
+    try:
+        yield stats
+    finally:
+        _active.reset(token)
+
+
+def assert_no_n_plus_one(stats: QueryStats, threshold: int = N_PLUS_ONE_THRESHOLD):
+    repeated = stats.repeated(threshold)
+    assert not repeated, f"N+1 query pattern: {repeated[0][1]}x {repeated[0][0]}"
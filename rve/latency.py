@@ -0,0 +1,180 @@
+"""Latency measurements for streamed model responses.
+
+:func:`instrument` wraps a generator of content deltas and, when the stream
+ends (normally, by error, or because the caller stopped early), records time
+to first token, duration, chunk count, throughput and a histogram of the gaps
+between chunks.  Records are kept per model in a bounded window on the
+process-wide :data:`recorder`, whose :meth:`~LatencyRecorder.snapshot` gives
+current percentiles.  Setting ``RVE_LATENCY_LOG`` also appends every record
+to that JSONL file.
+
+Each streamed delta is counted as one token; the OpenAI API sends one token
+per chunk for chat completions.
+"""
+from __future__ import annotations
+
+import bisect
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional
+
+GAP_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500)
+STALL_MS = float(os.getenv("RVE_STALL_MS", "1000"))
+WINDOW = int(os.getenv("RVE_LATENCY_WINDOW", "200"))
+LOG_PATH = os.getenv("RVE_LATENCY_LOG", "")
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Linear-interpolated ``q`` quantile of ``values`` (``None`` when empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * q
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def gap_bucket_labels() -> List[str]:
+    return [f"<{b}ms" for b in GAP_BUCKETS_MS] + [f">={GAP_BUCKETS_MS[-1]}ms"]
+
+
+class JsonlSink:
+    """Append records as JSON lines; safe to share between threads."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, record: Dict[str, Any]):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+class LatencyRecorder:
+    def __init__(self, window: int = WINDOW, sink=None):
+        self.window = window
+        self.sink = sink
+        self._records: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, rec: Dict[str, Any]):
+        with self._lock:
+            self._records.setdefault(rec["model"], deque(maxlen=self.window)).append(rec)
+        if self.sink is not None:
+            self.sink(rec)
+
+    def recent(self, model: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._records.get(model, ()))
+
+    def model_stats(self, model: str) -> Optional[Dict[str, Any]]:
+        """Aggregates over the recent window for ``model``, or ``None`` without data."""
+        recs = self.recent(model)
+        if not recs:
+            return None
+        ok = [r for r in recs if not r["error"]]
+        # A stream closed by its consumer (e.g. a losing hedge) is not a failure,
+        # and its first token, when it got one, still counts towards TTFT.
+        failed = [r for r in recs if r["error"] and r["error"] != "cancelled"]
+        ttfts = [r["ttft_ms"] for r in recs if r["ttft_ms"] is not None and r["error"] in (None, "cancelled")]
+        rates = [r["tokens_per_s"] for r in ok if r["tokens_per_s"] is not None]
+        gaps = [0] * (len(GAP_BUCKETS_MS) + 1)
+        for r in ok:
+            for i, n in enumerate(r["gap_histogram"]):
+                gaps[i] += n
+
+        def rnd(v):
+            return None if v is None else round(v, 1)
+
+        return {
+            "requests": len(recs),
+            "error_rate": round(len(failed) / len(recs), 4),
+            "ttft_ms_p50": rnd(percentile(ttfts, 0.5)),
+            "ttft_ms_p95": rnd(percentile(ttfts, 0.95)),
+            "tokens_per_s_p50": rnd(percentile(rates, 0.5)),
+            "chunks_mean": rnd(sum(r["chunks"] for r in ok) / len(ok)) if ok else None,
+            "stalls": sum(r["stalls"] for r in ok),
+            "gap_histogram": dict(zip(gap_bucket_labels(), gaps)),
+        }
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            models = list(self._records)
+        return {m: self.model_stats(m) for m in models}
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+
+recorder = LatencyRecorder(sink=JsonlSink(LOG_PATH) if LOG_PATH else None)
+
+
+def get_recorder() -> LatencyRecorder:
+    return recorder
+
+
+def instrument(
+    stream: Iterable[str],
+    model: str,
+    recorder: Optional[LatencyRecorder] = None,
+    clock=time.perf_counter,
+    cancelled: Optional[threading.Event] = None,
+) -> Iterator[str]:
+    """Yield from ``stream`` unchanged while measuring it for ``recorder``.
+
+    If ``cancelled`` is set by the time the stream ends, the request is
+    recorded as cancelled, however the stream ended.
+    """
+    recorder = recorder or get_recorder()
+    start = clock()
+    first = last = None
+    chunks = chars = stalls = 0
+    max_gap = 0.0
+    gaps = [0] * (len(GAP_BUCKETS_MS) + 1)
+    error = None
+    try:
+        for delta in stream:
+            now = clock()
+            if first is None:
+                first = now
+            else:
+                gap_ms = (now - last) * 1000
+                gaps[bisect.bisect_right(GAP_BUCKETS_MS, gap_ms)] += 1
+                max_gap = max(max_gap, gap_ms)
+                stalls += gap_ms >= STALL_MS
+            last = now
+            chunks += 1
+            chars += len(delta)
+            yield delta
+    except GeneratorExit:
+        error = "cancelled"
+        raise
+    except Exception as exc:
+        error = type(exc).__name__
+        raise
+    finally:
+        if cancelled is not None and cancelled.is_set():
+            error = "cancelled"
+        end = clock()
+        streaming = (last - first) if first is not None else 0.0
+        recorder.record(
+            {
+                "model": model,
+                "t": time.time(),
+                "ttft_ms": round((first - start) * 1000, 2) if first is not None else None,
+                "total_ms": round((end - start) * 1000, 2),
+                "chunks": chunks,
+                "chars": chars,
+                "tokens_per_s": round((chunks - 1) / streaming, 2) if chunks > 1 and streaming > 0 else None,
+                "max_gap_ms": round(max_gap, 2),
+                "stalls": stalls,
+                "gap_histogram": gaps,
+                "error": error,
+            }
+        )
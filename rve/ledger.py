@@ -1,6 +1,10 @@
+import re
+from collections import Counter
 from datetime import datetime
+from typing import Dict, List, Optional
 
 from sqlalchemy import (
+    BigInteger,
     Boolean,
     Column,
     DateTime,
@@ -11,12 +15,20 @@ from sqlalchemy import (
     String,
     Text,
     UniqueConstraint,
+    case,
     create_engine,
+    delete,
+    func,
+    insert,
+    text as sql,
+    update,
 )
-from sqlalchemy.orm import declarative_base, relationship, sessionmaker
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import declarative_base, relationship, selectinload, sessionmaker
 from werkzeug.security import generate_password_hash, check_password_hash
 
 from .config import get_db_url
+from .scoring import clamp_independence, provenance_completeness, score_claim
 
 
 Base = declarative_base()
@@ -84,7 +96,10 @@ class Artifact(Base):
     claim_id_fk = Column(Integer, ForeignKey("claims.id"), index=True)
     kind = Column(String(32))
     path_or_url = Column(Text, nullable=False)
-    hash = Column(String(128))
+    hash = Column(String(128), index=True)
+    size_bytes = Column(BigInteger)
+    mtime = Column(Float)
+    hashed_at = Column(DateTime)
     has_method_doc = Column(Boolean, default=False)
     has_timestamp = Column(Boolean, default=False)
     has_chain = Column(Boolean, default=False)
@@ -93,14 +108,229 @@ class Artifact(Base):
     user = relationship("User")
 
 
-def get_engine():
-    return create_engine(get_db_url(), future=True)
+class ApiToken(Base):
+    """Bearer token for the HTTP API; only the SHA-256 of the token is stored."""
 
+    __tablename__ = "api_tokens"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+    token_hash = Column(String(64), unique=True, nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    revoked_at = Column(DateTime)
+    user = relationship("User")
+
+
+DRIFT_BUCKETS = 5  # drift histogram buckets [0,1), [1,2), ..., [4,5]
+
+
+class ClaimSummary(Base):
+    """Per-user running aggregates over claims, maintained by the write paths."""
+
+    __tablename__ = "claim_summaries"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    n_claims = Column(Integer, default=0, nullable=False)
+    sum_drift = Column(Float, default=0.0, nullable=False)
+    sum_confidence = Column(Float, default=0.0, nullable=False)
+    drift_b0 = Column(Integer, default=0, nullable=False)
+    drift_b1 = Column(Integer, default=0, nullable=False)
+    drift_b2 = Column(Integer, default=0, nullable=False)
+    drift_b3 = Column(Integer, default=0, nullable=False)
+    drift_b4 = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class VolatilityCount(Base):
+    __tablename__ = "claim_volatility_counts"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    volatility = Column(String(16), primary_key=True)
+    n = Column(Integer, default=0, nullable=False)
+
+
+class GlyphEvent(Base):
+    """One glyph signal detected in a live chat response."""
+
+    __tablename__ = "glyph_events"
+    __table_args__ = (
+        Index("ix_glyph_events_user_t", "user_id", "t"),
+        Index("ix_glyph_events_session_t", "session_id", "t"),
+        Index("ix_glyph_events_glyph_t", "glyph", "t"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    session_id = Column(String(36), nullable=False)
+    glyph = Column(String(64), nullable=False)
+    signal = Column(String(64))
+    t = Column(DateTime, default=datetime.utcnow, nullable=False)
 
-def get_session():
-    engine = get_engine()
-    Base.metadata.create_all(engine)
-    return sessionmaker(bind=engine, future=True)()
+
+class Conversation(Base):
+    """A live chat session; ``key`` is the client-side id carried in the page URL."""
+
+    __tablename__ = "conversations"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    key = Column(String(36), unique=True, nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    messages = relationship("ChatMessage", back_populates="conversation", order_by="ChatMessage.seq")
+
+
+class ChatMessage(Base):
+    __tablename__ = "chat_messages"
+    __table_args__ = (UniqueConstraint("conversation_id", "seq"),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    conversation_id = Column(Integer, ForeignKey("conversations.id"), nullable=False)
+    seq = Column(Integer, nullable=False)
+    role = Column(String(16), nullable=False)
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    conversation = relationship("Conversation", back_populates="messages")
+
+
+_engines = {}
+_sessionmakers = {}
+
+
+def get_engine(url: str | None = None):
+    """Return the process-wide engine for ``url`` (default: the configured ledger)."""
+    url = url or get_db_url()
+    engine = _engines.get(url)
+    if engine is None:
+        engine = _engines[url] = create_engine(url, future=True)
+    return engine
+
+
+def get_session(url: str | None = None):
+    url = url or get_db_url()
+    factory = _sessionmakers.get(url)
+    if factory is None:
+        engine = get_engine(url)
+        Base.metadata.create_all(engine)
+        ensure_search_index(engine)
+        factory = _sessionmakers[url] = sessionmaker(bind=engine, future=True)
+    return factory()
+
+
+# --- Full-text search over Claim.text ----------------------------------------
+# SQLite uses an external-content FTS5 table keyed by claims.id, which add_claim
+# keeps in sync.  Postgres uses a GIN index over to_tsvector(text), which the
+# database maintains itself.  Anything else falls back to a LIKE scan.
+
+CLAIMS_FTS_TABLE = "claims_fts"
+CLAIMS_TSV_INDEX = "ix_claims_text_tsv"
+_search_backends = {}
+
+
+def ensure_search_index(engine) -> str:
+    """Create the search structures for ``engine`` if missing; return the backend name."""
+    key = str(engine.url)
+    if key in _search_backends:
+        return _search_backends[key]
+    backend = "like"
+    with engine.begin() as conn:
+        if engine.dialect.name == "sqlite":
+            exists = conn.execute(
+                sql("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": CLAIMS_FTS_TABLE},
+            ).first()
+            try:
+                if not exists:
+                    conn.execute(
+                        sql(
+                            f"CREATE VIRTUAL TABLE {CLAIMS_FTS_TABLE} "
+                            "USING fts5(text, content='claims', content_rowid='id')"
+                        )
+                    )
+                    # Index the claims written before the table existed.
+                    conn.execute(sql(f"INSERT INTO {CLAIMS_FTS_TABLE}({CLAIMS_FTS_TABLE}) VALUES('rebuild')"))
+                backend = "fts5"
+            except Exception:  # sqlite built without FTS5
+                pass
+        elif engine.dialect.name == "postgresql":
+            conn.execute(
+                sql(
+                    f"CREATE INDEX IF NOT EXISTS {CLAIMS_TSV_INDEX} ON claims "
+                    "USING GIN (to_tsvector('english', text))"
+                )
+            )
+            backend = "tsvector"
+    _search_backends[key] = backend
+    return backend
+
+
+def _search_backend(sess) -> str:
+    return ensure_search_index(sess.get_bind())
+
+
+def index_claim_texts(sess, rows: List[dict]):
+    """Add ``[{"id": ..., "text": ...}]`` claim rows to the search index.
+
+    Needed after bulk inserts that bypass :func:`add_claim`.
+    """
+    if rows and _search_backend(sess) == "fts5":
+        sess.execute(
+            sql(f"INSERT INTO {CLAIMS_FTS_TABLE}(rowid, text) VALUES (:id, :text)"), rows
+        )
+
+
+def unindex_claim_texts(sess, rows: List[dict]):
+    """Remove claim rows from the search index before deleting them."""
+    if rows and _search_backend(sess) == "fts5":
+        sess.execute(
+            sql(
+                f"INSERT INTO {CLAIMS_FTS_TABLE}({CLAIMS_FTS_TABLE}, rowid, text) "
+                "VALUES ('delete', :id, :text)"
+            ),
+            rows,
+        )
+
+
+def search_claims(
+    sess, user: User, query: str, limit: int = 20, prefix: bool = True
+) -> List[Claim]:
+    """Return ``user``'s claims matching every word in ``query``, best match first.
+
+    With ``prefix`` the words match as prefixes (``thresh`` finds ``threshold``).
+    """
+    words = re.findall(r"\w+", query.lower())
+    if not words:
+        return []
+    backend = _search_backend(sess)
+    if backend == "fts5":
+        match = " ".join(f'"{w}"*' if prefix else f'"{w}"' for w in words)
+        ids = sess.execute(
+            sql(
+                f"SELECT c.id FROM {CLAIMS_FTS_TABLE} f JOIN claims c ON c.id = f.rowid "
+                f"WHERE {CLAIMS_FTS_TABLE} MATCH :match AND c.user_id = :uid "
+                f"ORDER BY bm25({CLAIMS_FTS_TABLE}) LIMIT :limit"
+            ),
+            {"match": match, "uid": user.id, "limit": limit},
+        ).scalars().all()
+    elif backend == "tsvector":
+        tsq = " & ".join(f"{w}:*" if prefix else w for w in words)
+        ids = sess.execute(
+            sql(
+                "SELECT id FROM claims "
+                "WHERE user_id = :uid AND to_tsvector('english', text) @@ to_tsquery('english', :q) "
+                "ORDER BY ts_rank(to_tsvector('english', text), to_tsquery('english', :q)) DESC "
+                "LIMIT :limit"
+            ),
+            {"q": tsq, "uid": user.id, "limit": limit},
+        ).scalars().all()
+    else:
+        q = sess.query(Claim.id).filter(Claim.user_id == user.id)
+        for w in words:
+            q = q.filter(Claim.text.ilike(f"%{w}%"))
+        ids = [r[0] for r in q.order_by(Claim.created_at.desc()).limit(limit)]
+    if not ids:
+        return []
+    by_id = {c.id: c for c in sess.query(Claim).filter(Claim.id.in_(ids))}
+    return [by_id[i] for i in ids]
 
 
 def get_or_create_user(sess, email: str, password: str) -> User:
@@ -127,13 +357,9 @@ def add_claim(
     prov_total: int = 6,
     independent_sources: int = 1,
 ):
-    pc = prov_fields / float(max(prov_total, 1))
-    ind = max(0, min(3, independent_sources))
-    drift = max(0.0, min(5.0, 3.0 - (pc * 2.0) - (0.4 * ind)))
-    conf = max(
-        0.0,
-        min(1.0, (0.6 * pc + 0.4 * (ind / 3.0)) * (1.0 - (drift / 10.0))),
-    )
+    pc = provenance_completeness(prov_fields, prov_total)
+    ind = clamp_independence(independent_sources)
+    drift, conf = score_claim(pc, ind)
     claim = Claim(
         user_id=user.id,
         claim_id=next_claim_human_id(sess, user.id),
@@ -147,15 +373,329 @@ def add_claim(
     )
     sess.add(claim)
     sess.flush()
+    index_claim_texts(sess, [{"id": claim.id, "text": claim.text}])
     sess.add(DriftHistory(user_id=user.id, claim_id_fk=claim.id, drift=drift))
+    bump_claim_summary(
+        sess,
+        user.id,
+        n=1,
+        drift=drift,
+        confidence=conf,
+        buckets={drift_bucket(drift): 1},
+        volatility={volatility: 1},
+    )
     sess.commit()
     return claim
 
 
 def append_drift(sess, user: User, claim: Claim, drift_value: float):
     assert claim.user_id == user.id, "Unauthorized"
+    old = claim.drift_score or 0.0
     claim.drift_score = float(drift_value)
     sess.add(DriftHistory(user_id=user.id, claim_id_fk=claim.id, drift=float(drift_value)))
+    sess.flush()
+    buckets: Counter = Counter()
+    buckets[drift_bucket(old)] -= 1
+    buckets[drift_bucket(claim.drift_score)] += 1  # cancels out when the bucket is unchanged
+    bump_claim_summary(sess, user.id, drift=claim.drift_score - old, buckets=buckets)
     sess.commit()
     return claim
 
+
+def list_claims(
+    sess,
+    user: User,
+    limit: int | None = None,
+    with_history: bool = False,
+    with_artifacts: bool = False,
+) -> List[Claim]:
+    """Newest-first claims for ``user``.
+
+    ``with_history``/``with_artifacts`` load the relationships for the whole
+    page in one extra query each instead of one lazy query per claim.
+    """
+    q = sess.query(Claim).filter(Claim.user_id == user.id)
+    if with_history:
+        q = q.options(selectinload(Claim.histories))
+    if with_artifacts:
+        q = q.options(selectinload(Claim.artifacts))
+    q = q.order_by(Claim.created_at.desc(), Claim.id.desc())
+    if limit is not None:
+        q = q.limit(limit)
+    return q.all()
+
+
+def list_claims_with_history(sess, user: User, limit: int | None = None) -> List[Claim]:
+    return list_claims(sess, user, limit, with_history=True)
+
+
+def list_claims_with_artifacts(sess, user: User, limit: int | None = None) -> List[Claim]:
+    return list_claims(sess, user, limit, with_artifacts=True)
+
+
+# --- Per-user claim summaries ------------------------------------------------
+# add_claim and append_drift apply deltas with atomic UPDATEs in the same
+# transaction as the claim write, so reading a user's summary costs one row
+# no matter how many claims they have.  Bulk writers (re-scoring, restore,
+# shard moves) call bump_claim_summary / rebuild_claim_summary themselves.
+
+
+def drift_bucket(drift: float) -> int:
+    return max(0, min(DRIFT_BUCKETS - 1, int(drift or 0.0)))
+
+
+def bump_claim_summary(
+    sess,
+    user_id: int,
+    *,
+    n: int = 0,
+    drift: float = 0.0,
+    confidence: float = 0.0,
+    buckets: Dict[int, int] | None = None,
+    volatility: Dict[str, int] | None = None,
+):
+    """Apply deltas to ``user_id``'s summary; call after the claim changes are flushed.
+
+    A user without a summary row yet gets one rebuilt from their claims, which
+    already include the flushed change.
+    """
+    values = {
+        "n_claims": ClaimSummary.n_claims + n,
+        "sum_drift": ClaimSummary.sum_drift + drift,
+        "sum_confidence": ClaimSummary.sum_confidence + confidence,
+        "updated_at": datetime.utcnow(),
+    }
+    for b, delta in (buckets or {}).items():
+        if delta:
+            col = getattr(ClaimSummary, f"drift_b{b}")
+            values[col.key] = col + delta
+    updated = sess.execute(
+        update(ClaimSummary).where(ClaimSummary.user_id == user_id).values(**values)
+    ).rowcount
+    if not updated:
+        rebuild_claim_summary(sess, user_id)
+        return
+    for vol, delta in (volatility or {}).items():
+        if not delta:
+            continue
+        hit = sess.execute(
+            update(VolatilityCount)
+            .where(VolatilityCount.user_id == user_id, VolatilityCount.volatility == vol)
+            .values(n=VolatilityCount.n + delta)
+        ).rowcount
+        if not hit:
+            sess.add(VolatilityCount(user_id=user_id, volatility=vol, n=delta))
+    sess.flush()
+
+
+def _aggregate_claims(sess, user_id: int) -> dict:
+    cols = [
+        func.count(Claim.id),
+        func.coalesce(func.sum(Claim.drift_score), 0.0),
+        func.coalesce(func.sum(Claim.confidence_index), 0.0),
+    ]
+    for b in range(DRIFT_BUCKETS):
+        lo = case((Claim.drift_score.is_(None), 0.0), else_=Claim.drift_score)
+        if b == 0:
+            cond = lo < 1
+        elif b == DRIFT_BUCKETS - 1:
+            cond = lo >= b
+        else:
+            cond = (lo >= b) & (lo < b + 1)
+        cols.append(func.coalesce(func.sum(case((cond, 1), else_=0)), 0))
+    row = sess.query(*cols).filter(Claim.user_id == user_id).one()
+    agg = {"n_claims": row[0], "sum_drift": float(row[1]), "sum_confidence": float(row[2])}
+    agg.update({f"drift_b{b}": int(row[3 + b]) for b in range(DRIFT_BUCKETS)})
+    agg["volatility"] = {
+        v: n
+        for v, n in sess.query(Claim.volatility, func.count(Claim.id))
+        .filter(Claim.user_id == user_id)
+        .group_by(Claim.volatility)
+    }
+    return agg
+
+
+def rebuild_claim_summary(sess, user_id: int) -> ClaimSummary:
+    """Recompute ``user_id``'s summary from their claims (caller commits)."""
+    agg = _aggregate_claims(sess, user_id)
+    vols = agg.pop("volatility")
+    sess.execute(delete(VolatilityCount).where(VolatilityCount.user_id == user_id))
+    summary = sess.get(ClaimSummary, user_id)
+    if summary is None:
+        summary = ClaimSummary(user_id=user_id)
+        sess.add(summary)
+    for k, v in agg.items():
+        setattr(summary, k, v)
+    summary.updated_at = datetime.utcnow()
+    sess.add_all(VolatilityCount(user_id=user_id, volatility=v, n=n) for v, n in vols.items())
+    sess.flush()
+    return summary
+
+
+def _summary_dict(summary: ClaimSummary, vols: Dict[str, int]) -> dict:
+    n = summary.n_claims or 0
+    return {
+        "n_claims": n,
+        "avg_drift": summary.sum_drift / n if n else 0.0,
+        "avg_confidence": summary.sum_confidence / n if n else 0.0,
+        "drift_histogram": [getattr(summary, f"drift_b{b}") for b in range(DRIFT_BUCKETS)],
+        "volatility": {v: c for v, c in sorted(vols.items()) if c},
+    }
+
+
+def get_claim_summary(sess, user: User) -> dict:
+    """``user``'s claim aggregates, read from the summary tables."""
+    summary = sess.get(ClaimSummary, user.id)
+    if summary is None:
+        summary = rebuild_claim_summary(sess, user.id)
+        sess.commit()
+    vols = dict(
+        sess.query(VolatilityCount.volatility, VolatilityCount.n).filter(
+            VolatilityCount.user_id == user.id
+        )
+    )
+    return _summary_dict(summary, vols)
+
+
+def check_claim_summary(sess, user: User, repair: bool = True) -> bool:
+    """Compare the stored summary with a fresh aggregate; rebuild it on mismatch.
+
+    Returns ``True`` when the stored summary was consistent.
+    """
+    fresh = _aggregate_claims(sess, user.id)
+    stored = sess.get(ClaimSummary, user.id)
+    ok = fresh["n_claims"] == 0 if stored is None else True
+    if stored is not None:
+        vols = dict(
+            sess.query(VolatilityCount.volatility, VolatilityCount.n).filter(
+                VolatilityCount.user_id == user.id, VolatilityCount.n != 0
+            )
+        )
+        ok = vols == fresh["volatility"] and all(
+            abs(getattr(stored, k) - v) <= 1e-6
+            for k, v in fresh.items()
+            if k != "volatility"
+        )
+    if not ok and repair:
+        rebuild_claim_summary(sess, user.id)
+        sess.commit()
+    return ok
+
+
+# --- Glyph events ---------------------------------------------------------------
+
+GLYPH_BUCKET_FORMATS = {
+    "hour": ("%Y-%m-%d %H:00", "YYYY-MM-DD HH24:00"),
+    "day": ("%Y-%m-%d", "YYYY-MM-DD"),
+    "month": ("%Y-%m", "YYYY-MM"),
+}
+
+
+def record_glyph_events(sess, rows: List[dict]):
+    """Bulk-insert glyph events (``user_id``, ``session_id``, ``glyph``, ``signal``, ``t``)."""
+    if rows:
+        sess.execute(insert(GlyphEvent.__table__), rows)
+        sess.commit()
+
+
+def glyph_frequencies(
+    sess,
+    user_id: Optional[int] = None,
+    session_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    bucket: Optional[str] = "day",
+) -> List[dict]:
+    """Counts of each glyph per time ``bucket`` ("hour", "day", "month" or ``None`` for all time)."""
+    cols = [GlyphEvent.glyph]
+    if bucket is not None:
+        lite, pg = GLYPH_BUCKET_FORMATS[bucket]
+        if sess.get_bind().dialect.name == "sqlite":
+            cols.insert(0, func.strftime(lite, GlyphEvent.t).label("bucket"))
+        else:
+            cols.insert(0, func.to_char(GlyphEvent.t, pg).label("bucket"))
+    q = sess.query(*cols, func.count().label("n"))
+    if user_id is not None:
+        q = q.filter(GlyphEvent.user_id == user_id)
+    if session_id is not None:
+        q = q.filter(GlyphEvent.session_id == session_id)
+    if since is not None:
+        q = q.filter(GlyphEvent.t >= since)
+    if until is not None:
+        q = q.filter(GlyphEvent.t < until)
+    q = q.group_by(*cols).order_by(*cols)
+    return [dict(r._mapping) for r in q]
+
+
+# --- Chat sessions --------------------------------------------------------------
+
+
+def get_or_create_conversation(sess, key: str, user_id: Optional[int] = None) -> Conversation:
+    conv = sess.query(Conversation).filter_by(key=key).one_or_none()
+    if conv is None:
+        conv = Conversation(key=key, user_id=user_id)
+        sess.add(conv)
+        sess.commit()
+    elif user_id is not None and conv.user_id is None:
+        conv.user_id = user_id
+        sess.commit()
+    return conv
+
+
+def latest_conversation(sess, user_id: int) -> Optional[Conversation]:
+    return (
+        sess.query(Conversation)
+        .filter_by(user_id=user_id)
+        .order_by(Conversation.id.desc())
+        .first()
+    )
+
+
+def record_chat_messages(sess, rows: List[dict], attempts: int = 5):
+    """Bulk-insert messages (``conversation_id``, ``role``, ``content``, ``created_at``).
+
+    ``seq`` is assigned here, after the highest one stored for each
+    conversation, so tabs or replicas writing the same conversation do not
+    hand out the same numbers.  If another writer commits first and the
+    numbers collide, the insert is retried with fresh ones.
+    """
+    if not rows:
+        return
+    for attempt in range(attempts):
+        last: Dict[int, int] = {}
+        numbered = []
+        for row in rows:
+            cid = row["conversation_id"]
+            if cid not in last:
+                last[cid] = last_message_seq(sess, cid)
+            last[cid] += 1
+            numbered.append({**row, "seq": last[cid]})
+        try:
+            sess.execute(insert(ChatMessage.__table__), numbered)
+            sess.commit()
+            return
+        except IntegrityError:
+            sess.rollback()
+            if attempt == attempts - 1:
+                raise
+
+
+def load_recent_messages(sess, conversation_id: int, limit: int) -> List[dict]:
+    """The last ``limit`` messages of a conversation, oldest first."""
+    rows = (
+        sess.query(ChatMessage.seq, ChatMessage.role, ChatMessage.content)
+        .filter(ChatMessage.conversation_id == conversation_id)
+        .order_by(ChatMessage.seq.desc())
+        .limit(limit)
+        .all()
+    )
+    return [{"seq": r.seq, "role": r.role, "content": r.content} for r in reversed(rows)]
+
+
+def last_message_seq(sess, conversation_id: int) -> int:
+    return (
+        sess.query(func.max(ChatMessage.seq))
+        .filter(ChatMessage.conversation_id == conversation_id)
+        .scalar()
+        or 0
+    )
@@ -1,7 +1,15 @@
-from typing import List, Dict, Any, Generator
+from typing import List, Dict, Generator, Callable
+import os
+import time
+import uuid
 import streamlit as st
-from openai.types.chat.chat_completion_chunk import ChatCompletionChunk
-from rve.openai_client import openai_client
+from rve.admission import controller as admission, session_key
+from rve.chat_store import open_chat_session
+from rve.context import ContextWindow, message_tokens
+from rve.glyph_store import GlyphTraceStore
+from rve.latency import instrument
+from rve.openai_client import llm_client
+from rve.router import AUTO, choose_model, hedged_stream
 
 SYSTEM_BASELINE = (
     "You are Sareth inside the Recursive Emergence Framework (REF). "
@@ -9,23 +17,55 @@ SYSTEM_BASELINE = (
 )
 
 
+RENDER_INTERVAL_MS = int(os.getenv("RVE_RENDER_INTERVAL_MS", "80"))
+RENDER_MAX_PENDING_CHARS = int(os.getenv("RVE_RENDER_MAX_PENDING_CHARS", "400"))
+
+
 def ensure_chat_state():
     st.session_state.setdefault("chat", [])  # type: List[Dict[str, str]]
-    st.session_state.setdefault("glyph_trace", [])  # type: List[Dict[str, Any]]
+    st.session_state.setdefault("glyph_trace", GlyphTraceStore())
+    st.session_state.glyph_trace.user_id = st.session_state.get("user_id")
     st.session_state.setdefault("last_response", "")
     st.session_state.setdefault("system_prompt", SYSTEM_BASELINE)
+    st.session_state.setdefault("context", ContextWindow(st.session_state.system_prompt))
+    if "chat_store" not in st.session_state:
+        restore_chat()
+
+
+def restore_chat(new: bool = False):
+    """Attach this session to its stored conversation and load the recent messages.
+
+    The conversation key lives in the ``c`` query parameter so any replica can
+    pick the conversation up; ``new=True`` starts a fresh one.
+    """
+    key = None if new else st.query_params.get("c")
+    user_id = st.session_state.get("user_id")
+    store, messages = open_chat_session(key or (str(uuid.uuid4()) if new else None), user_id)
+    st.session_state.chat_store = store
+    st.session_state.chat[:] = messages
+    st.query_params["c"] = store.key
 
 
 def push_user(msg: str):
     st.session_state.chat.append({"role": "user", "content": msg})
+    st.session_state.chat_store.append("user", msg)
 
 
 def push_assistant(msg: str):
     st.session_state.chat.append({"role": "assistant", "content": msg})
+    st.session_state.chat_store.append("assistant", msg)
+
+
+def context_window() -> ContextWindow:
+    """The session's context window, caught up with the current chat."""
+    ctx = st.session_state.context
+    ctx.set_system_prompt(st.session_state.system_prompt)
+    ctx.sync(st.session_state.chat)
+    return ctx
 
 
 def messages_for_llm() -> List[Dict[str, str]]:
-    return [{"role": "system", "content": st.session_state.system_prompt}] + st.session_state.chat
+    return context_window().messages()
 
 
 def stream_chat(
@@ -33,10 +73,95 @@ def stream_chat(
     model: str = "gpt-4o-mini",
     temperature: float = 0.2,
 ) -> Generator[str, None, None]:
-    client = openai_client()
-    stream = client.chat.completions.create(
-        model=model, temperature=temperature, stream=True, messages=messages
+    """Stream reply deltas once admission control grants this user a slot.
+
+    Raises :class:`rve.admission.AdmissionRejected` when the user is over
+    their rate or no slot frees up in time.
+    """
+    yield from admission.admit_stream(admission_key(), _stream_chat(messages, model, temperature))
+
+
+def admission_key() -> str:
+    """Signed-in users are limited per account, anonymous visitors per session."""
+    uid = st.session_state.get("user_id")
+    if uid:
+        return f"user:{uid}"
+    store = st.session_state.get("chat_store")
+    return f"session:{store.key}" if store is not None else (session_key() or "anonymous")
+
+
+def _stream_chat(messages, model, temperature):
+    client = llm_client()
+    if model != AUTO:
+        yield from instrument(client.stream_chat(messages, model=model, temperature=temperature), model)
+        return
+    route = choose_model(sum(message_tokens(m) for m in messages))
+    st.session_state.last_route = route
+    yield from hedged_stream(
+        route, lambda m: client.stream_chat(messages, model=m, temperature=temperature)
     )
-    for chunk in stream:  # type: ChatCompletionChunk
-        if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
-            yield chunk.choices[0].delta.content
+
+
+class StreamRenderer:
+    """Coalesce streamed deltas into occasional UI updates.
+
+    Deltas are buffered in a list and the placeholder is redrawn at most once
+    per ``interval_ms`` (or sooner once ``max_pending_chars`` have piled up),
+    instead of once per token.  ``finish()`` always draws the final text.
+    ``renders`` and ``bytes_sent`` show what was pushed to the browser.
+    """
+
+    def __init__(
+        self,
+        slot,
+        interval_ms: int = RENDER_INTERVAL_MS,
+        max_pending_chars: int = RENDER_MAX_PENDING_CHARS,
+        cursor: str = "▌",
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.slot = slot
+        self.interval = interval_ms / 1000.0
+        self.max_pending_chars = max_pending_chars
+        self.cursor = cursor
+        self.clock = clock
+        self._text = ""
+        self._pending: List[str] = []
+        self._pending_chars = 0
+        self._last_flush = clock()
+        self.deltas = 0
+        self.renders = 0
+        self.bytes_sent = 0
+
+    @property
+    def text(self) -> str:
+        if self._pending:
+            self._text += "".join(self._pending)
+            self._pending.clear()
+            self._pending_chars = 0
+        return self._text
+
+    def push(self, delta: str):
+        if not delta:
+            return
+        self._pending.append(delta)
+        self._pending_chars += len(delta)
+        self.deltas += 1
+        if (
+            self._pending_chars >= self.max_pending_chars
+            or self.clock() - self._last_flush >= self.interval
+        ):
+            self.flush()
+
+    def flush(self, final: bool = False):
+        body = self.text if final else self.text + self.cursor
+        self.slot.markdown(body)
+        self.renders += 1
+        self.bytes_sent += len(body.encode("utf-8"))
+        self._last_flush = self.clock()
+
+    def finish(self) -> str:
+        self.flush(final=True)
+        return self._text
+
+    def stats(self) -> Dict[str, int]:
+        return {"deltas": self.deltas, "renders": self.renders, "bytes_sent": self.bytes_sent}
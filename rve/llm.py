@@ -0,0 +1,375 @@
+"""Shared OpenAI client layer.
+
+Every model call in the project goes through one :class:`LLMClient` per
+API key and base URL, so HTTP connections are pooled and reused.  On top of
+the SDK clients it adds:
+
+* a concurrency cap (``RVE_LLM_MAX_CONCURRENCY``); callers beyond it wait up
+  to ``RVE_LLM_QUEUE_TIMEOUT`` seconds and then get :class:`LLMBusy` instead
+  of piling more load onto a struggling API;
+* retries with full-jitter exponential backoff on 429, 5xx, timeouts and
+  connection errors, honouring ``Retry-After`` when the API sends it;
+* coalescing of identical concurrent non-streaming requests, which share one
+  upstream call and its result.
+
+Sync and async interfaces share the same settings; each keeps its own
+concurrency slots.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+import openai
+from openai import AsyncOpenAI, OpenAI
+
+from .cache import cache_key
+
+MAX_CONCURRENCY = int(os.getenv("RVE_LLM_MAX_CONCURRENCY", "8"))
+QUEUE_TIMEOUT = float(os.getenv("RVE_LLM_QUEUE_TIMEOUT", "30"))
+MAX_RETRIES = int(os.getenv("RVE_LLM_MAX_RETRIES", "4"))
+BACKOFF_BASE = float(os.getenv("RVE_LLM_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("RVE_LLM_BACKOFF_MAX", "20"))
+REQUEST_TIMEOUT = float(os.getenv("RVE_LLM_TIMEOUT", "60"))
+
+Message = Dict[str, Any]
+
+
+class LLMBusy(RuntimeError):
+    """No concurrency slot became free within the queue timeout."""
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, (openai.APIConnectionError, openai.RateLimitError)):
+        return True  # APITimeoutError is a connection error
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code == 429 or exc.status_code >= 500
+    return False
+
+
+def backoff_delay(attempt: int, exc: Optional[Exception] = None) -> float:
+    """Seconds to wait before retry ``attempt`` (0-based), with full jitter."""
+    hinted = _retry_after(exc) if exc is not None else None
+    if hinted is not None:
+        return min(hinted, BACKOFF_MAX)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+class LLMClient:
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        *,
+        max_concurrency: int = MAX_CONCURRENCY,
+        queue_timeout: float = QUEUE_TIMEOUT,
+        max_retries: int = MAX_RETRIES,
+        timeout: float = REQUEST_TIMEOUT,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self._sync: Optional[OpenAI] = None
+        self._async: Optional[AsyncOpenAI] = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._async_slots: "weakref.WeakKeyDictionary[Any, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+        self._inflight: Dict[str, Future] = {}
+        self._async_inflight: Dict[Tuple[int, str], asyncio.Future] = {}
+        self.stats: Dict[str, int] = {
+            "requests": 0,
+            "coalesced": 0,
+            "retries": 0,
+            "errors": 0,
+            "rejected": 0,
+            "active": 0,
+        }
+
+    # --- SDK clients (built once, connections pooled) ----------------------
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(max_connections=self.max_concurrency * 2, max_keepalive_connections=self.max_concurrency)
+
+    @property
+    def sync(self) -> OpenAI:
+        if self._sync is None:
+            with self._lock:
+                if self._sync is None:
+                    self._sync = OpenAI(
+                        api_key=self.api_key,
+                        base_url=self.base_url,
+                        max_retries=0,  # retried here, with jitter
+                        timeout=self.timeout,
+                        http_client=httpx.Client(limits=self._limits(), timeout=self.timeout),
+                    )
+        return self._sync
+
+    @property
+    def aio(self) -> AsyncOpenAI:
+        if self._async is None:
+            with self._lock:
+                if self._async is None:
+                    self._async = AsyncOpenAI(
+                        api_key=self.api_key,
+                        base_url=self.base_url,
+                        max_retries=0,
+                        timeout=self.timeout,
+                        http_client=httpx.AsyncClient(limits=self._limits(), timeout=self.timeout),
+                    )
+        return self._async
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self.stats[name] += n
+
+    # --- sync --------------------------------------------------------------
+
+    def _acquire(self):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            self._count("rejected")
+            raise LLMBusy(f"no LLM slot free after {self.queue_timeout:.0f}s")
+        self._count("active")
+
+    def _release(self):
+        self._count("active", -1)
+        self._slots.release()
+
+    def _call(self, fn, max_retries: Optional[int] = None, **kwargs):
+        retries = self.max_retries if max_retries is None else max_retries
+        attempt = 0
+        while True:
+            try:
+                self._count("requests")
+                return fn(**kwargs)
+            except Exception as exc:
+                if attempt >= retries or not is_retryable(exc):
+                    self._count("errors")
+                    raise
+                self._count("retries")
+                time.sleep(backoff_delay(attempt, exc))
+                attempt += 1
+
+    def chat(
+        self, messages: List[Message], *, max_retries: Optional[int] = None, coalesce: bool = True, **params
+    ):
+        """``chat.completions.create`` with limits, retries and coalescing.
+
+        ``max_retries`` overrides the client's retry count for this call, e.g.
+        0 when the caller has its own fallback.  ``coalesce=False`` always
+        sends the request, even if an identical one is in flight.
+        """
+        key = cache_key(messages, params) if coalesce else object()
+        with self._lock:
+            pending = self._inflight.get(key)
+            leader = pending is None
+            if leader:
+                pending = self._inflight[key] = Future()
+            else:
+                self.stats["coalesced"] += 1
+        if not leader:
+            return pending.result()
+        try:
+            self._acquire()
+            try:
+                result = self._call(
+                    self.sync.chat.completions.create, max_retries=max_retries, messages=messages, **params
+                )
+            finally:
+                self._release()
+        except BaseException as exc:
+            pending.set_exception(exc)
+            raise
+        else:
+            pending.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stream_chat(self, messages: List[Message], **params) -> "ChatStream":
+        """Content deltas as a :class:`ChatStream`.  Only failures before the first chunk are retried."""
+        return ChatStream(self, messages, params)
+
+    # --- async -------------------------------------------------------------
+
+    def _async_slot(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        sem = self._async_slots.get(loop)
+        if sem is None:
+            sem = self._async_slots[loop] = asyncio.Semaphore(self.max_concurrency)
+        return sem
+
+    async def _aacquire(self, sem: asyncio.Semaphore):
+        try:
+            await asyncio.wait_for(sem.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._count("rejected")
+            raise LLMBusy(f"no LLM slot free after {self.queue_timeout:.0f}s") from None
+        self._count("active")
+
+    async def _acall(self, fn, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                self._count("requests")
+                return await fn(**kwargs)
+            except Exception as exc:
+                if attempt >= self.max_retries or not is_retryable(exc):
+                    self._count("errors")
+                    raise
+                self._count("retries")
+                await asyncio.sleep(backoff_delay(attempt, exc))
+                attempt += 1
+
+    async def achat(self, messages: List[Message], **params):
+        key = (id(asyncio.get_running_loop()), cache_key(messages, params))
+        pending = self._async_inflight.get(key)
+        if pending is not None:
+            self._count("coalesced")
+            return await asyncio.shield(pending)
+        pending = self._async_inflight[key] = asyncio.get_running_loop().create_future()
+        sem = self._async_slot()
+        try:
+            await self._aacquire(sem)
+            try:
+                result = await self._acall(self.aio.chat.completions.create, messages=messages, **params)
+            finally:
+                self._count("active", -1)
+                sem.release()
+        except BaseException as exc:
+            pending.set_exception(exc)
+            pending.exception()  # mark retrieved when nobody else was waiting
+            raise
+        else:
+            pending.set_result(result)
+            return result
+        finally:
+            self._async_inflight.pop(key, None)
+
+    async def astream_chat(self, messages: List[Message], **params) -> AsyncIterator[str]:
+        sem = self._async_slot()
+        await self._aacquire(sem)
+        stream = None
+        try:
+            stream = await self._acall(self.aio.chat.completions.create, messages=messages, stream=True, **params)
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            if stream is not None:
+                await stream.close()
+            self._count("active", -1)
+            sem.release()
+
+
+class ChatStream:
+    """Iterator over the content deltas of one streamed completion.
+
+    The request is sent on the first ``next()``, once a concurrency slot is
+    free.  Unlike a generator, :meth:`close` may be called from another
+    thread while a reader is blocked on the stream: the slot is released and
+    the HTTP response closed at once, and the reader stops.
+    """
+
+    def __init__(self, client: LLMClient, messages: List[Message], params: Dict[str, Any]):
+        self._client = client
+        self._messages = messages
+        self._params = params
+        self._lock = threading.Lock()
+        self._stream = None
+        self._chunks: Optional[Iterator[Any]] = None
+        self._holding = False  # owns a concurrency slot
+        self.closed = False
+
+    def __iter__(self) -> "ChatStream":
+        return self
+
+    def _open(self):
+        with self._lock:
+            if self.closed:
+                raise StopIteration
+        self._client._acquire()
+        with self._lock:
+            self._holding = True
+        try:
+            stream = self._client._call(
+                self._client.sync.chat.completions.create, messages=self._messages, stream=True, **self._params
+            )
+        except BaseException:
+            self.close()
+            raise
+        with self._lock:
+            self._stream = stream
+            closed = self.closed
+        if closed:  # closed while the request was in flight
+            stream.close()
+            raise StopIteration
+        self._chunks = iter(stream)
+
+    def __next__(self) -> str:
+        if self._chunks is None:
+            self._open()
+        try:
+            for chunk in self._chunks:
+                if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+                    return chunk.choices[0].delta.content
+        except Exception:
+            if self.closed:
+                raise StopIteration from None  # the read was cut short by close()
+            self.close()
+            raise
+        self.close()
+        raise StopIteration
+
+    def close(self):
+        with self._lock:
+            stream, holding = self._stream, self._holding
+            self._holding = False
+            self.closed = True
+        if stream is not None:
+            stream.close()  # hands the connection back to the pool if the caller stopped early
+        if holding:
+            self._client._release()
+
+    def __del__(self):
+        self.close()
+
+
+_clients: Dict[Tuple[Optional[str], Optional[str]], LLMClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(api_key: Optional[str] = None, base_url: Optional[str] = None) -> LLMClient:
+    """Process-wide client; key and base URL default to ``OPENAI_API_KEY`` / ``OPENAI_BASE_URL``."""
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    base_url = base_url or os.getenv("OPENAI_BASE_URL") or None
+    with _clients_lock:
+        client = _clients.get((api_key, base_url))
+        if client is None:
+            client = _clients[(api_key, base_url)] = LLMClient(api_key, base_url)
+        return client
+
+
+def complete(messages: List[Message], **params) -> str:
+    """Text of a single chat completion through the shared client."""
+    resp = get_client().chat(messages, **params)
+    return resp.choices[0].message.content or ""
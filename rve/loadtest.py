@@ -0,0 +1,330 @@
+"""Offline load harness for the chat path.
+
+:class:`FakeOpenAIServer` is a local stand-in for the OpenAI chat completions
+endpoint (streaming and non-streaming) with a configurable time to first
+token, token rate and injected error rate.  :func:`run_load` replays
+conversation traces against it — or against any ``--base-url`` — at a fixed
+concurrency and reports TTFT percentiles, token throughput and error rates::
+
+    python -m rve.loadtest --trace requests.jsonl --concurrency 16 --requests 200
+
+``--mode stream`` drives the streaming path used by ``rve.live.stream_chat``;
+``--mode reply`` sends Sareth's full non-streaming reply request (its system
+prompt, few-shots and sampling parameters; its TTFT is the full reply
+latency), bypassing the response cache, admission control and request
+coalescing so every replayed request reaches the server.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, List, Optional
+
+from .latency import percentile
+from .llm import LLMClient
+
+WORDS = "the signal folds back into itself and a steadier pattern emerges".split()
+
+
+class FakeOpenAIServer:
+    """OpenAI-compatible ``/v1/chat/completions`` served from a background thread."""
+
+    def __init__(
+        self,
+        ttft: float = 0.2,
+        token_rate: float = 50.0,
+        reply_tokens: int = 64,
+        error_rate: float = 0.0,
+        error_status: int = 429,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        seed: Optional[int] = None,
+        model_ttft: Optional[Dict[str, float]] = None,
+    ):
+        self.ttft = ttft
+        self.model_ttft = dict(model_ttft or {})  # per-model overrides of ``ttft``
+        self.token_rate = token_rate
+        self.reply_tokens = reply_tokens
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.requests = 0
+        self.errors = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            self.requests += 1
+            fail = self._rng.random() < self.error_rate
+            self.errors += fail
+            return fail
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _json(self, status: int, payload: Dict[str, Any]):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                req = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if not self.path.endswith("/chat/completions"):
+                    return self._json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+                if server._should_fail():
+                    return self._json(
+                        server.error_status,
+                        {"error": {"message": "injected failure", "type": "server_error", "code": None}},
+                    )
+                n = min(server.reply_tokens, req.get("max_tokens") or server.reply_tokens)
+                tokens = [WORDS[i % len(WORDS)] + " " for i in range(n)]
+                model = req.get("model", "fake")
+                cid = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+                time.sleep(server.model_ttft.get(model, server.ttft))
+                if req.get("stream"):
+                    self._stream(cid, model, tokens)
+                else:
+                    time.sleep(max(n - 1, 0) / server.token_rate)
+                    self._json(
+                        200,
+                        {
+                            "id": cid,
+                            "object": "chat.completion",
+                            "created": int(time.time()),
+                            "model": model,
+                            "choices": [
+                                {
+                                    "index": 0,
+                                    "message": {"role": "assistant", "content": "".join(tokens)},
+                                    "finish_reason": "stop",
+                                }
+                            ],
+                            "usage": {"prompt_tokens": 0, "completion_tokens": n, "total_tokens": n},
+                        },
+                    )
+
+            def _stream(self, cid: str, model: str, tokens: List[str]):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                for i, tok in enumerate(tokens):
+                    if i:
+                        time.sleep(1.0 / server.token_rate)
+                    delta = {"content": tok, **({"role": "assistant"} if i == 0 else {})}
+                    chunk = {
+                        "id": cid,
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+
+        return Handler
+
+
+# --- trace replay -----------------------------------------------------------
+
+
+def load_trace(path: str) -> List[List[Dict[str, str]]]:
+    """Read conversations from JSONL.
+
+    A line may carry ``messages`` (a chat message list) or a single prompt in
+    ``input``, ``prompt``, ``content`` or ``body`` (``title`` is prepended).
+    """
+    out = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            if row.get("messages"):
+                out.append(row["messages"])
+                continue
+            text = next((row[k] for k in ("input", "prompt", "content", "body") if row.get(k)), "")
+            if row.get("title"):
+                text = f"{row['title']}\n{text}".strip()
+            out.append([{"role": "user", "content": text}])
+    return out
+
+
+def _stream_one(client: LLMClient, messages, model: str) -> Dict[str, Any]:
+    start = time.perf_counter()
+    ttft, tokens = None, 0
+    for _ in client.stream_chat(messages, model=model, temperature=0.2):
+        if ttft is None:
+            ttft = time.perf_counter() - start
+        tokens += 1
+    return {"ttft": ttft, "tokens": tokens, "latency": time.perf_counter() - start}
+
+
+def _reply_one(client: LLMClient, messages, model: str) -> Dict[str, Any]:
+    import sareth_chat
+
+    user = [m for m in messages if m.get("role") == "user"]
+    history = [(m["role"], m["content"]) for m in messages[:-1] if m.get("role") in ("user", "assistant")]
+    msgs = sareth_chat._build_messages(user[-1]["content"] if user else "", history)
+    start = time.perf_counter()
+    resp = client.chat(msgs, coalesce=False, **sareth_chat._reply_params(model))
+    text = sareth_chat._polish(resp.choices[0].message.content.strip())
+    latency = time.perf_counter() - start
+    return {"ttft": latency, "tokens": len(text.split()), "latency": latency}
+
+
+def run_load(
+    traces: List[List[Dict[str, str]]],
+    base_url: str,
+    *,
+    concurrency: int = 8,
+    requests: Optional[int] = None,
+    mode: str = "stream",
+    model: str = "gpt-4o-mini",
+    max_retries: int = 0,
+) -> Dict[str, Any]:
+    """Replay ``traces`` (cycled to ``requests`` items) and summarise the results."""
+    if not traces:
+        raise ValueError("no traces to replay")
+    total = requests or len(traces)
+    work = [traces[i % len(traces)] for i in range(total)]
+    client = LLMClient(
+        os.getenv("OPENAI_API_KEY", "loadtest"),
+        base_url,
+        max_concurrency=concurrency,
+        max_retries=max_retries,
+    )
+    if mode == "reply":
+        one = lambda msgs: _reply_one(client, msgs, model)  # noqa: E731
+    else:
+        one = lambda msgs: _stream_one(client, msgs, model)  # noqa: E731
+
+    def task(msgs):
+        try:
+            return one(msgs)
+        except Exception as exc:
+            return {"error": type(exc).__name__}
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(task, work))
+    wall = time.perf_counter() - start
+    return summarize(results, wall, concurrency=concurrency, mode=mode)
+
+
+def summarize(results: Iterable[Dict[str, Any]], wall: float, **extra) -> Dict[str, Any]:
+    results = list(results)
+    ok = [r for r in results if "error" not in r]
+    errors: Dict[str, int] = {}
+    for r in results:
+        if "error" in r:
+            errors[r["error"]] = errors.get(r["error"], 0) + 1
+    ttfts = [r["ttft"] for r in ok if r["ttft"] is not None]
+    tokens = sum(r["tokens"] for r in ok)
+    per_request = [
+        r["tokens"] / (r["latency"] - r["ttft"])
+        for r in ok
+        if r["ttft"] is not None and r["latency"] > r["ttft"]
+    ]
+
+    def ms(v):
+        return None if v is None else round(v * 1000, 1)
+
+    return {
+        **extra,
+        "requests": len(results),
+        "ok": len(ok),
+        "error_rate": round(1 - len(ok) / len(results), 4) if results else 0.0,
+        "errors": errors,
+        "wall_s": round(wall, 3),
+        "requests_per_s": round(len(results) / wall, 2) if wall else None,
+        "ttft_ms": {"p50": ms(percentile(ttfts, 0.5)), "p95": ms(percentile(ttfts, 0.95)), "p99": ms(percentile(ttfts, 0.99))},
+        "tokens": tokens,
+        "tokens_per_s": round(tokens / wall, 1) if wall else None,
+        "stream_tokens_per_s_p50": round(percentile(per_request, 0.5), 1) if per_request else None,
+    }
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Replay chat traces against a fake or real OpenAI endpoint.")
+    p.add_argument("--trace", default="requests.jsonl", help="JSONL conversations to replay")
+    p.add_argument("--requests", type=int, help="total requests (trace is cycled); default one per line")
+    p.add_argument("--concurrency", type=int, default=8)
+    p.add_argument("--mode", choices=("stream", "reply"), default="stream")
+    p.add_argument("--model", default="gpt-4o-mini")
+    p.add_argument("--max-retries", type=int, default=0, help="client retries (stream mode)")
+    p.add_argument("--base-url", help="use this endpoint instead of starting the fake server")
+    p.add_argument("--ttft", type=float, default=0.2, help="fake server: seconds to first token")
+    p.add_argument("--token-rate", type=float, default=50.0, help="fake server: tokens per second")
+    p.add_argument("--reply-tokens", type=int, default=64, help="fake server: tokens per reply")
+    p.add_argument("--error-rate", type=float, default=0.0, help="fake server: fraction of requests failed")
+    p.add_argument("--error-status", type=int, default=429, help="fake server: status of injected failures")
+    p.add_argument("--seed", type=int)
+    args = p.parse_args(argv)
+
+    traces = load_trace(args.trace)
+    kwargs = dict(
+        concurrency=args.concurrency,
+        requests=args.requests,
+        mode=args.mode,
+        model=args.model,
+        max_retries=args.max_retries,
+    )
+    if args.base_url:
+        report = run_load(traces, args.base_url, **kwargs)
+    else:
+        with FakeOpenAIServer(
+            ttft=args.ttft,
+            token_rate=args.token_rate,
+            reply_tokens=args.reply_tokens,
+            error_rate=args.error_rate,
+            error_status=args.error_status,
+            seed=args.seed,
+        ) as server:
+            report = run_load(traces, server.base_url, **kwargs)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""Append-only JSONL memory for Sareth agents.
+
+The in-RAM window is a ``deque(maxlen=limit)``, so adding a record never
+shifts the others.  Records not yet on disk are appended to the log file in
+batches of ``flush_every``, once ``flush_interval`` seconds have passed since
+the last write, on :meth:`MemoryLog.flush` and at interpreter exit, so a save
+writes only what is new and little is lost when a session just stops.
+
+Several sessions (Streamlit reruns, processes) may append to one file.
+Once enough records have been appended since the last compaction, the log
+is rewritten to the last ``limit`` lines *of the file* (re-read under a lock
+file, written to a temp file, then swapped in), so other sessions' records
+survive and the file stays within a few windows in size.  Loading seeks from
+the end of the file and parses only the last ``limit`` lines.
+"""
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - depends on platform
+    fcntl = None
+
+FLUSH_EVERY = 32
+FLUSH_INTERVAL_SECONDS = 5.0
+COMPACT_FACTOR = 4  # compact once this many windows' worth of lines were appended
+TAIL_BLOCK_BYTES = 64 * 1024
+
+
+def tail_lines(path: str, n: int, block: int = TAIL_BLOCK_BYTES) -> List[bytes]:
+    """The last ``n`` complete lines of ``path``, reading backwards from the end."""
+    if n <= 0:
+        return []
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        buf = b""
+        while pos > 0 and buf.count(b"\n") <= n:
+            step = min(block, pos)
+            pos -= step
+            f.seek(pos)
+            buf = f.read(step) + buf
+    lines = buf.splitlines()
+    if pos > 0:
+        lines = lines[1:]  # the first line read is probably cut off
+    return [line for line in lines if line.strip()][-n:]
+
+
+_thread_lock = threading.Lock()  # flock is per process on some platforms
+_open_logs: "weakref.WeakSet[MemoryLog]" = weakref.WeakSet()
+
+
+@contextmanager
+def _file_lock(path: str):
+    """Exclusive lock on ``path`` shared by every thread and process writing it."""
+    with _thread_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(f"{path}.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+@atexit.register
+def _flush_open_logs():
+    for log in list(_open_logs):
+        try:
+            log.flush()
+        except OSError:
+            pass
+
+
+class MemoryLog:
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        limit: int = 1000,
+        flush_every: int = FLUSH_EVERY,
+        compact_factor: int = COMPACT_FACTOR,
+        flush_interval: float = FLUSH_INTERVAL_SECONDS,
+    ):
+        self.path = path
+        self.limit = limit
+        self.flush_every = flush_every
+        self.compact_factor = compact_factor
+        self.flush_interval = flush_interval
+        self.window: deque = deque(maxlen=limit)
+        # Unsaved records beyond one window would be compacted away anyway.
+        self._pending: deque = deque(maxlen=limit)
+        self._appended = 0  # lines appended since the last compaction
+        self._flushed_at = time.monotonic()
+        _open_logs.add(self)
+
+    # --- list-like view of the window --------------------------------------
+
+    def __len__(self) -> int:
+        return len(self.window)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.window)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self.window)[index]
+        return self.window[index]
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        return list(self.window)
+
+    # --- writes -------------------------------------------------------------
+
+    def append(self, record: Dict[str, Any]):
+        self.window.append(record)
+        self._pending.append(record)
+        if self.path and (
+            len(self._pending) >= self.flush_every
+            or time.monotonic() - self._flushed_at >= self.flush_interval
+        ):
+            self.flush()
+
+    def flush(self, path: Optional[str] = None):
+        """Append unsaved records to the log (``path`` switches the log file first)."""
+        if path is not None and path != self.path:
+            self.path = path
+            self._appended = 0
+        if not self.path or not self._pending:
+            return
+        if self._appended + len(self._pending) >= self.limit * (self.compact_factor - 1):
+            self.compact()
+            return
+        with _file_lock(self.path):
+            self._write_pending()
+
+    def _write_pending(self):
+        data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in self._pending)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(data)
+        self._appended += len(self._pending)
+        self._pending.clear()
+        self._flushed_at = time.monotonic()
+
+    def compact(self):
+        """Save unsaved records, then cut the log to its last ``limit`` lines, whoever wrote them."""
+        if not self.path:
+            return
+        with _file_lock(self.path):
+            if self._pending:
+                self._write_pending()
+            if os.path.exists(self.path):
+                tmp = f"{self.path}.tmp"
+                with open(tmp, "wb") as f:
+                    for line in tail_lines(self.path, self.limit):
+                        f.write(line + b"\n")
+                os.replace(tmp, self.path)
+        self._appended = 0
+
+    # --- reads --------------------------------------------------------------
+
+    def load(self, path: Optional[str] = None, n: Optional[int] = None, legacy: Optional[str] = None) -> int:
+        """Replace the window with the last ``n`` (default ``limit``) records of the log.
+
+        Lines that do not parse, such as one torn by a crash mid-write, are
+        skipped.  If the log does not exist yet but ``legacy`` (a JSON array
+        file) does, its records are imported once.  Returns the number of
+        records loaded.
+        """
+        if path is not None:
+            self.path = path
+            self._appended = 0
+        self.window.clear()
+        self._pending.clear()
+        if not self.path:
+            return 0
+        if not os.path.exists(self.path):
+            if legacy and os.path.exists(legacy):
+                with open(legacy, "r") as f:
+                    self.import_records(json.load(f)[-self.limit:])
+            return len(self.window)
+        for line in tail_lines(self.path, min(n or self.limit, self.limit)):
+            try:
+                self.window.append(json.loads(line))
+            except ValueError:
+                continue
+        return len(self.window)
+
+    def import_records(self, records: List[Dict[str, Any]]):
+        """Adopt records from elsewhere (e.g. a legacy JSON file) and persist them."""
+        self.window.extend(records)
+        self._pending.extend(records)
+        self.compact()
@@ -2,12 +2,18 @@ import os
 import streamlit as st
 from openai import OpenAI
 
+from rve.llm import LLMClient, get_client
+
 
 @st.cache_resource
-def openai_client() -> OpenAI:
+def llm_client() -> LLMClient:
     api_key = st.secrets.get("OPENAI_API_KEY", None) or os.getenv("OPENAI_API_KEY")
     if not api_key:
         raise RuntimeError(
             "Missing OpenAI API key. Set st.secrets['OPENAI_API_KEY'] or OPENAI_API_KEY env var."
         )
-    return OpenAI(api_key=api_key)
+    return get_client(api_key=api_key)
+
+
+def openai_client() -> OpenAI:
+    return llm_client().sync
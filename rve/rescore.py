@@ -0,0 +1,213 @@
+"""Bulk re-scoring of existing claims after a scoring formula change.
+
+Claims are read in primary-key order, ``batch_size`` at a time, scored with
+:func:`rve.scoring.score_arrays` and written back with one bulk UPDATE per
+batch.  Progress can be checkpointed to a JSON file so an interrupted run
+resumes after the last committed batch; a run that finishes removes the
+checkpoint, so the next one starts from the beginning.  The checkpoint also
+records which user's claims the run covers, and resuming it for another
+user (or for all users) is refused.  ``dry_run`` computes the same
+summary without writing anything.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from collections import Counter
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+from sqlalchemy import insert, update
+
+from .ledger import Claim, DriftHistory, User, bump_claim_summary, drift_bucket, get_session
+from .scoring import score_arrays
+
+DEFAULT_BATCH_SIZE = 5_000
+EPSILON = 1e-9
+
+
+def _read_checkpoint(path: Optional[str], user_id: Optional[int]) -> int:
+    if not path:
+        return 0
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return 0
+    if state.get("user_id") != user_id:
+        raise ValueError(
+            f"{path} is a checkpoint for user_id={state.get('user_id')}, not user_id={user_id}; "
+            "use another checkpoint file"
+        )
+    return int(state.get("last_id", 0))
+
+
+def _write_checkpoint(path: str, last_id: int, user_id: Optional[int]):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"last_id": last_id, "user_id": user_id}, f)
+    os.replace(tmp, path)
+
+
+def _clear_checkpoint(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def rescore_claims(
+    sess,
+    user: Optional[User] = None,
+    *,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    dry_run: bool = False,
+    append_history: bool = False,
+    after_id: Optional[int] = None,
+    checkpoint_path: Optional[str] = None,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """Recompute ``drift_score`` and ``confidence_index`` for stored claims.
+
+    Returns a summary with the number of claims scanned and changed and the
+    largest and mean absolute score changes.  With ``append_history`` every
+    claim whose drift moved also gets a ``DriftHistory`` row.  A checkpoint
+    written for a different ``user`` raises ``ValueError``.
+    """
+    user_id = user.id if user is not None else None
+    if after_id is None:
+        after_id = _read_checkpoint(checkpoint_path, user_id)
+    base = sess.query(
+        Claim.id,
+        Claim.user_id,
+        Claim.provenance_completeness,
+        Claim.independence_score,
+        Claim.drift_score,
+        Claim.confidence_index,
+    ).order_by(Claim.id)
+    if user is not None:
+        base = base.filter(Claim.user_id == user_id)
+
+    summary = {
+        "scanned": 0,
+        "changed": 0,
+        "max_drift_delta": 0.0,
+        "max_confidence_delta": 0.0,
+        "mean_drift_delta": 0.0,
+        "last_id": after_id,
+        "dry_run": dry_run,
+    }
+    drift_delta_sum = 0.0
+    last_id = after_id
+    while True:
+        rows = base.filter(Claim.id > last_id).limit(batch_size).all()
+        if not rows:
+            break
+        ids, user_ids, *scores = zip(*rows)
+        pc, ind, old_drift, old_conf = (
+            np.nan_to_num(np.array(col, dtype=np.float64)) for col in scores
+        )
+
+        drift, conf = score_arrays(pc, ind)
+        d_drift = np.abs(drift - old_drift)
+        d_conf = np.abs(conf - old_conf)
+        changed = (d_drift > EPSILON) | (d_conf > EPSILON)
+        idx = np.flatnonzero(changed)
+
+        if len(idx) and not dry_run:
+            sess.execute(
+                update(Claim),
+                [
+                    {
+                        "id": int(ids[i]),
+                        "drift_score": float(drift[i]),
+                        "confidence_index": float(conf[i]),
+                    }
+                    for i in idx
+                ],
+            )
+            deltas: Dict[int, Dict[str, Any]] = {}
+            for i in idx:
+                d = deltas.setdefault(
+                    int(user_ids[i]), {"drift": 0.0, "confidence": 0.0, "buckets": Counter()}
+                )
+                d["drift"] += float(drift[i] - old_drift[i])
+                d["confidence"] += float(conf[i] - old_conf[i])
+                d["buckets"][drift_bucket(old_drift[i])] -= 1
+                d["buckets"][drift_bucket(drift[i])] += 1
+            for uid, d in deltas.items():
+                bump_claim_summary(
+                    sess, uid, drift=d["drift"], confidence=d["confidence"], buckets=d["buckets"]
+                )
+            if append_history:
+                moved = idx[d_drift[idx] > EPSILON]
+                if len(moved):
+                    sess.execute(
+                        insert(DriftHistory),
+                        [
+                            {
+                                "user_id": int(user_ids[i]),
+                                "claim_id_fk": int(ids[i]),
+                                "drift": float(drift[i]),
+                            }
+                            for i in moved
+                        ],
+                    )
+            sess.commit()
+
+        last_id = int(ids[-1])
+        summary["scanned"] += len(ids)
+        summary["changed"] += len(idx)
+        summary["max_drift_delta"] = max(summary["max_drift_delta"], float(d_drift.max()))
+        summary["max_confidence_delta"] = max(summary["max_confidence_delta"], float(d_conf.max()))
+        drift_delta_sum += float(d_drift.sum())
+        summary["last_id"] = last_id
+        if checkpoint_path and not dry_run:
+            _write_checkpoint(checkpoint_path, last_id, user_id)
+        if progress:
+            progress(dict(summary))
+
+    if checkpoint_path and not dry_run:
+        _clear_checkpoint(checkpoint_path)
+    if summary["scanned"]:
+        summary["mean_drift_delta"] = drift_delta_sum / summary["scanned"]
+    return summary
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Re-score stored claims with the current formula.")
+    p.add_argument("--email", help="only re-score this user's claims")
+    p.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    p.add_argument("--dry-run", action="store_true", help="report changes without writing")
+    p.add_argument("--history", action="store_true", help="append DriftHistory rows for moved claims")
+    p.add_argument("--checkpoint", help="JSON file used to resume an interrupted run")
+    args = p.parse_args(argv)
+
+    sess = get_session()
+    user = None
+    if args.email:
+        user = sess.query(User).filter_by(email=args.email).one_or_none()
+        if not user:
+            p.error(f"unknown user {args.email!r}")
+
+    def report(s):
+        print(f"scanned {s['scanned']} · changed {s['changed']} · last id {s['last_id']}", flush=True)
+
+    try:
+        summary = rescore_claims(
+            sess,
+            user,
+            batch_size=args.batch_size,
+            dry_run=args.dry_run,
+            append_history=args.history,
+            checkpoint_path=args.checkpoint,
+            progress=report,
+        )
+    except ValueError as exc:
+        p.error(str(exc))
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
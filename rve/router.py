@@ -0,0 +1,251 @@
+"""Latency-aware model routing.
+
+:func:`choose_model` picks a model per request.  It prefers the most capable
+candidate whose expected p95 time to first token fits the SLO
+(``RVE_TTFT_SLO_MS``).  The expectation comes from recent measurements in
+:mod:`rve.latency`, or from a static prior until enough samples exist, plus a
+prefill allowance for long prompts.  Models that cannot hold the prompt, or
+that fail too often, are skipped.  The returned :class:`Route` says which
+model was chosen and why.
+
+:func:`hedged_stream` serves a streamed request along a route.  If the first
+token has not arrived after ``hedge_after_s``, the next faster model is asked
+in parallel, and whichever answers first wins; the others are closed
+right away so their connections and slots go back to the pool.  If an
+attempt fails or misses ``first_token_timeout_s`` before its first token,
+the request moves on to the next fallback.
+"""
+from __future__ import annotations
+
+import inspect
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from .latency import LatencyRecorder, get_recorder, instrument
+
+AUTO = "auto"
+TTFT_SLO_MS = float(os.getenv("RVE_TTFT_SLO_MS", "1500"))
+MIN_SAMPLES = int(os.getenv("RVE_ROUTER_MIN_SAMPLES", "5"))
+MAX_ERROR_RATE = float(os.getenv("RVE_ROUTER_MAX_ERROR_RATE", "0.2"))
+PREFILL_MS_PER_1K_TOKENS = float(os.getenv("RVE_ROUTER_PREFILL_MS_PER_1K", "25"))
+
+
+class ModelSpec(NamedTuple):
+    name: str
+    quality: int  # higher is preferred when it fits the SLO
+    context_tokens: int
+    prior_ttft_ms: float  # assumed p95 until measured
+
+
+MODELS: List[ModelSpec] = [
+    ModelSpec("gpt-4o", 3, 128_000, 900.0),
+    ModelSpec("gpt-4.1-mini", 2, 1_000_000, 600.0),
+    ModelSpec("gpt-4o-mini", 1, 128_000, 450.0),
+]
+
+
+class Route:
+    """A routing decision; ``events`` and ``served_by`` are filled in while serving."""
+
+    def __init__(self, model: str, reason: str, fallbacks: List[str], estimates: Dict[str, dict], slo_ms: float):
+        self.model = model
+        self.reason = reason
+        self.fallbacks = fallbacks
+        self.estimates = estimates
+        self.slo_ms = slo_ms
+        self.served_by: Optional[str] = None
+        self.events: List[str] = []
+
+    def as_dict(self) -> dict:
+        return {
+            "model": self.model,
+            "reason": self.reason,
+            "fallbacks": self.fallbacks,
+            "slo_ms": self.slo_ms,
+            "served_by": self.served_by,
+            "events": self.events,
+            "estimates": self.estimates,
+        }
+
+
+def estimate(spec: ModelSpec, prompt_tokens: int, recorder: LatencyRecorder) -> dict:
+    stats = recorder.model_stats(spec.name)
+    enough = stats is not None and stats["requests"] >= MIN_SAMPLES
+    measured = enough and stats["ttft_ms_p95"] is not None
+    base = stats["ttft_ms_p95"] if measured else spec.prior_ttft_ms
+    return {
+        "ttft_ms_p95": round(base + prompt_tokens / 1000 * PREFILL_MS_PER_1K_TOKENS, 1),
+        "error_rate": stats["error_rate"] if enough else 0.0,
+        "source": "measured" if measured else "prior",
+    }
+
+
+def choose_model(
+    prompt_tokens: int,
+    slo_ms: Optional[float] = None,
+    models: Optional[Iterable[ModelSpec]] = None,
+    recorder: Optional[LatencyRecorder] = None,
+) -> Route:
+    slo_ms = TTFT_SLO_MS if slo_ms is None else slo_ms
+    recorder = recorder or get_recorder()
+    specs = list(models or MODELS)
+    estimates: Dict[str, dict] = {}
+    eligible: List[ModelSpec] = []
+    for spec in specs:
+        est = estimates[spec.name] = estimate(spec, prompt_tokens, recorder)
+        if prompt_tokens > spec.context_tokens:
+            est["skipped"] = "prompt exceeds context"
+        elif est["error_rate"] > MAX_ERROR_RATE:
+            est["skipped"] = f"error rate {est['error_rate']:.0%}"
+        else:
+            eligible.append(spec)
+    if not eligible:
+        # Nothing is healthy; the largest context is the best remaining bet.
+        eligible = [max(specs, key=lambda s: s.context_tokens)]
+
+    def ttft(s):
+        return estimates[s.name]["ttft_ms_p95"]
+
+    fitting = [s for s in eligible if ttft(s) <= slo_ms]
+    if fitting:
+        pick = max(fitting, key=lambda s: (s.quality, -ttft(s)))
+        reason = f"best model within {slo_ms:.0f} ms SLO (p95 TTFT ~{ttft(pick):.0f} ms, {estimates[pick.name]['source']})"
+    else:
+        pick = min(eligible, key=ttft)
+        reason = f"no model meets {slo_ms:.0f} ms SLO; fastest is ~{ttft(pick):.0f} ms"
+    skipped = [f"{n}: {e['skipped']}" for n, e in estimates.items() if "skipped" in e]
+    if skipped:
+        reason += "; skipped " + ", ".join(skipped)
+    fallbacks = [s.name for s in sorted(eligible, key=ttft) if s.name != pick.name and ttft(s) < ttft(pick)]
+    return Route(pick.name, reason, fallbacks, estimates, slo_ms)
+
+
+def hedged_stream(
+    route: Route,
+    open_stream: Callable[[str], Iterable[str]],
+    *,
+    hedge_after_s: Optional[float] = None,
+    first_token_timeout_s: Optional[float] = None,
+    recorder: Optional[LatencyRecorder] = None,
+) -> Iterator[str]:
+    """Stream deltas from the first of the route's models to produce a token.
+
+    ``open_stream(model)`` returns that model's delta iterator.  Each attempt
+    runs in its own thread and is measured with :func:`rve.latency.instrument`.
+    Losing attempts are closed as soon as the winner yields, from this
+    thread, if the iterator has a thread-safe ``close()`` (such as
+    :class:`rve.llm.ChatStream`); plain generators stop at their next yield.
+    Attempts still running when the result ends or the consumer closes it
+    (even after the first token) are cancelled the same way.
+    """
+    hedge_after = route.slo_ms / 2000 if hedge_after_s is None else hedge_after_s
+    timeout = route.slo_ms / 1000 * 2 if first_token_timeout_s is None else first_token_timeout_s
+    pending = [route.model] + list(route.fallbacks)
+    events: "queue.Queue[tuple]" = queue.Queue()
+    cancels: List[threading.Event] = []
+    streams: List[Optional[Iterable[str]]] = []
+    models: List[str] = []
+    live = set()
+    start = time.monotonic()
+
+    def abort(idx: int):
+        cancels[idx].set()
+        stream = streams[idx]
+        if stream is not None and not inspect.isgenerator(stream) and hasattr(stream, "close"):
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+    def run(idx: int, model: str, cancel: threading.Event):
+        try:
+            stream = streams[idx] = open_stream(model)
+            if cancel.is_set():
+                abort(idx)  # cancelled while opening
+            it = instrument(stream, model, recorder, cancelled=cancel)
+            try:
+                for delta in it:
+                    if cancel.is_set():
+                        break
+                    events.put((idx, "delta", delta))
+            finally:
+                it.close()
+            events.put((idx, "end", None))
+        except Exception as exc:
+            events.put((idx, "error", exc))
+
+    def launch(why: str):
+        model = pending.pop(0)
+        cancel = threading.Event()
+        idx = len(models)
+        models.append(model)
+        cancels.append(cancel)
+        streams.append(None)
+        live.add(idx)
+        if idx:
+            route.events.append(f"{why}: started {model} at {(time.monotonic() - start) * 1000:.0f} ms")
+        threading.Thread(target=run, args=(idx, model, cancel), daemon=True, name=f"rve-hedge-{model}").start()
+
+    launch("primary")
+    hedged = False
+    deadline = start + timeout
+    winner = None
+    last_error: Optional[Exception] = None
+    try:
+        while winner is None:
+            now = time.monotonic()
+            wait = deadline - now
+            if not hedged and pending:
+                wait = min(wait, start + hedge_after - now)
+            try:
+                idx, kind, value = events.get(timeout=max(wait, 0))
+            except queue.Empty:
+                now = time.monotonic()
+                if not hedged and pending and now >= start + hedge_after:
+                    hedged = True
+                    launch("hedge")
+                elif now >= deadline:
+                    if not pending:
+                        raise TimeoutError(f"no first token within {timeout:.1f}s from {', '.join(models)}")
+                    launch("timeout")
+                    deadline = now + timeout
+                continue
+            if kind == "delta":
+                winner = idx
+                route.served_by = models[idx]
+                for i in live - {idx}:
+                    abort(i)
+                yield value
+                break
+            live.discard(idx)
+            if kind == "error":
+                last_error = value
+                route.events.append(f"{models[idx]} failed: {type(value).__name__}")
+            elif kind == "end":
+                route.served_by = models[idx]  # finished without content
+                return
+            if not live:
+                if not pending:
+                    raise last_error
+                launch("fallback")
+                deadline = time.monotonic() + timeout
+
+        while True:
+            idx, kind, value = events.get()
+            if idx != winner:
+                continue
+            if kind == "delta":
+                yield value
+                continue
+            live.discard(idx)
+            if kind == "end":
+                return
+            raise value
+    finally:
+        # Whatever is still running, including the winner when the consumer
+        # stops early, is cancelled.
+        for i in live:
+            abort(i)
@@ -0,0 +1,41 @@
+"""Drift and confidence scoring for claims.
+
+``score_claim`` is what ``add_claim`` applies at insert time; ``score_arrays``
+is the same formula over NumPy arrays so existing claims can be re-scored in
+bulk when the formula changes.  Keep the two in step.
+"""
+from __future__ import annotations
+
+from typing import Tuple
+
+import numpy as np
+
+MAX_INDEPENDENCE = 3
+MAX_DRIFT = 5.0
+
+
+def provenance_completeness(prov_fields: int, prov_total: int = 6) -> float:
+    return prov_fields / float(max(prov_total, 1))
+
+
+def clamp_independence(independent_sources: int) -> int:
+    return max(0, min(MAX_INDEPENDENCE, independent_sources))
+
+
+def score_claim(pc: float, ind: int) -> Tuple[float, float]:
+    """Return ``(drift_score, confidence_index)`` for one claim."""
+    drift = max(0.0, min(MAX_DRIFT, 3.0 - (pc * 2.0) - (0.4 * ind)))
+    conf = max(
+        0.0,
+        min(1.0, (0.6 * pc + 0.4 * (ind / 3.0)) * (1.0 - (drift / 10.0))),
+    )
+    return drift, conf
+
+
+def score_arrays(pc, ind) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectorised :func:`score_claim` over arrays of completeness and independence."""
+    pc = np.asarray(pc, dtype=np.float64)
+    ind = np.clip(np.asarray(ind, dtype=np.float64), 0, MAX_INDEPENDENCE)
+    drift = np.clip(3.0 - (pc * 2.0) - (0.4 * ind), 0.0, MAX_DRIFT)
+    conf = np.clip((0.6 * pc + 0.4 * (ind / 3.0)) * (1.0 - (drift / 10.0)), 0.0, 1.0)
+    return drift, conf
@@ -0,0 +1,51 @@
+"""Process-wide VADER sentiment with no network access.
+
+The analyzer is built on first use, not at import.  It uses NLTK's own
+``vader_lexicon`` if it is already in an NLTK data directory, and otherwise
+the copy bundled under ``data/nltk_data`` (MIT licensed, see the LICENSE file
+next to it).  It is never downloaded.  Because the analyzer lives in an
+imported module, Streamlit reruns of a page script reuse it.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, List
+
+BUNDLED_DATA = Path(__file__).resolve().parent.parent / "data" / "nltk_data"
+PULSE_CACHE_SIZE = int(os.getenv("RVE_PULSE_CACHE", "4096"))
+
+_analyzer = None
+_lock = threading.Lock()
+
+
+def get_analyzer():
+    """The shared ``SentimentIntensityAnalyzer``, loaded on first call."""
+    global _analyzer
+    if _analyzer is None:
+        with _lock:
+            if _analyzer is None:
+                import nltk
+                from nltk.sentiment import SentimentIntensityAnalyzer
+
+                try:
+                    nltk.data.find("sentiment/vader_lexicon.zip")
+                    _analyzer = SentimentIntensityAnalyzer()
+                except LookupError:
+                    if str(BUNDLED_DATA) not in nltk.data.path:
+                        nltk.data.path.append(str(BUNDLED_DATA))
+                    _analyzer = SentimentIntensityAnalyzer("sentiment/vader_lexicon.txt")
+    return _analyzer
+
+
+@lru_cache(maxsize=PULSE_CACHE_SIZE)
+def pulse_score(text: str) -> float:
+    """VADER compound score of ``text`` rescaled from [-1, 1] to [0, 1]."""
+    return (get_analyzer().polarity_scores(text)["compound"] + 1) / 2
+
+
+def pulse_scores(texts: Iterable[str]) -> List[float]:
+    """:func:`pulse_score` for many texts; repeated texts are scored once."""
+    return [pulse_score(t) for t in texts]
@@ -0,0 +1,312 @@
+"""User-sharded ledger storage.
+
+Every ledger row belongs to one user, so users are the unit of placement: a
+consistent-hash ring over the shard names from
+:func:`rve.config.get_shard_urls` maps each user's email to one database.
+Adding a shard only moves the users whose ring segment it takes over, and
+:func:`rebalance` copies exactly those users to their new home.
+
+Ids are per shard, so always route by email, never by ``user.id``.
+"""
+from __future__ import annotations
+
+import argparse
+import bisect
+import hashlib
+import threading
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, insert, or_, select
+from sqlalchemy.orm import object_session
+
+from .config import get_shard_urls
+from .ledger import (
+    Artifact,
+    Claim,
+    ClaimSummary,
+    DriftHistory,
+    User,
+    VolatilityCount,
+    add_claim,
+    append_drift,
+    get_engine,
+    get_or_create_user,
+    get_session,
+    index_claim_texts,
+    list_claims,
+    rebuild_claim_summary,
+    unindex_claim_texts,
+)
+
+VIRTUAL_NODES = 64
+MOVE_BATCH_SIZE = 1_000
+
+
+def _ring_hash(key: str) -> int:
+    return int.from_bytes(hashlib.sha1(key.encode("utf-8")).digest()[:8], "big")
+
+
+class ShardRouter:
+    def __init__(self, shards: Optional[Dict[str, str]] = None, vnodes: int = VIRTUAL_NODES):
+        self.shards = dict(shards or get_shard_urls())
+        if not self.shards:
+            raise ValueError("ShardRouter needs at least one shard")
+        ring = sorted(
+            (_ring_hash(f"{name}#{i}"), name) for name in self.shards for i in range(vnodes)
+        )
+        self._points = [p for p, _ in ring]
+        self._names = [n for _, n in ring]
+        self._local = threading.local()
+
+    def shard_for(self, email: str) -> str:
+        i = bisect.bisect(self._points, _ring_hash(email.strip().lower()))
+        return self._names[i % len(self._names)]
+
+    def session(self, shard: str):
+        """This thread's session on ``shard``; objects it returns stay usable."""
+        sessions = self._local.__dict__.setdefault("sessions", {})
+        if shard not in sessions:
+            sessions[shard] = get_session(self.shards[shard])
+        return sessions[shard]
+
+    def close(self):
+        for sess in self._local.__dict__.pop("sessions", {}).values():
+            sess.close()
+
+    def session_for(self, email: str):
+        return self.session(self.shard_for(email))
+
+    def _session_of(self, user: User, obj=None):
+        sess = object_session(obj if obj is not None else user)
+        if sess is not None and sess.get_bind() is get_engine(self.shards[self.shard_for(user.email)]):
+            return sess
+        return self.session_for(user.email)
+
+    # --- routed ledger API -------------------------------------------------
+
+    def get_or_create_user(self, email: str, password: str) -> User:
+        return get_or_create_user(self.session_for(email), email, password)
+
+    def get_user(self, email: str) -> Optional[User]:
+        return self.session_for(email).query(User).filter_by(email=email).one_or_none()
+
+    def add_claim(self, user: User, text: str, **kwargs) -> Claim:
+        return add_claim(self._session_of(user), user, text, **kwargs)
+
+    def append_drift(self, user: User, claim: Claim, drift_value: float) -> Claim:
+        sess = self._session_of(user, claim)
+        if claim not in sess:
+            claim = sess.merge(claim)
+        return append_drift(sess, user, claim, drift_value)
+
+    def list_claims(self, user: User, limit: int | None = None, **kwargs) -> List[Claim]:
+        return list_claims(self._session_of(user), user, limit, **kwargs)
+
+
+_router: Optional[ShardRouter] = None
+
+
+def get_router() -> ShardRouter:
+    """Process-wide router built from the current shard configuration."""
+    global _router
+    if _router is None or _router.shards != get_shard_urls():
+        _router = ShardRouter()
+    return _router
+
+
+# --- rebalancing ----------------------------------------------------------
+
+
+def _rows(sess, table, where, after_id: int, limit: int):
+    return sess.execute(
+        select(table).where(where, table.c.id > after_id).order_by(table.c.id).limit(limit)
+    ).mappings().all()
+
+
+# Columns that identify an already-copied history or artifact row on the target.
+_ROW_KEYS = {
+    "drift_history": ("claim_id_fk", "t", "drift"),
+    "artifacts": ("claim_id_fk", "path_or_url", "hash"),
+}
+
+
+def _existing_keys(sess, table, user_id: int, claim_fks, cols) -> set:
+    ids = [c for c in claim_fks if c is not None]
+    cond = table.c.claim_id_fk.in_(ids)
+    if len(ids) < len(claim_fks):
+        cond = or_(cond, table.c.claim_id_fk.is_(None))
+    rows = sess.execute(select(*(table.c[c] for c in cols)).where(table.c.user_id == user_id, cond))
+    return {tuple(r) for r in rows}
+
+
+def move_user(
+    router: ShardRouter,
+    email: str,
+    source: str,
+    target: Optional[str] = None,
+    batch_size: int = MOVE_BATCH_SIZE,
+) -> Dict[str, int]:
+    """Copy one user's rows from ``source`` to ``target`` and delete the originals.
+
+    The copy commits as one transaction on the target before anything is
+    deleted from the source, so a failure leaves the source intact.  Row ids
+    are reassigned by the target; foreign keys are remapped on the way.
+    Rows the target already has (from an earlier run that failed before the
+    delete, or because the user was created there meanwhile) are matched by
+    content (a claim's text and creation time) and not copied again, so a
+    move can simply be rerun.  A different claim whose ``claim_id`` is
+    already used on the target is copied under the next free number.
+    """
+    target = target or router.shard_for(email)
+    if source == target:
+        return {"claims": 0, "drift_history": 0, "artifacts": 0}
+    src, dst = get_session(router.shards[source]), get_session(router.shards[target])
+    try:
+        return _copy_user(src, dst, email, batch_size)
+    finally:
+        src.close()
+        dst.close()
+
+
+def _copy_user(src, dst, email: str, batch_size: int) -> Dict[str, int]:
+    old_user = src.query(User).filter_by(email=email).one()
+    new_user = dst.query(User).filter_by(email=email).one_or_none()
+    fresh = new_user is None  # nothing of this user on the target to reconcile with
+    if fresh:
+        new_user = User(email=email, password_hash=old_user.password_hash, created_at=old_user.created_at)
+        dst.add(new_user)
+        dst.flush()
+
+    claims_t, history_t, artifacts_t = Claim.__table__, DriftHistory.__table__, Artifact.__table__
+    claim_ids: Dict[int, int] = {}
+    counts = {"claims": 0, "drift_history": 0, "artifacts": 0}
+
+    if not fresh:
+        taken = set(dst.execute(select(claims_t.c.claim_id).where(claims_t.c.user_id == new_user.id)).scalars())
+        n = len(taken) + src.query(Claim).filter(Claim.user_id == old_user.id).count()
+
+        def renumber() -> str:
+            nonlocal n
+            while True:
+                n += 1
+                cid = f"CLM-{n:04d}"
+                if cid not in taken:
+                    return cid
+
+    last = 0
+    while True:
+        rows = _rows(src, claims_t, claims_t.c.user_id == old_user.id, last, batch_size)
+        if not rows:
+            break
+        last = rows[-1]["id"]
+        if not fresh:
+            texts = list({r["text"] for r in rows})
+            found = {
+                (text, created): cid
+                for cid, text, created in dst.execute(
+                    select(claims_t.c.id, claims_t.c.text, claims_t.c.created_at).where(
+                        claims_t.c.user_id == new_user.id, claims_t.c.text.in_(texts)
+                    )
+                )
+            }
+            for r in rows:
+                hit = found.get((r["text"], r["created_at"]))
+                if hit is not None:
+                    claim_ids[r["id"]] = hit
+            rows = [r for r in rows if r["id"] not in claim_ids]
+            if not rows:
+                continue
+        values = [{**{k: v for k, v in r.items() if k != "id"}, "user_id": new_user.id} for r in rows]
+        if not fresh:
+            for v in values:
+                if v["claim_id"] in taken:  # a different claim already uses this number here
+                    v["claim_id"] = renumber()
+                taken.add(v["claim_id"])
+        new_ids = dst.execute(
+            insert(claims_t).returning(claims_t.c.id, sort_by_parameter_order=True), values
+        ).scalars().all()
+        claim_ids.update(zip((r["id"] for r in rows), new_ids))
+        index_claim_texts(dst, [{"id": claim_ids[r["id"]], "text": r["text"]} for r in rows])
+        counts["claims"] += len(rows)
+
+    for name, table in (("drift_history", history_t), ("artifacts", artifacts_t)):
+        last = 0
+        while True:
+            rows = _rows(src, table, table.c.user_id == old_user.id, last, batch_size)
+            if not rows:
+                break
+            last = rows[-1]["id"]
+            values = []
+            for r in rows:
+                v = {k: val for k, val in r.items() if k != "id"}
+                v["user_id"] = new_user.id
+                v["claim_id_fk"] = claim_ids.get(r["claim_id_fk"])
+                values.append(v)
+            if not fresh:
+                cols = _ROW_KEYS[name]
+                have = _existing_keys(dst, table, new_user.id, {v["claim_id_fk"] for v in values}, cols)
+                values = [v for v in values if tuple(v[c] for c in cols) not in have]
+                if not values:
+                    continue
+            dst.execute(insert(table), values)
+            counts[name] += len(values)
+    rebuild_claim_summary(dst, new_user.id)
+    dst.commit()
+
+    unindex_claim_texts(
+        src,
+        [
+            dict(r)
+            for r in src.execute(
+                select(claims_t.c.id, claims_t.c.text).where(claims_t.c.user_id == old_user.id)
+            ).mappings()
+        ],
+    )
+    for table in (VolatilityCount.__table__, ClaimSummary.__table__, history_t, artifacts_t, claims_t):
+        src.execute(delete(table).where(table.c.user_id == old_user.id))
+    src.execute(delete(User.__table__).where(User.__table__.c.id == old_user.id))
+    src.commit()
+    return counts
+
+
+def misplaced_users(router: ShardRouter):
+    """Yield ``(email, current_shard, home_shard)`` for users on the wrong shard."""
+    for shard in router.shards:
+        for (email,) in router.session(shard).query(User.email).order_by(User.id):
+            home = router.shard_for(email)
+            if home != shard:
+                yield email, shard, home
+
+
+def rebalance(router: Optional[ShardRouter] = None, dry_run: bool = False) -> List[dict]:
+    """Move every misplaced user to its home shard; return what was (or would be) moved."""
+    router = router or get_router()
+    moves = []
+    for email, shard, home in list(misplaced_users(router)):
+        counts = {} if dry_run else move_user(router, email, shard, home)
+        moves.append({"email": email, "from": shard, "to": home, **counts})
+    return moves
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Inspect and rebalance ledger shards.")
+    p.add_argument("--email", help="show (and with --move, relocate) only this user")
+    p.add_argument("--move", action="store_true", help="move misplaced users to their home shard")
+    args = p.parse_args(argv)
+
+    router = get_router()
+    if args.email:
+        home = router.shard_for(args.email)
+        found = [s for s in router.shards if router.session(s).query(User).filter_by(email=args.email).count()]
+        print(f"{args.email}: home {home}, stored on {', '.join(found) or 'nowhere'}")
+        if args.move:
+            for shard in found:
+                if shard != home:
+                    print(move_user(router, args.email, shard, home))
+        return
+    for m in rebalance(router, dry_run=not args.move):
+        print(m)
+
+
+if __name__ == "__main__":
+    main()
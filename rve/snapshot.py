@@ -0,0 +1,411 @@
+"""Portable, streaming snapshots of the ledger for backup and restore.
+
+A snapshot is a directory with one folder of gzip-compressed NDJSON chunks
+per table and a ``manifest.json`` describing row counts, chunk files and the
+highest id exported per table (the watermark).  Passing an earlier manifest
+as ``since`` produces an incremental snapshot of only the rows added after
+it.  Incrementals do not see rows changed in place since the base snapshot
+(an artifact's recomputed hash, a claim rescored without new drift
+history): only new rows are captured, and a new drift row restored into a
+claim from an earlier snapshot updates its score.  Take a full snapshot
+after a bulk rescore or re-hash.
+
+Rows carry natural keys (user email and the per-user ``claim_id``) next to
+their numeric foreign keys, so restore can remap ids batch by batch against
+whatever is already in the target database without holding an id map for
+the whole ledger in memory.
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import os
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import DateTime, insert, or_, select, tuple_, update
+from sqlalchemy.exc import OperationalError
+
+from .ledger import (
+    Artifact,
+    Claim,
+    DriftHistory,
+    User,
+    bump_claim_summary,
+    drift_bucket,
+    get_engine,
+    get_session,
+    index_claim_texts,
+)
+
+MANIFEST = "manifest.json"
+FORMAT_VERSION = 1
+DEFAULT_CHUNK_ROWS = 50_000
+DEFAULT_BATCH_SIZE = 5_000
+COMPRESS_LEVEL = 3
+TABLES = ("users", "claims", "drift_history", "artifacts")
+
+
+def _table_query(name: str):
+    users = User.__table__
+    claims = Claim.__table__
+    if name == "users":
+        return users, select(users)
+    if name == "claims":
+        return claims, select(claims, users.c.email.label("user_email")).join(
+            users, users.c.id == claims.c.user_id
+        )
+    table = {"drift_history": DriftHistory, "artifacts": Artifact}[name].__table__
+    stmt = (
+        select(
+            table,
+            users.c.email.label("user_email"),
+            claims.c.claim_id.label("claim_ref"),
+            claims.c.created_at.label("claim_created"),
+        )
+        .join(users, users.c.id == table.c.user_id)
+        .outerjoin(claims, claims.c.id == table.c.claim_id_fk)
+    )
+    return table, stmt
+
+
+def _encode(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def read_manifest(path: str) -> Dict[str, Any]:
+    if os.path.isdir(path):
+        path = os.path.join(path, MANIFEST)
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _begin_snapshot(conn):
+    """Start one read transaction on ``conn`` so every table is read at the same point in time."""
+    if conn.dialect.name == "sqlite":
+        # In WAL mode a reader keeps its view of the database while writers
+        # go on committing; a deferred BEGIN takes no write lock.
+        if conn.exec_driver_sql("PRAGMA journal_mode").scalar() not in ("wal", "memory"):
+            try:
+                conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+            except OperationalError:
+                pass  # another connection is busy; still consistent, writers just wait
+        conn.exec_driver_sql("BEGIN")
+        conn.exec_driver_sql("SELECT 1 FROM sqlite_master LIMIT 1")  # pin the read snapshot now
+        return conn
+    conn = conn.execution_options(isolation_level="REPEATABLE READ")
+    conn.begin()
+    return conn
+
+
+def create_snapshot(
+    out_dir: str,
+    since: Optional[str] = None,
+    *,
+    engine=None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    compresslevel: int = COMPRESS_LEVEL,
+) -> Dict[str, Any]:
+    """Write a snapshot of the ledger to ``out_dir`` and return its manifest.
+
+    ``since`` is a previous snapshot directory or manifest path; only rows
+    with ids above its watermark are included.  All tables are read in one
+    transaction, so rows written meanwhile appear in none of them rather
+    than in some.
+    """
+    base = read_manifest(since)["watermark"] if since else {}
+    engine = engine or get_engine()
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {
+        "version": FORMAT_VERSION,
+        "created_at": datetime.utcnow().isoformat(),
+        "base": base or None,
+        "watermark": {},
+        "tables": {},
+    }
+    with engine.connect() as conn:
+        conn = _begin_snapshot(conn)
+        for name in TABLES:
+            table, stmt = _table_query(name)
+            after = base.get(name, 0)
+            stmt = stmt.where(table.c.id > after).order_by(table.c.id)
+            os.makedirs(os.path.join(out_dir, name), exist_ok=True)
+            chunks, rows_out, last_id = [], 0, after
+            result = conn.execution_options(stream_results=True, yield_per=chunk_rows).execute(stmt)
+            for part in result.mappings().partitions(chunk_rows):
+                rel = os.path.join(name, f"chunk-{len(chunks) + 1:06d}.ndjson.gz")
+                with gzip.open(os.path.join(out_dir, rel), "wt", encoding="utf-8", compresslevel=compresslevel) as f:
+                    for row in part:
+                        f.write(json.dumps({k: _encode(v) for k, v in row.items()}))
+                        f.write("\n")
+                chunks.append(rel)
+                rows_out += len(part)
+                last_id = part[-1]["id"]
+            manifest["tables"][name] = {"rows": rows_out, "chunks": chunks}
+            manifest["watermark"][name] = last_id
+    # The manifest is what makes a snapshot usable, so it only appears once complete.
+    path = os.path.join(out_dir, MANIFEST)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+    return manifest
+
+
+def _iter_batches(snapshot_dir: str, chunks: List[str], batch_size: int) -> Iterable[List[dict]]:
+    batch = []
+    for rel in chunks:
+        with gzip.open(os.path.join(snapshot_dir, rel), "rt", encoding="utf-8") as f:
+            for line in f:
+                batch.append(json.loads(line))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+    if batch:
+        yield batch
+
+
+def _decoder(table):
+    dt_cols = {c.name for c in table.columns if isinstance(c.type, DateTime)}
+    cols = {c.name for c in table.columns} - {"id"}
+
+    def decode(row: dict) -> dict:
+        out = {k: row.get(k) for k in cols}
+        for k in dt_cols:
+            if out.get(k):
+                out[k] = datetime.fromisoformat(out[k])
+        return out
+
+    return decode
+
+
+def _group_by_user(values: List[dict]) -> Dict[int, List[dict]]:
+    groups: Dict[int, List[dict]] = {}
+    for v in values:
+        groups.setdefault(v["user_id"], []).append(v)
+    return groups
+
+
+def _user_ids(sess, emails: Iterable[str], cache: Dict[str, int]) -> Dict[str, int]:
+    missing = {e for e in emails if e not in cache}
+    if missing:
+        for uid, email in sess.query(User.id, User.email).filter(User.email.in_(missing)):
+            cache[email] = uid
+    return cache
+
+
+# Columns that identify an already-restored history or artifact row.
+_ROW_KEYS = {
+    "drift_history": ("user_id", "claim_id_fk", "t", "drift"),
+    "artifacts": ("user_id", "claim_id_fk", "path_or_url", "hash"),
+}
+
+
+def _row_key(values: dict, cols) -> tuple:
+    return tuple(values[c] for c in cols)
+
+
+def _existing_rows(sess, table, values: List[dict], cols) -> set:
+    fks = {v["claim_id_fk"] for v in values}
+    ids = [f for f in fks if f is not None]
+    cond = table.c.claim_id_fk.in_(ids)
+    if len(ids) < len(fks):
+        cond = or_(cond, table.c.claim_id_fk.is_(None))
+    stmt = select(*(table.c[c] for c in cols)).where(table.c.user_id.in_({v["user_id"] for v in values}), cond)
+    return {tuple(r) for r in sess.execute(stmt)}
+
+
+def _free_claim_id(sess, user_id: int, taken: set) -> str:
+    n = sess.query(Claim).filter(Claim.user_id == user_id).count()
+    while True:
+        n += 1
+        cid = f"CLM-{n:04d}"
+        if (user_id, cid) not in taken and not sess.query(
+            sess.query(Claim).filter_by(user_id=user_id, claim_id=cid).exists()
+        ).scalar():
+            return cid
+
+
+def _resolve_claims(sess, batch: List[dict], uids: Dict[str, int]) -> Dict[tuple, int]:
+    """Map ``(user id, claim_ref, claim_created)`` of history/artifact rows to target claim ids.
+
+    A claim is found by its number when that claim has the same creation
+    time (or the snapshot predates ``claim_created``), otherwise by user and
+    creation time, which covers claims renumbered on restore.
+    """
+    keys = {
+        (uids[r["user_email"]], r["claim_ref"], r.get("claim_created"))
+        for r in batch
+        if r.get("claim_ref")
+    }
+    if not keys:
+        return {}
+    by_ref = {
+        (uid, ref): (cid, created)
+        for cid, uid, ref, created in sess.query(Claim.id, Claim.user_id, Claim.claim_id, Claim.created_at).filter(
+            tuple_(Claim.user_id, Claim.claim_id).in_([(uid, ref) for uid, ref, _ in keys])
+        )
+    }
+    out, unresolved = {}, {}
+    for uid, ref, created in keys:
+        hit = by_ref.get((uid, ref))
+        when = datetime.fromisoformat(created) if created else None
+        if hit is not None and (when is None or hit[1] == when):
+            out[(uid, ref, created)] = hit[0]
+        elif when is not None:
+            unresolved[(uid, when)] = (uid, ref, created)
+    if unresolved:
+        for cid, uid, created in sess.query(Claim.id, Claim.user_id, Claim.created_at).filter(
+            tuple_(Claim.user_id, Claim.created_at).in_(list(unresolved))
+        ):
+            key = unresolved.get((uid, created))
+            if key is not None:
+                out[key] = cid
+    return out
+
+
+def restore_snapshot(
+    snapshot_dir: str, *, sess=None, batch_size: int = DEFAULT_BATCH_SIZE
+) -> Dict[str, int]:
+    """Load one snapshot into the ledger behind ``sess`` (default: configured ledger).
+
+    Restore a full snapshot first, then its incrementals in order.  Each
+    batch is inserted with bulk INSERTs and committed on its own.  Users that
+    already exist (by email) are reused, and rows already in the target (a
+    claim with the same user, text and creation time; history and artifact
+    rows with the same content) are skipped, so an interrupted restore can be
+    rerun.  A restored claim whose ``claim_id`` is taken by another claim of
+    that user gets the next free number.
+    """
+    sess = sess or get_session()
+    manifest = read_manifest(snapshot_dir)
+    base_claims = (manifest.get("base") or {}).get("claims", 0)
+    counts = {name: 0 for name in TABLES}
+    user_cache: Dict[str, int] = {}
+
+    users_t = User.__table__
+    decode_user = _decoder(users_t)
+    for batch in _iter_batches(snapshot_dir, manifest["tables"]["users"]["chunks"], batch_size):
+        _user_ids(sess, (r["email"] for r in batch), user_cache)
+        fresh = [decode_user(r) for r in batch if r["email"] not in user_cache]
+        if fresh:
+            sess.execute(insert(users_t), fresh)
+            _user_ids(sess, (r["email"] for r in fresh), user_cache)
+        sess.commit()
+        counts["users"] += len(fresh)
+
+    claims_t = Claim.__table__
+    decode_claim = _decoder(claims_t)
+    for batch in _iter_batches(snapshot_dir, manifest["tables"]["claims"]["chunks"], batch_size):
+        uids = _user_ids(sess, {r["user_email"] for r in batch}, user_cache)
+        values = [{**decode_claim(r), "user_id": uids[r["user_email"]]} for r in batch]
+        # Claims restored by an earlier (interrupted) run are skipped.
+        restored = set(
+            sess.query(Claim.user_id, Claim.text, Claim.created_at).filter(
+                Claim.user_id.in_({v["user_id"] for v in values}), Claim.text.in_({v["text"] for v in values})
+            )
+        )
+        values = [v for v in values if (v["user_id"], v["text"], v["created_at"]) not in restored]
+        if not values:
+            continue
+        # A different claim may already hold the number; the restored one gets the next free one.
+        taken = set(
+            sess.query(Claim.user_id, Claim.claim_id).filter(
+                tuple_(Claim.user_id, Claim.claim_id).in_([(v["user_id"], v["claim_id"]) for v in values])
+            )
+        )
+        for v in values:
+            if (v["user_id"], v["claim_id"]) in taken:
+                v["claim_id"] = _free_claim_id(sess, v["user_id"], taken)
+            taken.add((v["user_id"], v["claim_id"]))
+        new_ids = sess.execute(
+            insert(claims_t).returning(claims_t.c.id, sort_by_parameter_order=True), values
+        ).scalars().all()
+        index_claim_texts(sess, [{"id": i, "text": v["text"]} for i, v in zip(new_ids, values)])
+        for uid, group in _group_by_user(values).items():
+            bump_claim_summary(
+                sess,
+                uid,
+                n=len(group),
+                drift=sum(v["drift_score"] or 0.0 for v in group),
+                confidence=sum(v["confidence_index"] or 0.0 for v in group),
+                buckets=Counter(drift_bucket(v["drift_score"]) for v in group),
+                volatility=Counter(v["volatility"] for v in group),
+            )
+        sess.commit()
+        counts["claims"] += len(values)
+
+    for name, model in (("drift_history", DriftHistory), ("artifacts", Artifact)):
+        table = model.__table__
+        decode = _decoder(table)
+        row_key = _ROW_KEYS[name]
+        for batch in _iter_batches(snapshot_dir, manifest["tables"][name]["chunks"], batch_size):
+            uids = _user_ids(sess, {r["user_email"] for r in batch}, user_cache)
+            claim_ids = _resolve_claims(sess, batch, uids)
+            pairs = []
+            for r in batch:
+                uid = uids[r["user_email"]]
+                v = {**decode(r), "user_id": uid}
+                v["claim_id_fk"] = claim_ids.get((uid, r.get("claim_ref"), r.get("claim_created")))
+                pairs.append((r, v))
+            have = _existing_rows(sess, table, [v for _, v in pairs], row_key)
+            pairs = [(r, v) for r, v in pairs if _row_key(v, row_key) not in have]
+            if not pairs:
+                continue
+            values = [v for _, v in pairs]
+            sess.execute(insert(table), values)
+            if name == "drift_history":
+                # Drift appended to claims from an earlier snapshot moves their score.
+                latest = {}
+                for r, v in pairs:
+                    if r.get("claim_id_fk") and r["claim_id_fk"] <= base_claims and v["claim_id_fk"]:
+                        latest[v["claim_id_fk"]] = v["drift"]
+                if latest:
+                    before = dict(
+                        sess.query(Claim.id, Claim.drift_score).filter(Claim.id.in_(list(latest)))
+                    )
+                    sess.execute(
+                        update(Claim), [{"id": cid, "drift_score": d} for cid, d in latest.items()]
+                    )
+                    moved = [v for v in values if v["claim_id_fk"] in latest]
+                    for uid in {v["user_id"] for v in moved}:
+                        ids = {v["claim_id_fk"] for v in moved if v["user_id"] == uid}
+                        buckets = Counter()
+                        for cid in ids:
+                            buckets[drift_bucket(before[cid])] -= 1
+                            buckets[drift_bucket(latest[cid])] += 1
+                        bump_claim_summary(
+                            sess,
+                            uid,
+                            drift=sum(latest[cid] - (before[cid] or 0.0) for cid in ids),
+                            buckets=buckets,
+                        )
+            sess.commit()
+            counts[name] += len(values)
+    return counts
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Snapshot or restore the rve ledger.")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    c = sub.add_parser("create", help="write a snapshot directory")
+    c.add_argument("out_dir")
+    c.add_argument("--since", help="previous snapshot dir/manifest for an incremental snapshot")
+    c.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    r = sub.add_parser("restore", help="restore snapshots in the given order")
+    r.add_argument("snapshot_dirs", nargs="+")
+    r.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = p.parse_args(argv)
+
+    if args.cmd == "create":
+        m = create_snapshot(args.out_dir, args.since, chunk_rows=args.chunk_rows)
+        for name, t in m["tables"].items():
+            print(f"{name}: {t['rows']} rows in {len(t['chunks'])} chunks")
+    else:
+        for d in args.snapshot_dirs:
+            print(d, restore_snapshot(d, batch_size=args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Bearer tokens for the HTTP API with an in-process verification cache.
+
+A token is issued once the user's password checks out and is stored only as
+its SHA-256 digest.  Verifying a token is a digest plus a dictionary lookup
+while the cache entry is fresh; the database is consulted at most once per
+``RVE_TOKEN_CACHE_TTL`` seconds per token.  Revoking a token drops it from
+this process's cache immediately; other processes notice within one TTL.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import NamedTuple, Optional, Tuple
+
+from .ledger import ApiToken, User
+
+CACHE_TTL_SECONDS = float(os.getenv("RVE_TOKEN_CACHE_TTL", "300"))
+CACHE_MAX_ENTRIES = 10_000
+
+
+class Principal(NamedTuple):
+    """The authenticated user as seen by API handlers (enough for ledger calls)."""
+
+    id: int
+    email: str
+
+
+def token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class TokenCache:
+    """Thread-safe TTL + LRU map from token digest to :class:`Principal`."""
+
+    def __init__(self, ttl: float = CACHE_TTL_SECONDS, max_entries: int = CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Principal, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, digest: str) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._entries[digest]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, digest: str, principal: Principal):
+        with self._lock:
+            self._entries[digest] = (principal, time.monotonic() + self.ttl)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, digest: Optional[str] = None, user_id: Optional[int] = None):
+        with self._lock:
+            if digest is not None:
+                self._entries.pop(digest, None)
+            if user_id is not None:
+                for d in [d for d, (p, _) in self._entries.items() if p.id == user_id]:
+                    del self._entries[d]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+cache = TokenCache()
+
+
+def issue_token(sess, email: str, password: str) -> Optional[str]:
+    """Return a new bearer token for valid credentials, else ``None``."""
+    u = sess.query(User).filter_by(email=email).one_or_none()
+    if not u or not u.check_password(password):
+        return None
+    token = secrets.token_urlsafe(32)
+    sess.add(ApiToken(user_id=u.id, token_hash=token_digest(token)))
+    sess.commit()
+    return token
+
+
+def verify_token(sess, token: str) -> Optional[Principal]:
+    """Resolve ``token`` to its :class:`Principal`, or ``None`` if unknown or revoked.
+
+    ``sess`` is only used on a cache miss.
+    """
+    digest = token_digest(token)
+    principal = cache.get(digest)
+    if principal is not None:
+        return principal
+    row = (
+        sess.query(User.id, User.email)
+        .join(ApiToken, ApiToken.user_id == User.id)
+        .filter(ApiToken.token_hash == digest, ApiToken.revoked_at.is_(None))
+        .one_or_none()
+    )
+    if row is None:
+        return None
+    principal = Principal(row.id, row.email)
+    cache.put(digest, principal)
+    return principal
+
+
+def revoke_token(sess, token: str) -> bool:
+    digest = token_digest(token)
+    n = (
+        sess.query(ApiToken)
+        .filter(ApiToken.token_hash == digest, ApiToken.revoked_at.is_(None))
+        .update({ApiToken.revoked_at: datetime.utcnow()})
+    )
+    sess.commit()
+    cache.invalidate(digest)
+    return bool(n)
+
+
+def revoke_user_tokens(sess, user_id: int) -> int:
+    n = (
+        sess.query(ApiToken)
+        .filter(ApiToken.user_id == user_id, ApiToken.revoked_at.is_(None))
+        .update({ApiToken.revoked_at: datetime.utcnow()})
+    )
+    sess.commit()
+    cache.invalidate(user_id=user_id)
+    return n
@@ -0,0 +1,166 @@
+"""Write-behind buffering for ledger inserts.
+
+Interactive code paths (a Streamlit rerun, a streaming response) hand rows to
+a :class:`WriteBehind` buffer and return immediately; a background thread
+collects them into batches and passes each batch to a flush function, which
+typically does one bulk INSERT and one commit.  A batch is written when it
+reaches ``max_batch`` rows or ``interval`` seconds after its first row,
+whichever comes first.  Pending rows are flushed at interpreter exit.
+
+A batch that still fails after its retries is written again one row at a
+time, so a single bad row does not take the rest of the batch down with it.
+Rows that fail on their own are handed to ``on_drop`` and kept (up to
+``MAX_FAILED_ROWS``) in :attr:`WriteBehind.failed`.
+"""
+from __future__ import annotations
+
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+log = logging.getLogger("rve.writebehind")
+
+FLUSH_INTERVAL_SECONDS = 1.0
+MAX_BATCH = 500
+MAX_QUEUE = 50_000
+MAX_FLUSH_ATTEMPTS = 3
+MAX_FAILED_ROWS = 1000
+
+
+class WriteBehind:
+    def __init__(
+        self,
+        flush_fn: Callable[[List[Any]], None],
+        *,
+        name: str = "writebehind",
+        interval: float = FLUSH_INTERVAL_SECONDS,
+        max_batch: int = MAX_BATCH,
+        max_queue: int = MAX_QUEUE,
+        on_drop: Optional[Callable[[Any, BaseException], None]] = None,
+    ):
+        self.flush_fn = flush_fn
+        self.on_drop = on_drop
+        self.failed: Deque[Tuple[Any, BaseException]] = deque(maxlen=MAX_FAILED_ROWS)
+        self.name = name
+        self.interval = interval
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[Any]" = queue.Queue(max_queue)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._outstanding = 0  # rows accepted but not yet written or dropped
+        self._closed = False
+        self.stats: Dict[str, int] = {"queued": 0, "written": 0, "batches": 0, "dropped": 0, "failures": 0}
+        self._thread = threading.Thread(target=self._run, name=f"rve-{name}", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def put(self, row: Any) -> bool:
+        """Queue ``row``; returns ``False`` (and counts a drop) when the buffer is full."""
+        try:
+            with self._lock:
+                self._queue.put_nowait(row)
+                self._outstanding += 1
+                self.stats["queued"] += 1
+        except queue.Full:
+            with self._lock:
+                self.stats["dropped"] += 1
+            log.warning("%s buffer full; dropping row", self.name)
+            return False
+        return True
+
+    def put_many(self, rows: List[Any]) -> int:
+        return sum(self.put(r) for r in rows)
+
+    def pending(self) -> int:
+        with self._lock:
+            return self._outstanding
+
+    def _take_batch(self) -> List[Any]:
+        try:
+            first = self._queue.get(timeout=self.interval)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.interval
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if self._closed and self._queue.empty():
+                    return
+            batch = self._take_batch()
+            if not batch:
+                continue
+            self._write(batch)
+            with self._lock:
+                self._outstanding -= len(batch)
+                self._idle.notify_all()
+
+    def _write(self, batch: List[Any]):
+        for attempt in range(1, MAX_FLUSH_ATTEMPTS + 1):
+            try:
+                self.flush_fn(batch)
+            except Exception:
+                with self._lock:
+                    self.stats["failures"] += 1
+                if attempt == MAX_FLUSH_ATTEMPTS:
+                    log.exception("%s: batch of %d rows failed; writing rows one by one", self.name, len(batch))
+                    self._write_rows(batch)
+                    return
+                time.sleep(0.1 * 2 ** attempt)
+            else:
+                with self._lock:
+                    self.stats["written"] += len(batch)
+                    self.stats["batches"] += 1
+                return
+
+    def _write_rows(self, rows: List[Any]):
+        for row in rows:
+            try:
+                self.flush_fn([row])
+            except Exception as exc:
+                log.warning("%s: dropping row that failed to write: %s", self.name, exc)
+                with self._lock:
+                    self.stats["failures"] += 1
+                    self.stats["dropped"] += 1
+                    self.failed.append((row, exc))
+                if self.on_drop is not None:
+                    try:
+                        self.on_drop(row, exc)
+                    except Exception:
+                        log.exception("%s: on_drop callback failed", self.name)
+            else:
+                with self._lock:
+                    self.stats["written"] += 1
+                    self.stats["batches"] += 1
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until everything queued so far is written (or ``timeout`` passes)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._idle:
+            while self._outstanding:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(min(self.interval, remaining) if remaining is not None else self.interval)
+        return True
+
+    def close(self, timeout: float = 10.0):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._thread.join(timeout)
@@ -3,18 +3,16 @@ import json
 import datetime
 import hashlib
 import streamlit as st
-import nltk
-from nltk.sentiment import SentimentIntensityAnalyzer
 from ref_engine import run_recursive_engine  # moved to avoid circular imports
-
-nltk.download('vader_lexicon')
-sia = SentimentIntensityAnalyzer()
+from rve.sentiment import pulse_score, pulse_scores  # lexicon loads on first use
+from rve.memory_log import MemoryLog
 
 IS_CI = os.environ.get("CI") == "true"
 
 SHALLOW_SIGNALS = ["it depends", "i'm not sure", "could be", "maybe", "just", "kind of"]
 DEPTH_KEYWORDS = ["recursive", "across time", "paradox", "identity", "coherence"]
-MEMORY_FILE = "sareth_memory.json"
+MEMORY_FILE = "sareth_memory.jsonl"
+LEGACY_MEMORY_FILE = "sareth_memory.json"
 MEMORY_LIMIT = 1000
 
 def generate_glyph_from_text(text: str) -> str:
@@ -31,7 +29,7 @@ class Sareth:
     def __init__(self, name: str = "Sareth", version: str | None = None):
         self.name = name
         self.version = version
-        self.memory = []
+        self.memory = MemoryLog(limit=MEMORY_LIMIT)
 
     def observe(self, input_text: str) -> str:
         timestamp = datetime.datetime.now().isoformat()
@@ -48,9 +46,7 @@ class Sareth:
             "recursion_trace": recursion_trace,
             "glyph": glyph
         }
-        self.memory.append(record)
-        if len(self.memory) > MEMORY_LIMIT:
-            self.memory.pop(0)
+        self.memory.append(record)  # the window drops the oldest record past MEMORY_LIMIT
 
         return "\n".join(recursion_trace)
 
@@ -86,10 +82,10 @@ class Sareth:
         return reflections
 
     def pulse_score(self, text: str) -> float:
-        sentiment = sia.polarity_scores(text)
-        composite = sentiment['compound']
-        normalized = (composite + 1) / 2  # scale -1 to 1 → 0 to 1
-        return normalized
+        return pulse_score(text)  # compound -1..1 scaled to 0..1, cached by text
+
+    def pulse_scores(self, texts: list) -> list:
+        return pulse_scores(texts)
 
     def meta_hint(self, input_text: str) -> str:
         if "truth" in input_text.lower():
@@ -100,19 +96,18 @@ class Sareth:
             return "reflect across contradiction and symbolic depth"
 
     def export_memory(self) -> str:
-        return json.dumps(self.memory, indent=2)
+        return json.dumps(self.memory.to_list(), indent=2)
 
     def export_memory_to_file(self, filename=MEMORY_FILE):
-        with open(filename, "w") as f:
-            json.dump(self.memory, f, indent=2)
+        # Appends only records not yet saved to the JSONL log.
+        self.memory.flush(filename)
 
     def load_memory_from_file(self, filename=MEMORY_FILE):
-        if os.path.exists(filename):
-            try:
-                with open(filename, "r") as f:
-                    self.memory = json.load(f)
-            except (json.JSONDecodeError, IOError) as e:
-                print(f"⚠️ Failed to load memory: {e}")
+        legacy = LEGACY_MEMORY_FILE if filename == MEMORY_FILE else None
+        try:
+            self.memory.load(filename, legacy=legacy)
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"⚠️ Failed to load memory: {e}")
 
 def main(prompt: str) -> str:
     if prompt.strip().lower() == "exit":
@@ -128,8 +123,11 @@ st.title("🌐 Recursive Emergence Framework")
 with st.sidebar:
     st.header("🧰 Tools")
     st.subheader("💾 Export Memory")
-    agent = Sareth()
-    agent.load_memory_from_file()
+    if "sareth_agent" not in st.session_state:
+        # Kept across reruns so the memory log batches its appends instead of reloading each time.
+        st.session_state.sareth_agent = Sareth()
+        st.session_state.sareth_agent.load_memory_from_file()
+    agent = st.session_state.sareth_agent
     if st.button("Download JSON"):
         st.download_button("Download Memory Snapshot", agent.export_memory(), file_name="sareth_memory.json")
     st.markdown("---")
@@ -151,6 +149,6 @@ if chat_input:
     with st.chat_message("Sareth"):
         st.markdown(response)
     st.subheader("📚 Memory Snapshot")
-    st.json(agent.memory[-5:] if len(agent.memory) > 5 else agent.memory)
+    st.json(list(agent.memory)[-5:])
 
 
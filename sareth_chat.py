@@ -2,12 +2,18 @@
 # REF-aware generation: deep, human, non-transactional.
 from __future__ import annotations
 import os
-from typing import List, Tuple
-from openai import OpenAI
+from typing import Any, Dict, List, Tuple
+
+import openai
+
+from rve.admission import controller as admission, session_key
+from rve.cache import cache_key, response_cache
+from rve.context import message_tokens
+from rve.llm import LLMBusy, get_client
+from rve.router import AUTO, Route, choose_model
 
 # The OpenAI key should be provided via Streamlit Secrets or env.
 # (streamlit_app.py already loads it; we don't re-load .env here)
-client = OpenAI()
 
 # --- REF system stance -------------------------------------------------------
 
@@ -99,26 +105,104 @@ def _build_messages(user_input: str, history: List[Tuple[str, str]]) -> list:
 
 # --- Public API --------------------------------------------------------------
 
-def generate_reply(user_input: str, history: List[Tuple[str, str]] | None = None) -> str:
-    """Return a REF-structured, resonant reply."""
-    history = history or []
-    messages = _build_messages(user_input, history)
+NO_USAGE = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "cached": False}
+
+# With OPENAI_MODEL=auto each reply is routed; a model that times out falls
+# back to the next faster one.  Routed attempts are not retried, and each
+# gets twice the route's first-token SLO plus time to generate max_tokens at
+# a minimum rate, so the fallback starts long before REPLY_TIMEOUT_S.
+REPLY_TIMEOUT_S = float(os.getenv("SARETH_REPLY_TIMEOUT", "30"))
+ROUTED_MIN_TOKENS_PER_S = float(os.getenv("SARETH_ROUTED_MIN_TOKENS_PER_S", "40"))
+
+
+def _attempt_timeout(route: Route, max_tokens: int) -> float:
+    return min(REPLY_TIMEOUT_S, route.slo_ms / 1000 * 2 + max_tokens / ROUTED_MIN_TOKENS_PER_S)
+
+
+def _routed_chat(messages: list, params: Dict[str, Any], route: Route):
+    models = [route.model] + route.fallbacks
+    timeout = _attempt_timeout(route, params["max_tokens"])
+    for i, model in enumerate(models):
+        try:
+            resp = get_client().chat(messages, **{**params, "model": model}, timeout=timeout, max_retries=0)
+        except (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError,
+                openai.InternalServerError, LLMBusy) as exc:
+            route.events.append(f"{model} failed: {type(exc).__name__}")
+            if i == len(models) - 1:
+                raise
+        else:
+            route.served_by = model
+            return resp
+
 
-    resp = client.chat.completions.create(
-        model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
-        messages=messages,
+def _reply_params(model: str | None = None) -> Dict[str, Any]:
+    return dict(
+        model=model or os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
         temperature=float(os.getenv("OPENAI_TEMPERATURE", "0.7")),
         top_p=1.0,
         max_tokens=600,
         presence_penalty=0.0,
         frequency_penalty=0.2,
     )
-    text = resp.choices[0].message.content.strip()
 
+
+def _polish(text: str) -> str:
     # Tiny polish: ensure we end with exactly one “Question:” block.
     # If model added extras, keep the last one.
     if text.count("Question:") > 1:
         parts = text.split("Question:")
         text = "Question:".join(parts[:-1])  # drop last?
         text = parts[0] + "Question:" + parts[-1]  # keep first blocks, last question
-    return text
\ No newline at end of file
+    return text
+
+
+def generate_reply_with_usage(
+    user_input: str, history: List[Tuple[str, str]] | None = None, user_id: Any = None
+) -> Tuple[str, Dict[str, Any]]:
+    """Like :func:`generate_reply`, also returning the API token usage.
+
+    ``user_id`` is the caller for admission control (see :mod:`rve.admission`);
+    without one, a Streamlit caller is limited per browser session and other
+    callers share the anonymous key.  Cache hits are served without a slot.
+
+    Usage has ``prompt_tokens``, ``completion_tokens``, ``total_tokens``,
+    ``cached`` (replies served from the response cache cost no tokens) and,
+    for fresh replies, the ``model`` used plus its ``route`` when routed.
+    """
+    history = history or []
+    messages = _build_messages(user_input, history)
+    params = _reply_params()
+
+    # Identical requests (e.g. a bare "hi" opener) are answered from cache.
+    key = cache_key(messages, params) if response_cache.accepts(params["temperature"]) else None
+    if key is not None:
+        cached = response_cache.get(key)
+        if cached is not None:
+            return cached, dict(NO_USAGE, cached=True)
+
+    route = None
+    with admission.slot(user_id if user_id is not None else session_key()):
+        if params["model"] == AUTO:
+            route = choose_model(sum(message_tokens(m) for m in messages))
+            resp = _routed_chat(messages, params, route)
+        else:
+            resp = get_client().chat(messages, **params)
+    text = resp.choices[0].message.content.strip()
+    usage = dict(NO_USAGE, model=route.served_by if route else params["model"])
+    if route is not None:
+        usage["route"] = route.as_dict()
+    if getattr(resp, "usage", None) is not None:
+        for k in ("prompt_tokens", "completion_tokens", "total_tokens"):
+            usage[k] = getattr(resp.usage, k, 0) or 0
+
+    text = _polish(text)
+    if key is not None:
+        response_cache.put(key, text)
+    return text, usage
+
+
+def generate_reply(
+    user_input: str, history: List[Tuple[str, str]] | None = None, user_id: Any = None
+) -> str:
+    """Return a REF-structured, resonant reply."""
+    return generate_reply_with_usage(user_input, history, user_id)[0]
@@ -1,12 +1,14 @@
-import os
 import json
 import datetime
 import hashlib
 import random
 
+from rve.memory_log import MemoryLog
+
 SHALLOW_SIGNALS = ["it depends", "i'm not sure", "could be", "maybe", "just", "kind of"]
 DEPTH_KEYWORDS = ["recursive", "across time", "paradox", "identity", "coherence"]
-MEMORY_FILE = "sareth_memory.json"
+MEMORY_FILE = "sareth_memory.jsonl"
+LEGACY_MEMORY_FILE = "sareth_memory.json"
 MEMORY_LIMIT = 1000
 
 QUESTION_BANK = [
@@ -48,7 +50,7 @@ class Sareth:
     def __init__(self, name: str = "Sareth", version: str | None = None, mode: str = "chat"):
         self.name = name
         self.version = version
-        self.memory = []
+        self.memory = MemoryLog(limit=MEMORY_LIMIT)
         self.mode = mode  # "chat" or "recursive"
 
     def observe(self, input_text: str) -> str:
@@ -80,9 +82,7 @@ class Sareth:
             "question": active_question,
             "comment": conversation_ping
         }
-        self.memory.append(record)
-        if len(self.memory) > MEMORY_LIMIT:
-            self.memory.pop(0)
+        self.memory.append(record)  # the window drops the oldest record past MEMORY_LIMIT
 
         return f"{response_body}\n\n{AVATAR_MAP['Sareth']} 💬 {conversation_ping}\n{AVATAR_MAP['Sareth']} 🤔 {active_question}"
 
@@ -150,19 +150,18 @@ class Sareth:
             return "reflect across contradiction and symbolic depth"
 
     def export_memory(self) -> str:
-        return json.dumps(self.memory, indent=2)
+        return json.dumps(self.memory.to_list(), indent=2)
 
     def export_memory_to_file(self, filename=MEMORY_FILE):
-        with open(filename, "w") as f:
-            json.dump(self.memory, f, indent=2)
+        # Appends only records not yet saved to the JSONL log.
+        self.memory.flush(filename)
 
     def load_memory_from_file(self, filename=MEMORY_FILE):
-        if os.path.exists(filename):
-            try:
-                with open(filename, "r") as f:
-                    self.memory = json.load(f)
-            except (json.JSONDecodeError, IOError) as e:
-                print(f"⚠️ Failed to load memory: {e}")
+        legacy = LEGACY_MEMORY_FILE if filename == MEMORY_FILE else None
+        try:
+            self.memory.load(filename, legacy=legacy)
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"⚠️ Failed to load memory: {e}")
 
 # Add test entry point for Streamlit integration
 def run_sareth_test():
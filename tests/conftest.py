@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+# Ensure repository root is on path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+@pytest.fixture
+def ledger_session(tmp_path, monkeypatch):
+    """A ledger session bound to a throwaway SQLite database."""
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'ledger.db'}")
+    from rve.ledger import get_session
+
+    sess = get_session()
+    yield sess
+    sess.close()
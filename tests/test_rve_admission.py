@@ -0,0 +1,91 @@
+import threading
+import time
+
+import pytest
+
+from rve.admission import AdmissionController, AdmissionRejected, TokenBucket
+
+
+class Clock:
+    t = 0.0
+
+    def __call__(self):
+        return self.t
+
+
+def test_token_bucket_refills_at_rate():
+    clock = Clock()
+    b = TokenBucket(rate=2.0, burst=2, clock=clock)
+    assert b.reserve() == 0 and b.reserve() == 0
+    assert b.reserve() == pytest.approx(0.5)  # in debt by one token at 2/s
+    clock.t = 1.0
+    assert b.reserve() == 0
+
+
+def test_rate_limit_rejects_when_wait_exceeds_timeout():
+    ctl = AdmissionController(max_concurrent=4, rate=0.1, burst=2, queue_timeout=1.0)
+    for _ in range(2):
+        with ctl.slot("u1"):
+            pass
+    with pytest.raises(AdmissionRejected) as err:
+        with ctl.slot("u1"):
+            pass
+    assert err.value.retry_after == pytest.approx(10, abs=0.5)
+    with ctl.slot("u2"), ctl.slot(None):  # other users and anonymous callers are unaffected
+        assert ctl.metrics()["active"] == 2
+    assert ctl.metrics()["rejected_rate"] == 1
+
+
+def test_fair_queue_round_robins_between_users():
+    ctl = AdmissionController(max_concurrent=1, rate=0, queue_timeout=5)
+    order = []
+    hold = threading.Event()
+
+    def worker(user):
+        with ctl.slot(user):
+            order.append(user)
+            if user == "first":
+                hold.wait()
+
+    first = threading.Thread(target=worker, args=("first",))
+    first.start()
+    while ctl.metrics()["active"] < 1:
+        time.sleep(0.005)
+    threads = []
+    for user in ["heavy", "heavy", "heavy", "light"]:
+        t = threading.Thread(target=worker, args=(user,))
+        t.start()
+        threads.append(t)
+        while ctl.metrics()["queue_depth"] < len(threads):
+            time.sleep(0.005)
+    assert ctl.metrics()["queue_depth_by_user"] == {"heavy": 3, "light": 1}
+    hold.set()
+    for t in [first] + threads:
+        t.join()
+    assert order == ["first", "heavy", "light", "heavy", "heavy"]
+
+
+def test_queue_timeout_and_stream_slot():
+    ctl = AdmissionController(max_concurrent=1, rate=0, queue_timeout=0.05)
+    stream = ctl.admit_stream("a", iter(["x", "y"]))
+    assert next(stream) == "x"  # slot held while streaming
+    with pytest.raises(AdmissionRejected):
+        with ctl.slot("b"):
+            pass
+    assert list(stream) == ["y"]
+    m = ctl.metrics()
+    assert (m["active"], m["queue_depth"], m["rejected_timeout"]) == (0, 0, 1)
+
+
+def test_idle_buckets_are_forgotten_and_capped():
+    ctl = AdmissionController(max_concurrent=4, rate=1000, burst=2, max_buckets=3)
+    for i in range(50):
+        with ctl.slot(f"user{i}"):
+            pass
+    assert ctl.metrics()["buckets"] <= 3
+
+    slow = AdmissionController(max_concurrent=4, rate=0.001, burst=2, max_buckets=3)
+    for i in range(5):
+        with slow.slot(f"user{i}"):
+            pass
+    assert list(slow._buckets) == ["user2", "user3", "user4"]  # none refilled, so LRU order decides
@@ -0,0 +1,66 @@
+import hashlib
+import os
+
+from rve import artifacts
+from rve.ledger import Artifact, add_claim, get_or_create_user
+
+
+def test_hash_file_mmap_matches_streaming(tmp_path):
+    p = tmp_path / "big.bin"
+    data = os.urandom(300_000)
+    p.write_bytes(data)
+    expected = "sha256:" + hashlib.sha256(data).hexdigest()
+    assert artifacts.hash_file(str(p), chunk_size=4096) == expected
+    assert artifacts.hash_file(str(p), chunk_size=4096, mmap_threshold=1) == expected
+
+
+def test_ingest_skips_unchanged_and_finds_duplicates(ledger_session, tmp_path, monkeypatch):
+    u = get_or_create_user(ledger_session, "a@example.com", "pw")
+    c1 = add_claim(ledger_session, u, "first")
+    c2 = add_claim(ledger_session, u, "second")
+    f1, f2, f3 = (tmp_path / n for n in ("a.txt", "b.txt", "c.txt"))
+    f1.write_text("same evidence")
+    f2.write_text("same evidence")
+    f3.write_text("different")
+
+    arts = artifacts.ingest_artifacts(ledger_session, u, c1, [str(f1), str(f3)])
+    arts += artifacts.ingest_artifacts(
+        ledger_session, u, c2, [str(f2), "https://example.com/x", str(tmp_path / "gone")]
+    )
+    assert all(a.hash and a.hashed_at and not a.has_timestamp for a in arts[:3])
+    assert arts[3].hash is None and arts[4].hash is None
+
+    dups = artifacts.duplicate_artifacts(ledger_session, u)
+    assert list(dups.values()) == [[arts[0].id, arts[2].id]]
+    assert artifacts.find_artifact_by_hash(ledger_session, u, arts[2].hash).id == arts[0].id
+
+    calls = []
+    monkeypatch.setattr(artifacts, "hash_file", lambda p: calls.append(p) or "sha256:x")
+    stats = artifacts.hash_artifacts(ledger_session, u)
+    assert stats == {"hashed": 0, "skipped": 3, "missing": 1, "remote": 1, "errors": 0}
+    assert calls == []
+
+    os.utime(f3, (1, 1))
+    stats = artifacts.hash_artifacts(ledger_session, u, batch_size=2)
+    assert stats["hashed"] == 1 and calls == [str(f3)]
+    assert ledger_session.get(Artifact, arts[1].id).hash == "sha256:x"
+
+
+def test_unreadable_file_does_not_abort_the_run(ledger_session, tmp_path, monkeypatch):
+    u = get_or_create_user(ledger_session, "b@example.com", "pw")
+    c = add_claim(ledger_session, u, "claim")
+    good, bad = tmp_path / "good.txt", tmp_path / "bad.txt"
+    good.write_text("ok")
+    bad.write_text("locked")
+    real = artifacts.hash_file
+
+    def hash_file(path):
+        if path == str(bad):
+            raise PermissionError(13, "Permission denied", path)
+        return real(path)
+
+    monkeypatch.setattr(artifacts, "hash_file", hash_file)
+    arts = artifacts.ingest_artifacts(ledger_session, u, c, [str(bad), str(good)])
+    assert arts[0].hash is None and arts[1].hash
+    stats = artifacts.hash_artifacts(ledger_session, u)
+    assert stats["errors"] == 1 and stats["skipped"] == 1
@@ -0,0 +1,35 @@
+import pytest
+import sqlalchemy as sa
+
+from rve import backfill
+
+
+@pytest.fixture
+def engine(tmp_path):
+    eng = sa.create_engine(f"sqlite:///{tmp_path / 'bf.db'}", future=True)
+    with eng.begin() as conn:
+        conn.execute(sa.text("CREATE TABLE claims (id INTEGER PRIMARY KEY, user_id INTEGER)"))
+        conn.execute(sa.text("INSERT INTO claims (id) VALUES " + ",".join(f"({i})" for i in range(1, 26))))
+    return eng
+
+
+def test_backfill_batches_and_verifies(engine):
+    with engine.begin() as conn:
+        with pytest.raises(backfill.BackfillIncomplete):
+            backfill.require_backfilled(conn, "claims", "user_id")
+        assert backfill.backfill_column(conn, "claims", "user_id", ":uid", {"uid": 7}, batch_size=10) == 25
+        backfill.require_backfilled(conn, "claims", "user_id")
+        # A finished backfill is not repeated.
+        assert backfill.backfill_column(conn, "claims", "user_id", ":uid", {"uid": 8}) == 0
+        assert conn.execute(sa.text("SELECT DISTINCT user_id FROM claims")).scalars().all() == [7]
+
+
+def test_backfill_resumes_from_checkpoint(engine):
+    with engine.begin() as conn:
+        backfill.progress_table.create(conn)
+        conn.execute(backfill.progress_table.insert().values(name="claims.user_id", last_pk=20, done=False))
+        assert backfill.backfill_column(conn, "claims", "user_id", ":uid", {"uid": 3}, batch_size=2) == 5
+        assert backfill.count_nulls(conn, "claims", "user_id") == 20
+
+        backfill.clear_progress(conn, ["claims.user_id"])
+        assert backfill.backfill_column(conn, "claims", "user_id", ":uid", {"uid": 3}) == 20
@@ -0,0 +1,51 @@
+import json
+import threading
+import time
+
+from rve import batch
+
+
+def _write_inputs(path, n):
+    rows = [{"id": f"q{i}", "input": f"prompt {i}", "history": [["user", "hi"], ["assistant", "hey"]]} for i in range(n)]
+    path.write_text("\n".join(json.dumps(r) for r in rows) + "\n")
+
+
+def test_batch_runs_concurrently_retries_and_resumes(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch, "backoff_delay", lambda attempt: 0)
+    src, out = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    _write_inputs(src, 12)
+    active, peak, calls = [0], [0], {}
+    lock = threading.Lock()
+
+    def generate(text, history):
+        assert history == [("user", "hi"), ("assistant", "hey")]
+        with lock:
+            calls[text] = calls.get(text, 0) + 1
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+            n = calls[text]
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+        if text == "prompt 3" and n == 1:
+            raise RuntimeError("transient")
+        if text == "prompt 7":
+            raise RuntimeError("always")
+        return text.upper(), {"prompt_tokens": 5, "completion_tokens": 2, "total_tokens": 7, "cached": False}
+
+    summary = batch.run_batch(str(src), str(out), concurrency=4, retries=1, generate=generate)
+    rows = [json.loads(l) for l in out.read_text().splitlines()]
+    assert (summary["ok"], summary["failed"]) == (11, 1)
+    assert summary["prompt_tokens"] == 55
+    assert 1 < peak[0] <= 4
+    by_id = {r["id"]: r for r in rows}
+    assert by_id["q3"]["attempts"] == 2 and by_id["q3"]["reply"] == "PROMPT 3"
+    assert by_id["q7"]["error"] == "RuntimeError: always"
+
+    # Simulate a crash mid-write, then resume: only the failed item is redone.
+    with open(out, "a") as f:
+        f.write('{"id": "q1", "rep')
+    calls.clear()
+    summary = batch.run_batch(str(src), str(out), concurrency=4, retries=0, generate=generate)
+    assert summary["skipped"] == 11 and list(calls) == ["prompt 7"]
+    assert all(json.loads(l) for l in out.read_text().splitlines())
@@ -0,0 +1,69 @@
+import os
+import time
+
+from rve.cache import ResponseCache, cache_key
+
+MSGS = [{"role": "system", "content": "sys"}, {"role": "user", "content": "hi"}]
+PARAMS = {"model": "gpt-4o-mini", "temperature": 0.2}
+
+
+def test_key_normalises_whitespace_and_tracks_params():
+    spaced = [{"role": "system", "content": " sys "}, {"role": "user", "content": "hi\n"}]
+    assert cache_key(MSGS, PARAMS) == cache_key(spaced, dict(reversed(PARAMS.items())))
+    assert cache_key(MSGS, PARAMS) != cache_key(MSGS, {**PARAMS, "model": "gpt-4o"})
+
+
+def test_memory_and_disk_tiers(tmp_path):
+    key = cache_key(MSGS, PARAMS)
+    c = ResponseCache(str(tmp_path), ttl=60)
+    assert c.get(key) is None
+    c.put(key, "hello")
+    assert c.get(key) == "hello"
+
+    fresh = ResponseCache(str(tmp_path), ttl=60)  # another process, same directory
+    assert fresh.get(key) == "hello"
+    assert fresh.get(key) == "hello"
+    s = fresh.stats()
+    assert (s["disk_hits"], s["memory_hits"], s["misses"]) == (1, 1, 0)
+    assert c.stats()["misses"] == 1
+
+
+def test_ttl_size_eviction_and_temperature_bypass(tmp_path):
+    c = ResponseCache(str(tmp_path), ttl=60, max_bytes=600, max_entries=1)
+    for i in range(10):
+        c.put(f"{i:064x}", "x" * 100)
+    files = [f for _, _, fs in os.walk(tmp_path) for f in fs]
+    assert 0 < len(files) < 10
+    assert c.stats()["disk_bytes"] <= 600
+    assert c.get(f"{9:064x}") == "x" * 100
+
+    expired = ResponseCache(str(tmp_path), ttl=60)
+    expired.put("a" * 64, "old")
+    path = expired._path("a" * 64)
+    os.utime(path, (time.time() - 120, time.time() - 120))
+    expired.ttl = 0  # entries written before now are past their TTL
+    expired.evict()
+    assert not os.path.exists(path)
+
+    assert not c.accepts(1.0) and not c.accepts(0.7) and c.accepts(0.2)
+    assert c.stats()["bypassed"] == 2
+
+
+def test_overwriting_a_key_does_not_grow_disk_bytes(tmp_path):
+    c = ResponseCache(str(tmp_path), ttl=60)
+    c.put("b" * 64, "first")
+    c.put("c" * 64, "other")  # measured from disk on the first write, counted after
+    for value in ("x" * 300, "short", "y" * 50):
+        c.put("c" * 64, value)
+    on_disk = sum(os.path.getsize(os.path.join(r, f)) for r, _, fs in os.walk(tmp_path) for f in fs)
+    assert c.stats()["disk_bytes"] == on_disk
+
+
+def test_unwritable_disk_tier_is_best_effort(tmp_path):
+    blocker = tmp_path / "not-a-dir"
+    blocker.write_text("")
+    c = ResponseCache(str(blocker), ttl=60)
+    key = cache_key(MSGS, PARAMS)
+    c.put(key, "hello")  # must not raise after the reply was paid for
+    assert c.get(key) == "hello"
+    assert c.stats()["disk_errors"] == 1
@@ -0,0 +1,61 @@
+from rve.chat_store import open_chat_session
+from rve.ledger import ChatMessage, get_or_create_user, get_session, record_chat_messages
+from rve.writebehind import WriteBehind
+
+
+def test_chat_session_survives_restart(ledger_session):
+    user = get_or_create_user(ledger_session, "chat@example.com", "pw")
+    wb = WriteBehind(lambda rows: record_chat_messages(get_session(), rows), interval=0.05)
+
+    store, restored = open_chat_session("conv-1", user.id, sess=ledger_session, writer=wb)
+    assert restored == []
+    for i in range(6):
+        store.append("user" if i % 2 == 0 else "assistant", f"m{i}")
+    assert wb.flush(timeout=5)
+    assert ledger_session.query(ChatMessage).count() == 6
+
+    # A new session (another replica) resumes by key with only the last N messages.
+    again, restored = open_chat_session("conv-1", user.id, sess=ledger_session, limit=4, writer=wb)
+    assert [m["content"] for m in restored] == ["m2", "m3", "m4", "m5"]
+    assert restored[0] == {"role": "user", "content": "m2"}
+    assert again.conversation_id == store.conversation_id
+
+    # Without a key, a signed-in user gets their latest conversation back.
+    latest, restored = open_chat_session(None, user.id, sess=ledger_session, limit=2, writer=wb)
+    assert latest.key == "conv-1" and len(restored) == 2
+    other, restored = open_chat_session("conv-2", sess=ledger_session, writer=wb)
+    assert restored == [] and other.conversation_id != store.conversation_id
+    wb.close()
+
+
+def test_concurrent_writers_get_distinct_seqs(ledger_session):
+    wb = WriteBehind(lambda rows: record_chat_messages(get_session(), rows), interval=0.05)
+    tab_a, _ = open_chat_session("shared", sess=ledger_session, writer=wb)
+    tab_b, _ = open_chat_session("shared", sess=ledger_session, writer=wb)
+    for i in range(3):
+        tab_a.append("user", f"a{i}")
+        tab_b.append("user", f"b{i}")
+    assert wb.flush(timeout=5)
+    wb.close()
+    seqs = [m.seq for m in ledger_session.query(ChatMessage).order_by(ChatMessage.seq)]
+    assert seqs == list(range(1, 7)) and wb.stats["dropped"] == 0
+
+    record_chat_messages(get_session(), [{"conversation_id": tab_a.conversation_id, "role": "user", "content": "x"}])
+    assert ledger_session.query(ChatMessage).count() == 7
+
+
+def test_key_of_another_users_conversation_is_not_loaded(ledger_session):
+    owner = get_or_create_user(ledger_session, "owner@example.com", "pw")
+    other = get_or_create_user(ledger_session, "other@example.com", "pw")
+    wb = WriteBehind(lambda rows: record_chat_messages(get_session(), rows), interval=0.05)
+    mine, _ = open_chat_session("private", owner.id, sess=ledger_session, writer=wb)
+    mine.append("user", "secret")
+    assert wb.flush(timeout=5)
+
+    for user_id in (other.id, None):
+        theirs, restored = open_chat_session("private", user_id, sess=ledger_session, writer=wb)
+        assert restored == [] and theirs.key != "private"
+        assert theirs.conversation_id != mine.conversation_id
+    _, restored = open_chat_session("private", owner.id, sess=ledger_session, writer=wb)
+    assert restored == [{"role": "user", "content": "secret"}]
+    wb.close()
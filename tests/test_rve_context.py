@@ -0,0 +1,36 @@
+from rve.context import ContextWindow, message_tokens
+
+
+def _history(n):
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"Turn {i}. " + "word " * 40}
+        for i in range(n)
+    ]
+
+
+def test_window_stays_within_budget_and_summarizes():
+    ctx = ContextWindow("You are Sareth.", budget=400, summary_budget=100)
+    history = _history(60)
+    for i in range(1, len(history) + 1):
+        ctx.sync(history[:i])
+        assert ctx.usage()["total_tokens"] <= ctx.budget
+
+    msgs = ctx.messages()
+    usage = ctx.usage()
+    assert msgs[0] == {"role": "system", "content": "You are Sareth."}
+    assert msgs[1]["content"].startswith("Summary of earlier conversation:")
+    assert msgs[-1] == history[-1]
+    assert usage["summarized_turns"] + usage["recent_turns"] == 60
+    assert usage["recent_tokens"] == sum(message_tokens(m) for m in msgs[2:])
+    assert "Turn 0." not in ctx.summary  # oldest summary lines were trimmed
+    assert f"Turn {usage['summarized_turns'] - 1}." in ctx.summary
+
+
+def test_short_history_is_sent_verbatim_and_reset_on_clear():
+    ctx = ContextWindow("sys", budget=4000)
+    history = _history(4)
+    ctx.sync(history)
+    assert ctx.messages()[1:] == history
+    assert ctx.summary == ""
+    ctx.sync(history[:1])
+    assert ctx.messages()[1:] == history[:1]
@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from rve.export import export_ledger, read_watermark
+from rve.ledger import Claim, add_claim, get_or_create_user
+
+
+def _load_npz(out_dir, table):
+    parts = sorted((out_dir / table).glob("part-*.npz"))
+    return [np.load(p) for p in parts]
+
+
+def test_export_chunks_and_resume(ledger_session, tmp_path):
+    u = get_or_create_user(ledger_session, "a@example.com", "pw")
+    for i in range(5):
+        add_claim(ledger_session, u, f"claim {i}", prov_fields=i)
+
+    out = tmp_path / "export"
+    stats = export_ledger(str(out), fmt="npz", chunk_size=2)
+    assert stats["claims"]["rows"] == 5
+    assert stats["claims"]["parts"] == 3
+    assert stats["drift_history"]["rows"] == 5
+    parts = _load_npz(out, "claims")
+    ids = np.concatenate([p["id"] for p in parts])
+    assert ids.tolist() == [1, 2, 3, 4, 5]
+    assert parts[0]["text"].tolist() == ["claim 0", "claim 1"]
+    assert read_watermark(str(out)) == {"claims": 5, "drift_history": 5}
+
+    add_claim(ledger_session, u, "late claim")
+    stats = export_ledger(str(out), tables=["claims"], fmt="npz", chunk_size=2)
+    assert stats["claims"]["rows"] == 1
+    assert _load_npz(out, "claims")[-1]["text"].tolist() == ["late claim"]
+
+
+def test_export_filters(ledger_session, tmp_path):
+    a = get_or_create_user(ledger_session, "a@example.com", "pw")
+    b = get_or_create_user(ledger_session, "b@example.com", "pw")
+    add_claim(ledger_session, a, "old")
+    add_claim(ledger_session, a, "new")
+    add_claim(ledger_session, b, "other user")
+    old = ledger_session.query(Claim).filter_by(text="old").one()
+    old.created_at = datetime.utcnow() - timedelta(days=10)
+    ledger_session.commit()
+
+    out = tmp_path / "export"
+    stats = export_ledger(
+        str(out),
+        tables=["claims"],
+        fmt="npz",
+        user_id=a.id,
+        since=datetime.utcnow() - timedelta(days=1),
+    )
+    assert stats["claims"]["rows"] == 1
+    assert _load_npz(out, "claims")[0]["text"].tolist() == ["new"]
+
+
+def test_resume_refuses_different_filters(ledger_session, tmp_path):
+    a = get_or_create_user(ledger_session, "a@example.com", "pw")
+    b = get_or_create_user(ledger_session, "b@example.com", "pw")
+    add_claim(ledger_session, a, "mine")
+    add_claim(ledger_session, b, "theirs")
+
+    out = tmp_path / "export"
+    export_ledger(str(out), tables=["claims"], fmt="npz", user_id=b.id)
+    with pytest.raises(ValueError, match="filters"):
+        export_ledger(str(out), tables=["claims"], fmt="npz", user_id=a.id)
+    stats = export_ledger(str(out), tables=["claims"], fmt="npz", user_id=b.id)
+    assert stats["claims"]["rows"] == 0
+    stats = export_ledger(str(tmp_path / "other"), tables=["claims"], fmt="npz", user_id=a.id)
+    assert stats["claims"]["rows"] == 1
+
+
+def test_export_without_resume_replaces_earlier_parts(ledger_session, tmp_path):
+    u = get_or_create_user(ledger_session, "a@example.com", "pw")
+    for i in range(3):
+        add_claim(ledger_session, u, f"claim {i}")
+
+    out = tmp_path / "export"
+    export_ledger(str(out), fmt="npz", chunk_size=2)
+    stats = export_ledger(str(out), tables=["claims"], fmt="npz", resume=False)
+    assert stats["claims"]["rows"] == 3
+    texts = [t for part in _load_npz(out, "claims") for t in part["text"].tolist()]
+    assert sorted(texts) == ["claim 0", "claim 1", "claim 2"]
+    assert not list((out / "drift_history").glob("part-*"))
+    assert read_watermark(str(out)) == {"claims": stats["claims"]["last_id"]}
@@ -0,0 +1,56 @@
+import time
+from datetime import datetime
+
+from rve.glyph_store import GlyphTraceStore
+from rve.ledger import GlyphEvent, get_or_create_user, get_session, glyph_frequencies, record_glyph_events
+from rve.writebehind import WriteBehind
+
+
+def test_writebehind_batches_and_flushes():
+    batches = []
+    wb = WriteBehind(batches.append, interval=0.05, max_batch=10)
+    wb.put_many(range(25))
+    assert wb.flush(timeout=5)
+    assert sorted(x for b in batches for x in b) == list(range(25))
+    assert max(len(b) for b in batches) <= 10
+    assert wb.stats["written"] == 25 and wb.pending() == 0
+    wb.close()
+
+
+def test_writebehind_drops_only_the_failing_row():
+    written, dropped = [], []
+
+    def flush(rows):
+        if "bad" in rows:
+            raise ValueError("constraint violated")
+        written.extend(rows)
+
+    wb = WriteBehind(flush, interval=0.05, on_drop=lambda row, exc: dropped.append(row))
+    wb.put_many(["a", "bad", "b"])
+    assert wb.flush(timeout=5)
+    assert sorted(written) == ["a", "b"] and dropped == ["bad"]
+    assert wb.stats["dropped"] == 1 and wb.stats["written"] == 2
+    assert [row for row, _ in wb.failed] == ["bad"]
+    wb.close()
+
+
+def test_trace_store_is_bounded_and_persists_everything(ledger_session):
+    user = get_or_create_user(ledger_session, "g@example.com", "pw")
+    wb = WriteBehind(lambda rows: record_glyph_events(get_session(), rows), interval=0.05)
+    store = GlyphTraceStore(user_id=user.id, ring_size=5, writer=wb)
+    now = int(time.time())
+    for i in range(12):
+        store.extend([{"glyph": "THRESHOLD" if i % 3 else "COHERENCE", "signal": "x", "t": now}])
+    assert len(store) == 5 and store.total == 12
+    assert len(store.recent(3)) == 3
+    assert wb.flush(timeout=5)
+    wb.close()
+
+    assert ledger_session.query(GlyphEvent).filter_by(session_id=store.session_id).count() == 12
+    freq = glyph_frequencies(ledger_session, user_id=user.id)
+    day = datetime.utcfromtimestamp(now).strftime("%Y-%m-%d")
+    assert freq == [
+        {"bucket": day, "glyph": "COHERENCE", "n": 4},
+        {"bucket": day, "glyph": "THRESHOLD", "n": 8},
+    ]
+    assert glyph_frequencies(ledger_session, session_id="other", bucket=None) == []
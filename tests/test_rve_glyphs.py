@@ -0,0 +1,77 @@
+import json
+
+from rve import glyphs
+from rve.glyphs import (
+    GlyphAutomaton, GlyphRuleEngine, GlyphStreamMatcher, map_text_to_glyph_events,
+    map_texts_to_glyph_events,
+)
+
+
+def _glyphs(evs):
+    return [e["glyph"] for e in evs]
+
+
+def test_map_text_finds_each_glyph_once():
+    evs = map_text_to_glyph_events("The River crossed the threshold; the river remembers. Sara?")
+    assert _glyphs(evs) == ["NAEDA–Ø3", "THRESHOLD", "SEREN–Ø1"]
+    assert evs[1]["signal"] == "detected"
+    assert map_text_to_glyph_events("nothing here") == []
+
+
+def test_identity_rules_include_regex_and_batch():
+    out = map_texts_to_glyph_events(
+        ["a gap between knowing and naming", "sacred latency", "coherence", ""]
+    )
+    assert [_glyphs(e) for e in out] == [["⟁∅"], ["⟁∅"], ["COHERENCE"], []]
+
+
+def test_stream_matcher_handles_chunk_boundaries():
+    m = GlyphStreamMatcher()
+    deltas = ["We are near the thresh", "ol", "d of coh", "erence. The thre", "shold again. The gap bet",
+              "ween emergence and recog", "nition."]
+    out = [_glyphs(m.feed(d)) for d in deltas]
+    assert out == [[], [], ["THRESHOLD"], ["COHERENCE"], [], [], ["⟁∅"]]
+    m.reset()
+    assert _glyphs(m.feed("threshold")) == ["THRESHOLD"]
+
+
+def test_automaton_overlapping_patterns():
+    ac = GlyphAutomaton([("he", 1), ("she", 2), ("hers", 3), ("his", 4)])
+    found, _ = ac.scan("ushers")
+    assert sorted(found) == [(4, 1), (4, 2), (6, 3)]
+
+
+def test_rules_file_hot_reload(tmp_path, monkeypatch):
+    rules = tmp_path / "rules.json"
+    rules.write_text(json.dumps({"rules": [{"glyph": "EMBER", "signal": "warm", "keywords": ["ember"]}]}))
+    monkeypatch.setenv("RVE_GLYPH_RULES", str(rules))
+    eng = glyphs.get_rule_engine(force_check=True)
+    assert _glyphs(eng.map_text("an ember glows")) == ["EMBER"]
+    assert glyphs.get_rule_engine() is eng
+
+    rules.write_text(json.dumps({"rules": [{"glyph": "ASH", "keywords": ["ember"]}]}))
+    import os
+    os.utime(rules, ns=(1, 1))
+    assert _glyphs(glyphs.get_rule_engine(force_check=True).map_text("ember")) == ["ASH"]
+    monkeypatch.delenv("RVE_GLYPH_RULES")
+    assert glyphs.get_rule_engine(force_check=True).map_text("ember") == []
+
+
+def test_invalid_rules_file_keeps_the_last_good_engine(tmp_path, monkeypatch, caplog):
+    import os
+
+    rules = tmp_path / "rules.json"
+    rules.write_text(json.dumps({"rules": [{"glyph": "EMBER", "signal": "warm", "keywords": ["ember"]}]}))
+    monkeypatch.setenv("RVE_GLYPH_RULES", str(rules))
+    eng = glyphs.get_rule_engine(force_check=True)
+    for n, bad in enumerate(['{"rules": [', json.dumps({"rules": [{"glyph": "X", "regex": ["("]}]})], start=1):
+        rules.write_text(bad)
+        os.utime(rules, ns=(n, n))
+        assert glyphs.get_rule_engine(force_check=True) is eng
+        assert _glyphs(glyphs.map_text_to_glyph_events("an ember glows")) == ["EMBER"]
+    assert len([r for r in caplog.records if r.name == "rve.glyphs"]) == 2
+
+
+def test_many_rules_compile_once():
+    eng = GlyphRuleEngine([{"glyph": f"G{i}", "keywords": [f"word{i}x"]} for i in range(500)])
+    assert _glyphs(eng.map_text("... word42x and word7x ...")) == ["G42", "G7"]
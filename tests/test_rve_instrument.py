@@ -0,0 +1,36 @@
+import pytest
+from sqlalchemy import text
+
+from rve.instrument import assert_no_n_plus_one, track_queries
+from rve.ledger import add_claim, get_or_create_user, list_claims, list_claims_with_history
+
+
+def test_selectin_loader_keeps_query_count_constant(ledger_session):
+    u = get_or_create_user(ledger_session, "a@example.com", "pw")
+    for i in range(8):
+        add_claim(ledger_session, u, f"claim {i}")
+    ledger_session.expire_all()
+
+    with track_queries() as lazy:
+        for c in list_claims(ledger_session, u):
+            len(c.histories)
+    assert lazy.count >= 9
+    with pytest.raises(AssertionError, match="N\\+1"):
+        assert_no_n_plus_one(lazy)
+
+    ledger_session.expire_all()
+    assert u.id
+    with track_queries() as eager:
+        claims = list_claims_with_history(ledger_session, u, limit=5)
+        assert [len(c.histories) for c in claims] == [1] * 5
+    assert eager.count == 2
+    assert eager.total_time > 0
+    assert_no_n_plus_one(eager)
+    assert [c.text for c in claims][:2] == ["claim 7", "claim 6"]
+
+
+def test_slow_statements_are_recorded(ledger_session):
+    with track_queries(slow_threshold=0) as stats:
+        ledger_session.execute(text("SELECT 1"))
+    assert stats.slow and stats.slow[0][0] == "SELECT 1"
+    assert stats.snapshot()["count"] == 1
@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from rve.latency import JsonlSink, LatencyRecorder, instrument
+
+
+class Clock:
+    def __init__(self, ticks):
+        self.ticks = iter(ticks)
+
+    def __call__(self):
+        return next(self.ticks)
+
+
+def test_instrument_records_ttft_gaps_and_rate(tmp_path):
+    log = tmp_path / "latency.jsonl"
+    rec = LatencyRecorder(sink=JsonlSink(str(log)))
+    # start, three chunks (0.2s to first, then 20ms and 1.5s gaps), end
+    clock = Clock([0.0, 0.2, 0.22, 1.72, 1.75])
+    out = list(instrument(iter(["a", "bb", "c"]), "m1", rec, clock))
+    assert out == ["a", "bb", "c"]
+
+    (r,) = rec.recent("m1")
+    assert r["ttft_ms"] == 200.0 and r["chunks"] == 3 and r["chars"] == 4
+    assert r["stalls"] == 1 and r["max_gap_ms"] == 1500.0
+    assert r["tokens_per_s"] == round(2 / 1.52, 2)
+    stats = rec.model_stats("m1")
+    assert stats["gap_histogram"]["<25ms"] == 1 and stats["gap_histogram"][">=2500ms"] == 0
+    assert sum(stats["gap_histogram"].values()) == 2
+    assert json.loads(log.read_text())["model"] == "m1"
+
+
+def test_errors_and_early_close_are_recorded():
+    rec = LatencyRecorder()
+
+    def failing():
+        yield "x"
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        list(instrument(failing(), "m", rec))
+    gen = instrument(iter(["a", "b"]), "m", rec)
+    next(gen)
+    gen.close()
+    assert [r["error"] for r in rec.recent("m")] == ["RuntimeError", "cancelled"]
+    assert rec.snapshot()["m"]["error_rate"] == 0.5  # closing early is not a failure
+    assert rec.model_stats("other") is None
@@ -0,0 +1,37 @@
+from rve.live import StreamRenderer
+
+
+class Slot:
+    def __init__(self):
+        self.calls = []
+
+    def markdown(self, body):
+        self.calls.append(body)
+
+
+class Clock:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+
+def test_renderer_coalesces_deltas():
+    slot, clock = Slot(), Clock()
+    r = StreamRenderer(slot, interval_ms=100, max_pending_chars=50, clock=clock)
+    for _ in range(20):
+        r.push("ab")
+    assert slot.calls == []  # neither the interval nor the size limit was hit
+    clock.t = 0.2
+    r.push("ab")
+    assert slot.calls == ["ab" * 21 + "▌"]
+    r.push("x" * 60)  # enough pending text forces a flush
+    assert len(slot.calls) == 2
+    assert r.finish() == "ab" * 21 + "x" * 60
+    assert slot.calls[-1] == r.text
+    assert r.stats() == {
+        "deltas": 22,
+        "renders": 3,
+        "bytes_sent": sum(len(c.encode()) for c in slot.calls),
+    }
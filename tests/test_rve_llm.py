@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from rve import llm
+
+
+class FakeCompletions:
+    def __init__(self, fail=0, delay=0.0):
+        self.fail = fail
+        self.delay = delay
+        self.calls = 0
+
+    def _reply(self, kwargs):
+        self.calls += 1
+        if self.calls <= self.fail:
+            req = httpx.Request("POST", "http://llm.test/v1/chat/completions")
+            raise openai.RateLimitError("slow down", response=httpx.Response(429, request=req), body=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))])
+
+    def create(self, **kwargs):
+        time.sleep(self.delay)
+        return self._reply(kwargs)
+
+
+class AsyncFakeCompletions(FakeCompletions):
+    async def create(self, **kwargs):
+        await asyncio.sleep(self.delay)
+        return self._reply(kwargs)
+
+
+def _client(completions, **kwargs):
+    c = llm.LLMClient("test-key", **kwargs)
+    fake = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    c._sync = c._async = fake
+    return c
+
+
+MSGS = [{"role": "user", "content": "hi"}]
+
+
+def test_retries_rate_limits_with_backoff(monkeypatch):
+    monkeypatch.setattr(llm, "BACKOFF_MAX", 0.0)
+    fake = FakeCompletions(fail=2)
+    c = _client(fake, max_retries=3)
+    assert c.chat(MSGS, model="m").choices[0].message.content == "ok"
+    assert fake.calls == 3 and c.stats["retries"] == 2
+
+    c = _client(FakeCompletions(fail=5), max_retries=1)
+    with pytest.raises(openai.RateLimitError):
+        c.chat(MSGS, model="m")
+    assert c.stats["errors"] == 1
+
+    fake = FakeCompletions(fail=1)
+    with pytest.raises(openai.RateLimitError):
+        _client(fake, max_retries=3).chat(MSGS, model="m", max_retries=0)  # the caller falls back instead
+    assert fake.calls == 1
+
+
+def test_identical_concurrent_requests_are_coalesced():
+    fake = FakeCompletions(delay=0.2)
+    c = _client(fake)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(c.chat(MSGS, model="m"))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert fake.calls == 1 and len(results) == 5
+    assert c.stats["coalesced"] == 4
+    c.chat(MSGS, model="m")  # nothing in flight any more
+    assert fake.calls == 2
+
+
+def test_async_coalescing_and_queue_timeout():
+    fake = AsyncFakeCompletions(delay=0.1)
+    c = _client(fake, max_concurrency=1, queue_timeout=0.05)
+
+    async def run():
+        same = await asyncio.gather(*(c.achat(MSGS, model="m") for _ in range(3)))
+        assert fake.calls == 1 and len(same) == 3
+        other = [{"role": "user", "content": "hello"}]
+        return await asyncio.gather(c.achat(MSGS, model="m"), c.achat(other, model="m"), return_exceptions=True)
+
+    first, second = asyncio.run(run())
+    assert first.choices[0].message.content == "ok"
+    assert isinstance(second, llm.LLMBusy)
+    assert c.stats["rejected"] == 1
+
+
+def test_abandoned_streams_return_their_connections():
+    from rve.loadtest import FakeOpenAIServer
+
+    with FakeOpenAIServer(ttft=0, token_rate=20, reply_tokens=200) as server:
+        c = llm.LLMClient("test-key", server.base_url, max_concurrency=1, queue_timeout=1, timeout=3)
+        for _ in range(3):
+            stream = c.stream_chat(MSGS, model="m")
+            next(stream)
+            stream.close()
+        assert c.chat(MSGS, model="m", max_tokens=2).choices[0].message.content
+        assert c.stats["active"] == 0
+
+        async def run():
+            for _ in range(3):
+                stream = c.astream_chat(MSGS, model="m")
+                await stream.__anext__()
+                await stream.aclose()
+            return await c.achat(MSGS, model="m", max_tokens=2)
+
+        assert asyncio.run(run()).choices[0].message.content
@@ -0,0 +1,45 @@
+import json
+import os
+
+from rve.loadtest import FakeOpenAIServer, load_trace, percentile, run_load
+
+
+def test_trace_loading_and_percentiles(tmp_path):
+    path = tmp_path / "trace.jsonl"
+    rows = [{"title": "Hi", "body": "there"}, {"messages": [{"role": "user", "content": "yo"}]}]
+    path.write_text("\n".join(json.dumps(r) for r in rows) + "\n")
+    assert load_trace(str(path)) == [
+        [{"role": "user", "content": "Hi\nthere"}],
+        [{"role": "user", "content": "yo"}],
+    ]
+    assert percentile([1, 2, 3, 4, 5], 0.5) == 3
+    assert percentile([], 0.5) is None
+
+
+def test_stream_load_against_fake_server():
+    traces = [[{"role": "user", "content": "hello"}]]
+    with FakeOpenAIServer(ttft=0.02, token_rate=2000, reply_tokens=10) as server:
+        report = run_load(traces, server.base_url, concurrency=4, requests=8)
+    assert report["ok"] == 8 and report["error_rate"] == 0
+    assert report["tokens"] == 80
+    assert report["ttft_ms"]["p50"] >= 20
+    assert report["ttft_ms"]["p99"] >= report["ttft_ms"]["p50"]
+
+
+def test_injected_errors_are_reported():
+    traces = [[{"role": "user", "content": "hello"}]]
+    with FakeOpenAIServer(ttft=0, error_rate=1.0, error_status=500) as server:
+        report = run_load(traces, server.base_url, concurrency=2, requests=4)
+        assert server.errors == 4
+    assert report["error_rate"] == 1.0
+    assert report["errors"] == {"InternalServerError": 4}
+
+
+def test_reply_load_reaches_the_server_for_every_request(monkeypatch):
+    monkeypatch.delenv("OPENAI_BASE_URL", raising=False)
+    traces = [[{"role": "user", "content": "hello"}]]
+    with FakeOpenAIServer(ttft=0.01, token_rate=2000, reply_tokens=10) as server:
+        report = run_load(traces, server.base_url, concurrency=4, requests=8, mode="reply")
+        assert server.requests == 8  # no response cache, admission queue or coalescing in between
+    assert report["ok"] == 8 and report["tokens"] == 80
+    assert "OPENAI_BASE_URL" not in os.environ
@@ -0,0 +1,81 @@
+import json
+
+from rve import memory_log
+from rve.memory_log import MemoryLog, tail_lines
+
+
+def _lines(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_window_is_bounded_and_flushes_in_batches(tmp_path):
+    path = str(tmp_path / "mem.jsonl")
+    mem = MemoryLog(path, limit=5, flush_every=4, compact_factor=100)
+    for i in range(3):
+        mem.append({"i": i})
+    assert not (tmp_path / "mem.jsonl").exists()
+    mem.append({"i": 3})
+    assert [r["i"] for r in _lines(path)] == [0, 1, 2, 3]
+    for i in range(4, 9):
+        mem.append({"i": i})
+    mem.flush()
+    assert len(mem) == 5 and [r["i"] for r in mem[-2:]] == [7, 8]
+    assert [r["i"] for r in _lines(path)] == list(range(9))
+
+
+def test_compaction_keeps_only_the_window(tmp_path):
+    path = str(tmp_path / "mem.jsonl")
+    mem = MemoryLog(path, limit=3, flush_every=1, compact_factor=2)
+    for i in range(7):
+        mem.append({"i": i})
+    assert len(_lines(path)) <= 2 * 3
+    mem.compact()
+    assert [r["i"] for r in _lines(path)] == [4, 5, 6]
+
+
+def test_compaction_keeps_other_sessions_records(tmp_path):
+    path = str(tmp_path / "mem.jsonl")
+    a = MemoryLog(path, limit=4, flush_every=1, compact_factor=100)
+    b = MemoryLog(path, limit=4, flush_every=1, compact_factor=100)
+    for i in range(3):
+        a.append({"who": "a", "i": i})
+        b.append({"who": "b", "i": i})
+    a.compact()
+    assert [(r["who"], r["i"]) for r in _lines(path)] == [("a", 1), ("b", 1), ("a", 2), ("b", 2)]
+
+
+def test_unsaved_records_are_flushed_on_a_timer_and_at_exit(tmp_path):
+    path = str(tmp_path / "mem.jsonl")
+    timed = MemoryLog(path, limit=10, flush_every=100, flush_interval=0)
+    timed.append({"i": 0})
+    assert [r["i"] for r in _lines(path)] == [0]
+
+    idle = MemoryLog(str(tmp_path / "idle.jsonl"), limit=10, flush_every=100, flush_interval=3600)
+    idle.append({"i": 1})
+    assert not (tmp_path / "idle.jsonl").exists()
+    memory_log._flush_open_logs()  # registered with atexit
+    assert [r["i"] for r in _lines(str(tmp_path / "idle.jsonl"))] == [1]
+
+
+def test_load_reads_the_tail_and_skips_torn_lines(tmp_path):
+    path = tmp_path / "mem.jsonl"
+    path.write_text("".join(json.dumps({"i": i, "pad": "x" * 50}) + "\n" for i in range(200)) + '{"i": 2')
+    assert len(tail_lines(str(path), 3, block=64)) == 3
+    mem = MemoryLog(limit=10)
+    assert mem.load(str(path)) == 9
+    assert [r["i"] for r in mem] == list(range(191, 200))
+
+
+def test_legacy_json_is_imported_once(tmp_path):
+    legacy = tmp_path / "mem.json"
+    legacy.write_text(json.dumps([{"i": i} for i in range(8)], indent=2))
+    path = str(tmp_path / "mem.jsonl")
+    mem = MemoryLog(limit=5)
+    assert mem.load(path, legacy=str(legacy)) == 5
+    assert [r["i"] for r in _lines(path)] == [3, 4, 5, 6, 7]
+    mem.append({"i": 8})
+    mem.flush()
+    again = MemoryLog(limit=5)
+    again.load(path, legacy=str(legacy))
+    assert [r["i"] for r in again] == [4, 5, 6, 7, 8]
@@ -0,0 +1,68 @@
+import os
+
+import numpy as np
+import pytest
+
+from rve import rescore, scoring
+from rve.ledger import Claim, DriftHistory, add_claim, get_or_create_user
+
+
+def test_score_arrays_matches_scalar():
+    pc = np.linspace(0, 1, 7)
+    ind = np.array([-1, 0, 1, 2, 3, 4, 2])
+    drift, conf = scoring.score_arrays(pc, ind)
+    for i in range(len(pc)):
+        d, c = scoring.score_claim(pc[i], scoring.clamp_independence(int(ind[i])))
+        assert drift[i] == d and conf[i] == c
+
+
+def test_rescore_dry_run_then_apply_and_resume(ledger_session, tmp_path, monkeypatch):
+    u = get_or_create_user(ledger_session, "a@example.com", "pw")
+    for i in range(5):
+        add_claim(ledger_session, u, f"claim {i}", prov_fields=i)
+    assert rescore.rescore_claims(ledger_session)["changed"] == 0
+
+    real = scoring.score_arrays
+    monkeypatch.setattr(rescore, "score_arrays", lambda pc, ind: (real(pc, ind)[0] + 0.5, real(pc, ind)[1]))
+
+    summary = rescore.rescore_claims(ledger_session, dry_run=True, batch_size=2)
+    assert summary["scanned"] == 5 and summary["changed"] == 5
+    assert abs(summary["max_drift_delta"] - 0.5) < 1e-9
+    assert ledger_session.query(DriftHistory).count() == 5
+
+    ckpt = str(tmp_path / "rescore.json")
+    seen = []
+    summary = rescore.rescore_claims(
+        ledger_session, batch_size=2, append_history=True, checkpoint_path=ckpt,
+        progress=lambda s: seen.append(s["last_id"]),
+    )
+    assert seen == [2, 4, 5]
+    assert summary["changed"] == 5
+    assert ledger_session.query(DriftHistory).count() == 10
+    first = ledger_session.query(Claim).order_by(Claim.id).first()
+    assert abs(first.drift_score - 3.1) < 1e-9
+
+    assert not os.path.exists(ckpt)  # a finished run leaves no checkpoint behind
+
+    again = rescore.rescore_claims(ledger_session, batch_size=2, checkpoint_path=ckpt)
+    assert again["scanned"] == 5 and again["changed"] == 0
+
+
+def test_interrupted_rescore_resumes_from_checkpoint(ledger_session, tmp_path):
+    u = get_or_create_user(ledger_session, "b@example.com", "pw")
+    for i in range(4):
+        add_claim(ledger_session, u, f"claim {i}", prov_fields=i)
+    ckpt = str(tmp_path / "rescore.json")
+
+    def stop_after_first_batch(s):
+        raise KeyboardInterrupt
+
+    try:
+        rescore.rescore_claims(ledger_session, batch_size=2, checkpoint_path=ckpt, progress=stop_after_first_batch)
+    except KeyboardInterrupt:
+        pass
+    assert os.path.exists(ckpt)
+    with pytest.raises(ValueError, match="user_id"):
+        rescore.rescore_claims(ledger_session, u, batch_size=2, checkpoint_path=ckpt)  # not the same run
+    assert rescore.rescore_claims(ledger_session, batch_size=2, checkpoint_path=ckpt)["scanned"] == 2
+    assert rescore.rescore_claims(ledger_session, batch_size=2, checkpoint_path=ckpt)["scanned"] == 4
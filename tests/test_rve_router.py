@@ -0,0 +1,138 @@
+import threading
+import time
+
+import pytest
+
+from rve.latency import LatencyRecorder
+from rve.llm import LLMClient
+from rve.loadtest import FakeOpenAIServer
+from rve.router import ModelSpec, choose_model, hedged_stream
+
+MODELS = [
+    ModelSpec("big", 3, 1000, 900.0),
+    ModelSpec("mid", 2, 100_000, 600.0),
+    ModelSpec("small", 1, 1000, 300.0),
+]
+MSGS = [{"role": "user", "content": "hi"}]
+
+
+def _measure(rec, model, ttft_ms, n=5, error=None):
+    for _ in range(n):
+        rec.record({"model": model, "ttft_ms": ttft_ms, "tokens_per_s": 50.0, "chunks": 3, "stalls": 0,
+                    "gap_histogram": [0] * 9, "error": error})
+
+
+def test_choice_uses_slo_measurements_context_and_errors():
+    rec = LatencyRecorder()
+    route = choose_model(100, slo_ms=1000, models=MODELS, recorder=rec)
+    assert route.model == "big" and route.fallbacks == ["small", "mid"]
+
+    _measure(rec, "big", 2500)  # measured slow: no longer fits the SLO
+    route = choose_model(100, slo_ms=1000, models=MODELS, recorder=rec)
+    assert route.model == "mid" and "within 1000 ms SLO" in route.reason
+    assert route.estimates["big"]["source"] == "measured"
+
+    _measure(rec, "mid", 100, error="RateLimitError")
+    route = choose_model(5000, slo_ms=1000, models=MODELS, recorder=rec)
+    assert route.model == "mid"  # the only model that holds the prompt, despite errors
+    route = choose_model(100, slo_ms=1000, models=MODELS, recorder=rec)
+    assert route.model == "small" and "mid: error rate" in route.reason
+
+
+class _Attempt:
+    """A delta stream that waits ``delay`` before its first token and can be closed from any thread."""
+
+    def __init__(self, model, delay, items=None):
+        self.model = model
+        self.closed = threading.Event()
+        self._items = iter([f"{model}-1", f"{model}-2"] if items is None else items)
+        self._delay = delay
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.closed.wait(self._delay):
+            raise StopIteration
+        self._delay = 0
+        return next(self._items)
+
+    def close(self):
+        self.closed.set()
+
+
+def test_hedge_wins_when_primary_is_slow():
+    rec = LatencyRecorder()
+    route = choose_model(10, slo_ms=1000, models=MODELS, recorder=rec)
+    delays = {"big": 5.0, "small": 0.0, "mid": 0.0}
+    attempts = {}
+
+    def open_stream(model):
+        attempts[model] = _Attempt(model, delays[model])
+        return attempts[model]
+
+    stream = hedged_stream(route, open_stream, hedge_after_s=0.05, recorder=rec)
+    assert next(stream) == "small-1"
+    assert attempts["big"].closed.is_set()  # closed as the winner yields, not 5 s later
+    assert list(stream) == ["small-2"]
+    assert route.served_by == "small" and route.events[0].startswith("hedge: started small")
+    deadline = time.monotonic() + 1
+    while not rec.recent("big") and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert rec.recent("big")[0]["error"] == "cancelled"
+
+
+def test_running_attempts_are_closed_when_the_stream_stops():
+    route = choose_model(10, slo_ms=1000, models=MODELS, recorder=LatencyRecorder())
+    attempts = {}
+
+    def open_stream(model):
+        attempts[model] = _Attempt(model, 0.0)
+        return attempts[model]
+
+    stream = hedged_stream(route, open_stream, hedge_after_s=5, recorder=LatencyRecorder())
+    assert next(stream) == "big-1"
+    stream.close()  # the consumer stops after the first token
+    assert attempts["big"].closed.is_set()
+
+    route = choose_model(10, slo_ms=1000, models=MODELS, recorder=LatencyRecorder())
+    delays = {"big": 5.0, "small": 0.1}
+
+    def open_empty(model):
+        attempts[model] = _Attempt(model, delays[model], items=[] if model == "small" else None)
+        return attempts[model]
+
+    assert list(hedged_stream(route, open_empty, hedge_after_s=0.01, recorder=LatencyRecorder())) == []
+    assert route.served_by == "small" and attempts["big"].closed.is_set()
+
+
+def test_hedged_llm_streams_leave_the_pool_usable():
+    with FakeOpenAIServer(ttft=0, token_rate=200, reply_tokens=5, model_ttft={"big": 0.5}) as server:
+        client = LLMClient("test-key", server.base_url, max_concurrency=2, queue_timeout=1, timeout=3)
+        for _ in range(3):
+            route = choose_model(10, slo_ms=1000, models=MODELS, recorder=LatencyRecorder())
+            out = list(hedged_stream(route, lambda m: client.stream_chat(MSGS, model=m), hedge_after_s=0.05,
+                                     recorder=LatencyRecorder()))
+            assert route.served_by == "small" and len(out) == 5
+        assert client.stats["active"] == 0
+        assert client.chat(MSGS, model="small").choices[0].message.content
+
+
+def test_failure_before_first_token_falls_back():
+    route = choose_model(10, slo_ms=1000, models=MODELS, recorder=LatencyRecorder())
+
+    def open_stream(model):
+        if model == "big":
+            raise RuntimeError("down")
+        yield model
+
+    out = list(hedged_stream(route, open_stream, hedge_after_s=5, recorder=LatencyRecorder()))
+    assert out == ["small"] and route.events == ["big failed: RuntimeError", "fallback: started small at " + route.events[1].split(" at ")[1]]
+
+    def never(model):
+        time.sleep(0.3)
+        yield "late"
+
+    route = choose_model(10, slo_ms=1000, models=MODELS[:1], recorder=LatencyRecorder())
+    with pytest.raises(TimeoutError):
+        list(hedged_stream(route, never, first_token_timeout_s=0.05, recorder=LatencyRecorder()))
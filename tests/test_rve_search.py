@@ -0,0 +1,41 @@
+from rve.ledger import add_claim, get_or_create_user, search_claims
+
+
+def test_search_ranks_scopes_and_prefixes(ledger_session):
+    a = get_or_create_user(ledger_session, "a@example.com", "pw")
+    b = get_or_create_user(ledger_session, "b@example.com", "pw")
+    add_claim(ledger_session, a, "The river remembers the threshold")
+    add_claim(ledger_session, a, "Coherence rises near the threshold of the threshold")
+    add_claim(ledger_session, a, "Unrelated claim about weather")
+    add_claim(ledger_session, b, "Another user's threshold claim")
+
+    hits = search_claims(ledger_session, a, "threshold")
+    assert [c.text for c in hits] == [
+        "Coherence rises near the threshold of the threshold",
+        "The river remembers the threshold",
+    ]
+    assert [c.text for c in search_claims(ledger_session, a, "thresh river")] == [
+        "The river remembers the threshold"
+    ]
+    assert search_claims(ledger_session, a, "thresh", prefix=False) == []
+    assert [c.user_id for c in search_claims(ledger_session, b, "threshold")] == [b.id]
+    assert search_claims(ledger_session, a, "  ") == []
+
+
+def test_index_created_late_covers_existing_claims(tmp_path):
+    from sqlalchemy import create_engine, insert
+
+    from rve.ledger import Base, Claim, User, get_session
+
+    url = f"sqlite:///{tmp_path / 'old.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)  # the schema without migration 0002
+    with engine.begin() as conn:
+        conn.execute(insert(User.__table__).values(id=1, email="old@example.com", password_hash="x"))
+        conn.execute(insert(Claim.__table__).values(user_id=1, claim_id="c1", text="an old threshold claim"))
+    engine.dispose()
+
+    sess = get_session(url)
+    user = sess.get(User, 1)
+    assert [c.text for c in search_claims(sess, user, "threshold")] == ["an old threshold claim"]
+    sess.close()
@@ -0,0 +1,13 @@
+from rve import sentiment
+
+
+def test_pulse_scores_are_cached_and_offline():
+    sentiment.pulse_score.cache_clear()
+    assert sentiment.pulse_score("I love this, it is great") > 0.8
+    assert sentiment.pulse_score("This is awful and sad") < 0.2
+    assert sentiment.pulse_score("") == 0.5
+    scores = sentiment.pulse_scores(["I love this, it is great", "I love this, it is great", "fine"])
+    assert scores[0] == scores[1]
+    info = sentiment.pulse_score.cache_info()
+    assert info.hits == 2 and info.misses == 4
+    assert sentiment.get_analyzer() is sentiment.get_analyzer()
@@ -0,0 +1,119 @@
+import pytest
+
+from rve.ledger import Claim, DriftHistory, User, check_claim_summary, search_claims
+from rve.sharding import ShardRouter, rebalance
+
+
+def _shards(tmp_path, names):
+    return {n: f"sqlite:///{tmp_path / (n + '.db')}" for n in names}
+
+
+def test_routing_is_stable_and_spreads_users(tmp_path):
+    router = ShardRouter(_shards(tmp_path, ["a", "b", "c"]))
+    emails = [f"user{i}@example.com" for i in range(300)]
+    placement = {e: router.shard_for(e) for e in emails}
+    assert set(placement.values()) == {"a", "b", "c"}
+    assert all(ShardRouter(router.shards).shard_for(e) == s for e, s in placement.items())
+
+    grown = ShardRouter(_shards(tmp_path, ["a", "b", "c", "d"]))
+    moved = [e for e in emails if grown.shard_for(e) != placement[e]]
+    assert all(grown.shard_for(e) == "d" for e in moved)
+    assert len(moved) < len(emails) / 2
+
+
+def test_routed_writes_and_rebalance(tmp_path):
+    small = ShardRouter(_shards(tmp_path, ["a"]))
+    emails = [f"user{i}@example.com" for i in range(12)]
+    users = [small.get_or_create_user(e, "pw") for e in emails]
+    for u in users:
+        c = small.add_claim(u, f"threshold claim of {u.email}")
+        small.append_drift(u, c, 1.5)
+        assert [x.text for x in small.list_claims(u)] == [c.text]
+
+    big = ShardRouter(_shards(tmp_path, ["a", "b"]))
+    planned = rebalance(big, dry_run=True)
+    assert planned and all(m["to"] == "b" for m in planned)
+    small.close()
+    moves = rebalance(big)
+    assert [m["email"] for m in moves] == [m["email"] for m in planned]
+    assert all(m["claims"] == 1 and m["drift_history"] == 2 for m in moves)
+    assert rebalance(big) == []
+
+    for shard in ("a", "b"):
+        sess = big.session(shard)
+        stored = [e for (e,) in sess.query(User.email)]
+        assert all(big.shard_for(e) == shard for e in stored)
+    for email in emails:
+        home = big.get_user(email)
+        claims = big.list_claims(home, with_history=True)
+        assert len(claims) == 1 and claims[0].drift_score == 1.5
+        assert len(claims[0].histories) == 2
+        hits = search_claims(big.session_for(email), home, "threshold")
+        assert [c.id for c in hits] == [claims[0].id]
+        assert check_claim_summary(big.session_for(email), home, repair=False)
+    total = sum(big.session(s).query(Claim).count() for s in ("a", "b"))
+    assert total == 12
+    assert sum(big.session(s).query(DriftHistory).count() for s in ("a", "b")) == 24
+
+
+def test_move_can_be_rerun_after_a_partial_move(tmp_path, monkeypatch):
+    import rve.sharding as sharding
+
+    small = ShardRouter(_shards(tmp_path, ["a"]))
+    big = ShardRouter(_shards(tmp_path, ["a", "b"]))
+    email = next(f"user{i}@example.com" for i in range(100) if big.shard_for(f"user{i}@example.com") == "b")
+    u = small.get_or_create_user(email, "pw")
+    c = small.add_claim(u, "threshold claim")
+    small.append_drift(u, c, 1.5)
+    small.close()
+
+    # The user also signed up on the home shard before the rebalance.
+    home = big.get_or_create_user(email, "pw")
+    big.add_claim(home, "threshold claim")
+    big.add_claim(home, "another claim")
+
+    def crash(*args, **kwargs):
+        raise RuntimeError("crashed before the source delete")
+
+    monkeypatch.setattr(sharding, "unindex_claim_texts", crash)
+    with pytest.raises(RuntimeError):
+        rebalance(big)
+    monkeypatch.undo()
+    assert big.session("a").query(User).filter_by(email=email).count() == 1
+
+    moves = rebalance(big)
+    assert [m["email"] for m in moves] == [email]
+    assert moves[0]["claims"] == 0 and moves[0]["drift_history"] == 0  # all copied by the failed run
+    assert rebalance(big) == []
+    home = big.get_user(email)
+    claims = big.list_claims(home, with_history=True)
+    # Same text but created separately: two claims, each copied once.
+    assert sorted(c.text for c in claims) == ["another claim", "threshold claim", "threshold claim"]
+    assert len({c.claim_id for c in claims}) == 3
+    assert sum(len(c.histories) for c in claims) == 4  # two from each shard, none duplicated
+    assert big.session("a").query(User).filter_by(email=email).count() == 0
+    assert check_claim_summary(big.session_for(email), home, repair=False)
+
+
+def test_move_keeps_a_different_claim_with_the_same_claim_id(tmp_path):
+    small = ShardRouter(_shards(tmp_path, ["a"]))
+    big = ShardRouter(_shards(tmp_path, ["a", "b"]))
+    email = next(f"user{i}@example.com" for i in range(100) if big.shard_for(f"user{i}@example.com") == "b")
+    u = small.get_or_create_user(email, "pw")
+    c = small.add_claim(u, "SOURCE ONLY evidence")
+    small.append_drift(u, c, 4.0)
+    source_claim_id = c.claim_id
+    small.close()
+
+    home = big.get_or_create_user(email, "pw")
+    mine = big.add_claim(home, "target claim")
+    assert mine.claim_id == source_claim_id == "CLM-0001"
+
+    moves = rebalance(big)
+    assert moves[0]["claims"] == 1
+    claims = {c.text: c for c in big.list_claims(big.get_user(email), with_history=True)}
+    assert set(claims) == {"SOURCE ONLY evidence", "target claim"}
+    assert claims["target claim"].claim_id == "CLM-0001" and len(claims["target claim"].histories) == 1
+    moved = claims["SOURCE ONLY evidence"]
+    assert moved.claim_id != "CLM-0001" and [h.drift for h in moved.histories][-1] == 4.0
+    assert rebalance(big) == []
@@ -0,0 +1,108 @@
+import os
+
+from rve.ledger import (
+    Artifact, Claim, DriftHistory, User, add_claim, append_drift, check_claim_summary,
+    get_or_create_user,
+    get_session, search_claims,
+)
+from rve.snapshot import create_snapshot, restore_snapshot
+
+
+def _dump(sess):
+    return sorted(
+        (c.user.email, c.claim_id, c.text, c.drift_score, [h.drift for h in c.histories],
+         [a.path_or_url for a in c.artifacts])
+        for c in sess.query(Claim)
+    )
+
+
+def test_full_and_incremental_roundtrip(ledger_session, tmp_path):
+    a = get_or_create_user(ledger_session, "a@example.com", "pw")
+    b = get_or_create_user(ledger_session, "b@example.com", "pw")
+    c1 = add_claim(ledger_session, a, "river threshold")
+    add_claim(ledger_session, b, "coherence")
+    ledger_session.add(Artifact(user_id=a.id, claim_id_fk=c1.id, path_or_url="/e/1.pdf"))
+    ledger_session.commit()
+
+    full = create_snapshot(str(tmp_path / "full"), chunk_rows=1)
+    assert full["tables"]["claims"]["rows"] == 2
+    assert len(full["tables"]["claims"]["chunks"]) == 2
+
+    add_claim(ledger_session, a, "late claim")
+    append_drift(ledger_session, a, c1, 0.5)
+    inc = create_snapshot(str(tmp_path / "inc"), since=str(tmp_path / "full"))
+    assert inc["tables"]["users"]["rows"] == 0
+    assert inc["tables"]["claims"]["rows"] == 1
+    assert inc["tables"]["drift_history"]["rows"] == 2
+
+    target = get_session(f"sqlite:///{tmp_path / 'restored.db'}")
+    get_or_create_user(target, "z@example.com", "pw")  # shifts ids in the target
+    assert restore_snapshot(str(tmp_path / "full"), sess=target, batch_size=1)["claims"] == 2
+    assert restore_snapshot(str(tmp_path / "inc"), sess=target)["drift_history"] == 2
+
+    assert _dump(target) == _dump(ledger_session)
+    assert target.query(User).count() == 3
+    assert target.query(DriftHistory).count() == 4
+    ra = target.query(User).filter_by(email="a@example.com").one()
+    assert ra.check_password("pw")
+    assert [c.text for c in search_claims(target, ra, "thresh")] == ["river threshold"]
+    for user in target.query(User):
+        assert check_claim_summary(target, user, repair=False)
+
+
+def test_restore_renumbers_taken_claim_ids_and_can_be_rerun(ledger_session, tmp_path):
+    a = get_or_create_user(ledger_session, "a@example.com", "pw")
+    c1 = add_claim(ledger_session, a, "river threshold")
+    add_claim(ledger_session, a, "coherence")
+    append_drift(ledger_session, a, c1, 0.5)
+    ledger_session.add(Artifact(user_id=a.id, claim_id_fk=c1.id, path_or_url="/e/1.pdf"))
+    ledger_session.commit()
+    create_snapshot(str(tmp_path / "full"))
+
+    target = get_session(f"sqlite:///{tmp_path / 'restored.db'}")
+    ta = get_or_create_user(target, "a@example.com", "pw")
+    other = add_claim(target, ta, "already here")
+    assert other.claim_id == c1.claim_id
+    for _ in range(2):  # a second run finds everything restored
+        restore_snapshot(str(tmp_path / "full"), sess=target, batch_size=1)
+
+    claims = {c.text: c for c in target.query(Claim)}
+    assert len(claims) == 3
+    assert claims["already here"].claim_id == "CLM-0001"
+    assert len({c.claim_id for c in claims.values()}) == 3
+    river = claims["river threshold"]
+    assert river.claim_id != "CLM-0001"
+    assert [h.drift for h in river.histories] == [h.drift for h in c1.histories]
+    assert [x.path_or_url for x in river.artifacts] == ["/e/1.pdf"]
+    assert len(claims["already here"].histories) == 1 and claims["already here"].artifacts == []
+    assert target.query(DriftHistory).count() == ledger_session.query(DriftHistory).count() + 1
+    assert check_claim_summary(target, ta, repair=False)
+
+
+def test_snapshot_is_consistent_without_blocking_writers(ledger_session, tmp_path, monkeypatch):
+    import sqlite3
+
+    from rve import snapshot
+
+    u = get_or_create_user(ledger_session, "a@example.com", "pw")
+    add_claim(ledger_session, u, "first claim")
+    db = ledger_session.get_bind().url.database
+    real, written = snapshot._table_query, []
+
+    def table_query(name):
+        if name == "drift_history":  # a writer arriving mid-snapshot goes ahead
+            other = sqlite3.connect(db, timeout=0.1)
+            try:
+                other.execute("INSERT INTO drift_history (user_id, drift) VALUES (?, 1.0)", (u.id,))
+                other.commit()
+                written.append(name)
+            finally:
+                other.close()
+        return real(name)
+
+    monkeypatch.setattr(snapshot, "_table_query", table_query)
+    manifest = create_snapshot(str(tmp_path / "snap"))
+    assert written == ["drift_history"]
+    assert manifest["tables"]["drift_history"]["rows"] == 1
+    assert ledger_session.query(DriftHistory).count() == 2
+    assert sorted(os.listdir(tmp_path / "snap")) == ["artifacts", "claims", "drift_history", "manifest.json", "users"]
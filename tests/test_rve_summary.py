@@ -0,0 +1,38 @@
+from rve.ledger import (
+    ClaimSummary, add_claim, append_drift, check_claim_summary, get_claim_summary,
+    get_or_create_user,
+)
+from rve.rescore import rescore_claims
+
+
+def test_summary_tracks_writes_and_rebuilds(ledger_session):
+    u = get_or_create_user(ledger_session, "a@example.com", "pw")
+    c1 = add_claim(ledger_session, u, "one", prov_fields=0)  # drift 2.6
+    add_claim(ledger_session, u, "two", volatility="volatile", prov_fields=6, independent_sources=3)
+    append_drift(ledger_session, u, c1, 4.5)
+
+    s = get_claim_summary(ledger_session, u)
+    assert s["n_claims"] == 2
+    assert s["drift_histogram"] == [1, 0, 0, 0, 1]
+    assert s["volatility"] == {"stable": 1, "volatile": 1}
+    assert abs(s["avg_drift"] - (4.5 + 0.0) / 2) < 1e-9
+    assert check_claim_summary(ledger_session, u)
+
+    row = ledger_session.get(ClaimSummary, u.id)
+    row.n_claims = 99
+    ledger_session.commit()
+    assert not check_claim_summary(ledger_session, u)
+    assert get_claim_summary(ledger_session, u)["n_claims"] == 2
+
+    # Re-scoring restores c1's formula drift and moves its bucket back.
+    rescore_claims(ledger_session)
+    assert get_claim_summary(ledger_session, u)["drift_histogram"] == [1, 0, 1, 0, 0]
+    assert check_claim_summary(ledger_session, u)
+
+
+def test_drift_within_the_same_bucket_keeps_histogram(ledger_session):
+    u = get_or_create_user(ledger_session, "b@example.com", "pw")
+    c = add_claim(ledger_session, u, "one", prov_fields=0)  # drift 2.6
+    append_drift(ledger_session, u, c, 2.2)
+    assert get_claim_summary(ledger_session, u)["drift_histogram"] == [0, 0, 1, 0, 0]
+    assert check_claim_summary(ledger_session, u)
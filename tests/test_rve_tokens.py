@@ -0,0 +1,35 @@
+from rve import tokens
+from rve.ledger import ApiToken, get_or_create_user
+
+
+def test_issue_verify_cache_and_revoke(ledger_session, monkeypatch):
+    tokens.cache.clear()
+    u = get_or_create_user(ledger_session, "a@example.com", "pw")
+    assert tokens.issue_token(ledger_session, "a@example.com", "wrong") is None
+    tok = tokens.issue_token(ledger_session, "a@example.com", "pw")
+    stored = ledger_session.query(ApiToken).one()
+    assert stored.token_hash == tokens.token_digest(tok) and tok not in stored.token_hash
+
+    assert tokens.verify_token(ledger_session, tok) == (u.id, "a@example.com")
+    # A cache hit does not touch the session at all.
+    assert tokens.verify_token(None, tok).id == u.id
+    assert tokens.cache.hits == 1
+
+    assert tokens.revoke_token(ledger_session, tok)
+    assert tokens.verify_token(ledger_session, tok) is None
+    assert tokens.verify_token(ledger_session, "nonsense") is None
+
+    other = tokens.issue_token(ledger_session, "a@example.com", "pw")
+    assert tokens.verify_token(ledger_session, other)
+    assert tokens.revoke_user_tokens(ledger_session, u.id) == 1
+    assert tokens.verify_token(ledger_session, other) is None
+
+
+def test_cache_expires_entries():
+    c = tokens.TokenCache(ttl=-1)
+    c.put("d", tokens.Principal(1, "a"))
+    assert c.get("d") is None
+    c = tokens.TokenCache(max_entries=2)
+    for d in "xyz":
+        c.put(d, tokens.Principal(1, d))
+    assert c.get("x") is None and c.get("z").email == "z"